@@ -9,6 +9,7 @@ import factory
 import pytest
 from django.contrib.auth import get_user_model
 from django.contrib.auth import models as auth_models
+from django.core.cache import caches
 from guardian.shortcuts import assign_perm
 from pytest_factoryboy import register
 
@@ -52,6 +53,37 @@ def setup_permissions(django_db_setup, django_db_blocker):
         populate_group_permissions()
 
 
+@pytest.fixture
+def locmem_cache(settings):
+    """
+    Return a function that replaces the cache with the given alias with an
+    empty local memory cache, for tests that need values to really be cached,
+    as our test settings use dummy caches.
+    """
+
+    def use_locmem_cache(alias):
+        settings.CACHES = {
+            **settings.CACHES,
+            alias: {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": f"test_{alias}",
+            },
+        }
+        # local memory caches with the same location share their entries
+        caches[alias].clear()
+        return alias
+
+    return use_locmem_cache
+
+
+@pytest.fixture
+def shared_cache(locmem_cache):
+    """
+    Use a local memory cache as the shared cache.
+    """
+    return locmem_cache("shared")
+
+
 @pytest.fixture
 def provider_groups():
     return auth_models.Group.objects.filter(name__in=["datacenter", "hostingprovider"])
@@ -1,8 +1,12 @@
 from django.db import models
+from django.dispatch import receiver
 from model_utils.models import TimeStampedModel
 
+from apps.greencheck.shared_cache import directory_provider_key, shared_cache
+
 from .abstract import EvidenceType, FossilFreeEnergyMatching, Label
 from .datacenter import (
+    clear_cached_directory_details,
     Datacenter,
     DatacenterCertificate,
     DatacenterClassification,
@@ -75,3 +79,26 @@ class HostingproviderDatacenter(models.Model):
         db_table = "datacenters_hostingproviders"
         # managed = False
 
+
+@receiver(models.signals.post_save, sender=HostingproviderDatacenter)
+@receiver(models.signals.post_delete, sender=HostingproviderDatacenter)
+def clear_cached_directory_details_for_link(instance, **_kwargs):
+    if instance.hostingprovider_id:
+        shared_cache().delete(directory_provider_key(instance.hostingprovider_id))
+
+
+@receiver(models.signals.m2m_changed, sender=HostingproviderDatacenter)
+def clear_cached_directory_details_for_links(
+    instance, action, reverse, pk_set, **_kwargs
+):
+    # `instance` is the datacenter when the links are changed from the
+    # datacenter's side, and `pk_set` the providers added or removed
+    if action == "pre_clear" and reverse:
+        clear_cached_directory_details(instance.id)
+    elif action in ("post_add", "post_remove"):
+        provider_ids = pk_set if reverse else [instance.id]
+        shared_cache().delete_many(
+            [directory_provider_key(provider_id) for provider_id in provider_ids]
+        )
+    elif action == "post_clear" and not reverse:
+        shared_cache().delete(directory_provider_key(instance.id))
@@ -1,7 +1,6 @@
 import re
 from enum import StrEnum
 from datetime import datetime, timedelta
-from time import sleep
 from django.conf import settings
 from django.db import models, transaction, IntegrityError, OperationalError
 from django.utils.safestring import mark_safe
@@ -15,8 +14,14 @@ from carbon_txt.exceptions import UnreachableCarbonTxtFile
 from carbon_txt.web.validation_logging.models import ValidationLogEntry
 from httpx import HTTPError
 
+from apps.greencheck.shared_cache import NO_RESULT, carbon_txt_domain_key, shared_cache
+from apps.greencheck.single_flight import SingleFlight
+
 from ...validators import DomainNameValidator
 
+# Uncached carbon.txt lookups currently in flight in this process, keyed by domain
+carbon_txt_lookups = SingleFlight()
+
 class CarbonTxtDomainResultCache(TimeStampedModel):
     domain = models.CharField(max_length=255, unique=True, validators=[DomainNameValidator])
     carbon_txt = models.ForeignKey("ProviderCarbonTxt", on_delete=models.CASCADE, null=True, blank=True)
@@ -33,6 +38,16 @@ class CarbonTxtDomainResultCache(TimeStampedModel):
         if result:
             return result.modified
 
+    @classmethod
+    def last_modified_for(cls, domains):
+        """
+        Return a dict of domain to when its cached result was last modified,
+        for each of the domains we have a cached result for, in one query.
+        """
+        return dict(
+            cls.objects.filter(domain__in=domains).values_list("domain", "modified")
+        )
+
     @classmethod
     def sweep_cache(cls, ttl=None):
         if ttl is None:
@@ -44,6 +59,7 @@ class CarbonTxtDomainResultCache(TimeStampedModel):
     def clear_cache(cls, domain):
         if obj := cls.objects.filter(domain=domain).first():
             obj.delete()
+        shared_cache().delete(carbon_txt_domain_key(domain))
 
 
 
@@ -158,31 +174,50 @@ class ProviderCarbonTxt(TimeStampedModel):
 
         Results are saved in the domain cache which is periodically cleared, in order to reduce
         load on the greenchecker API endpoint, and also to ensure we don't DOS the servers being
-        checked. The cache can be busted with the refresh_cache argument.
+        checked. In front of the domain cache table, we keep the id of the carbon.txt we found
+        for a domain, if any, in the shared cache. The cache can be busted with the
+        refresh_cache argument.
         """
         if domain is None:
             return
+        if not refresh_cache:
+            cached_id = shared_cache().get(carbon_txt_domain_key(domain))
+            if cached_id == NO_RESULT:
+                return None
+            if cached_id is not None:
+                return cls.objects.filter(pk=cached_id).first()
+
         cached_domain = CarbonTxtDomainResultCache.objects.filter(domain=domain).first()
         if cached_domain and not refresh_cache:
+            cls._cache_shared_result(domain, cached_domain.carbon_txt_id)
             return cached_domain.carbon_txt
         else:
-            carbon_txt = cls._find_for_domain_uncached(domain)
-            # We need to wrap this in a transaction to ensure that we don't get two
-            # threads trying to create the same cache entry at once and failing because
-            # of the uniqueness constraint on the domain name
-            try:
-                with transaction.atomic():
-                    CarbonTxtDomainResultCache.objects.filter(domain=domain).delete()
-                    cached_domain = CarbonTxtDomainResultCache(domain=domain, carbon_txt=carbon_txt)
-                    cached_domain.save()
-                    return carbon_txt
-            except (OperationalError, IntegrityError) as e:
-                # In the case of a race, the second thread waits a short amount of time
-                # and simply reads the result written by the first
-                sleep(0.3)
-                cached_domain = CarbonTxtDomainResultCache.objects.filter(domain=domain).first()
-                if cached_domain:
-                    return cached_domain.carbon_txt
+            # Concurrent lookups for the same domain in this process share one
+            # set of HTTP requests
+            return carbon_txt_lookups.do(domain, cls._find_for_domain_and_cache, domain)
+
+    @classmethod
+    def _find_for_domain_and_cache(cls, domain):
+        carbon_txt = cls._find_for_domain_uncached(domain)
+        # We need to wrap this in a transaction to ensure that we don't get two
+        # threads trying to create the same cache entry at once and failing because
+        # of the uniqueness constraint on the domain name
+        try:
+            with transaction.atomic():
+                CarbonTxtDomainResultCache.objects.filter(domain=domain).delete()
+                cached_domain = CarbonTxtDomainResultCache(domain=domain, carbon_txt=carbon_txt)
+                cached_domain.save()
+        except (OperationalError, IntegrityError):
+            # In the case of a race with another process, it has cached a result
+            # from a lookup as recent as ours, so we can return our own result
+            # rather than waiting to read theirs
+            pass
+        cls._cache_shared_result(domain, carbon_txt.id if carbon_txt else None)
+        return carbon_txt
+
+    @classmethod
+    def _cache_shared_result(cls, domain, carbon_txt_id):
+        shared_cache().set(carbon_txt_domain_key(domain), carbon_txt_id or NO_RESULT)
 
     @classmethod
     def _find_for_domain_uncached(cls, domain):
@@ -1,8 +1,11 @@
 from django.conf import settings
 from django.db import models
+from django.dispatch import receiver
 from django.urls import reverse
 from django_countries.fields import CountryField
 from guardian.shortcuts import get_users_with_perms
+from apps.greencheck.shared_cache import directory_provider_key, shared_cache
+
 from ...permissions import manage_datacenter
 from ..choices import (
     ClassificationChoice,
@@ -66,7 +69,13 @@ class Datacenter(models.Model):
         Return the city this datacentre is
         placed in.
         """
-        location = self.datacenterlocation_set.first()
+        # pick the first location from all of them, rather than with first(),
+        # so we can use locations fetched with prefetch_related
+        location = min(
+            self.datacenterlocation_set.all(),
+            key=lambda location: location.pk,
+            default=None,
+        )
         if location:
             return location.city
         else:
@@ -217,3 +226,30 @@ class DataCenterLocation(models.Model):
         verbose_name = "Datacentre Location"
         db_table = "datacenters_locations"
 
+
+def clear_cached_directory_details(datacenter_id):
+    """
+    Clear the cached legacy directory details of every provider
+    using the given datacenter.
+    """
+    provider_ids = Datacenter.hostingproviders.through.objects.filter(
+        datacenter_id=datacenter_id
+    ).values_list("hostingprovider_id", flat=True)
+    shared_cache().delete_many(
+        [directory_provider_key(provider_id) for provider_id in provider_ids]
+    )
+
+
+@receiver(models.signals.post_save, sender=Datacenter)
+@receiver(models.signals.post_delete, sender=Datacenter)
+def clear_cached_datacenter_details(instance, **_kwargs):
+    clear_cached_directory_details(instance.id)
+
+
+@receiver(models.signals.post_save, sender=DatacenterCertificate)
+@receiver(models.signals.post_delete, sender=DatacenterCertificate)
+@receiver(models.signals.post_save, sender=DataCenterLocation)
+@receiver(models.signals.post_delete, sender=DataCenterLocation)
+def clear_cached_datacenter_details_for_related(instance, **_kwargs):
+    if instance.datacenter_id:
+        clear_cached_directory_details(instance.datacenter_id)
@@ -8,9 +8,10 @@ from anymail.message import AnymailMessage
 from carbon_txt import build_carbontxt_file
 from dirtyfields import DirtyFieldsMixin
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
 from django.db.models.functions import Now
+from django.dispatch import receiver
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils.safestring import mark_safe
@@ -27,6 +28,12 @@ from taggit.managers import TaggableManager
 from apps.greencheck.choices import GreenlistChoice, StatusApproval
 from apps.greencheck.exceptions import NoSharedSecret
 from apps.greencheck.object_storage import object_storage_bucket, public_url
+from apps.greencheck.shared_cache import (
+    directory_provider_key,
+    expire_directory,
+    provider_key,
+    shared_cache,
+)
 
 from ...permissions import manage_provider
 from ..choices import ModelType, PartnerChoice
@@ -221,6 +228,19 @@ class ProviderVerificationBasis(tag_models.TaggedItemBase):
     )
 
 
+class ProviderDetails(typing.NamedTuple):
+    """
+    The few details of a provider we show in a greencheck result, small
+    enough to keep in the shared cache.
+    """
+
+    id: int
+    name: str
+    website: str
+    partner: str
+    is_listed: bool
+
+
 class Hostingprovider(models.Model, DirtyFieldsMixin):
     archived = models.BooleanField(default=False)
     country = CountryField(db_column="countrydomain")
@@ -322,6 +342,28 @@ class Hostingprovider(models.Model, DirtyFieldsMixin):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def cached_details(cls, provider_id) -> typing.Optional[ProviderDetails]:
+        """
+        Return the details we show in greencheck results for a provider,
+        from the shared cache if we can, or None if there is no such provider.
+        """
+        key = provider_key(provider_id)
+        if details := shared_cache().get(key):
+            return details
+
+        details = (
+            cls.objects.filter(pk=provider_id)
+            .values_list(*ProviderDetails._fields)
+            .first()
+        )
+        if details is None:
+            return None
+
+        details = ProviderDetails(*details)
+        shared_cache().set(key, details)
+        return details
+
     def _clear_cached_greendomains(self):
         from apps.greencheck.models import GreenDomain  # Avoid circular import
 
@@ -666,6 +708,15 @@ class Hostingprovider(models.Model, DirtyFieldsMixin):
             )
 
     def save(self, *args, **kwargs):
+        from apps.greencheck.legacy_directory import (  # Avoid circular import
+            LISTING_CHANGING_FIELDS,
+        )
+
+        # Only listed providers appear in the legacy directory listing, or
+        # the directory page, so we rebuild or expire them when one is added,
+        # changed or unlisted.
+        listing_changed = self._state.adding and self.is_listed
+        directory_changed = listing_changed
         # The is_listed flag, name and website url are denormalized into the
         # greendomains table, so updating these should clear cached
         # greendomains for this provider.
@@ -678,7 +729,26 @@ class Hostingprovider(models.Model, DirtyFieldsMixin):
             )
             if any_cache_expiring_field_is_dirty:
                 self._clear_cached_greendomains()
+            if LISTING_CHANGING_FIELDS & set(dirty_fields.keys()):
+                listing_changed = listing_changed or (
+                    self.is_listed or "is_listed" in dirty_fields
+                )
+            directory_changed = (
+                self.is_listed or "is_listed" in dirty_fields or "archived" in dirty_fields
+            )
         super().save(*args, **kwargs)
+        if listing_changed:
+            self._rebuild_directory_listing()
+        if directory_changed:
+            transaction.on_commit(expire_directory)
+
+    def _rebuild_directory_listing(self):
+        from apps.greencheck.legacy_directory import (  # Avoid circular import
+            rebuild_directory_listing,
+        )
+
+        # rebuild once the change is committed, so the listing includes it
+        transaction.on_commit(rebuild_directory_listing)
 
     class Meta:
         # managed = False
@@ -883,3 +953,57 @@ class HostingproviderStats(models.Model):
     class Meta:
         db_table = "hostingproviders_stats"
         # managed = False
+
+
+@receiver(models.signals.post_save, sender=Hostingprovider)
+@receiver(models.signals.post_delete, sender=Hostingprovider)
+def clear_cached_details(instance, **_kwargs):
+    shared_cache().delete_many(
+        [provider_key(instance.id), directory_provider_key(instance.id)]
+    )
+
+
+@receiver(models.signals.post_delete, sender=Hostingprovider)
+def rebuild_directory_listing_after_delete(instance, **_kwargs):
+    if instance.is_listed:
+        instance._rebuild_directory_listing()
+        transaction.on_commit(expire_directory)
+
+
+def expire_directory_if_listed(provider_id):
+    """
+    Expire the cached directory page, if the given provider is listed in it.
+    """
+    if Hostingprovider.objects.filter(pk=provider_id, is_listed=True).exists():
+        transaction.on_commit(expire_directory)
+
+
+@receiver(models.signals.post_save, sender=ProviderService)
+@receiver(models.signals.post_delete, sender=ProviderService)
+def expire_directory_for_service(instance, **_kwargs):
+    expire_directory_if_listed(instance.content_object_id)
+
+
+@receiver(models.signals.post_save, sender=HostingProviderSupportingDocument)
+@receiver(models.signals.post_delete, sender=HostingProviderSupportingDocument)
+def expire_directory_for_evidence(instance, **_kwargs):
+    if instance.hostingprovider_id:
+        expire_directory_if_listed(instance.hostingprovider_id)
+
+
+@receiver(models.signals.post_save, sender="accounts.ProviderCarbonTxt")
+@receiver(models.signals.post_delete, sender="accounts.ProviderCarbonTxt")
+def expire_directory_for_carbon_txt(instance, **_kwargs):
+    expire_directory_if_listed(instance.provider_id)
+
+
+@receiver(models.signals.m2m_changed, sender=Hostingprovider.upstream_providers.through)
+def expire_directory_for_upstream_providers(instance, action, **_kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(expire_directory)
+
+
+@receiver(models.signals.post_save, sender=Service)
+@receiver(models.signals.post_delete, sender=Service)
+def expire_directory_for_service_names(**_kwargs):
+    transaction.on_commit(expire_directory)
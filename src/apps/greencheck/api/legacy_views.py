@@ -1,9 +1,10 @@
+import hashlib
 import logging
 
 
-from django.views.decorators.cache import cache_page
-from django_countries import countries
-from rest_framework import response
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import exceptions
 from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import AllowAny
@@ -11,6 +12,11 @@ from rest_framework_jsonp.renderers import JSONPRenderer
 
 from ...accounts.models import Hostingprovider
 from ..domain_check import GreenDomainChecker
+from ..legacy_directory import (
+    directory_listing,
+    provider_details,
+    providers_by_country,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -22,72 +28,67 @@ def fetch_providers_for_country(country_code):
     as a list, with partners listed first, then in
     alphabetical order.
     """
-    # we need to order by partner, then alphabetical
-    # order. Because the django ORM doesn't natively support
-    # group by, and because we have hundreds of hosters for each
-    # country, at a maximum we can get away with doing it in memory
-
-    all_providers = Hostingprovider.objects.filter(
-        country=country_code, is_listed=True
+    providers = providers_by_country(
+        Hostingprovider.objects.filter(country=country_code)
     )
+    return providers.get(country_code, [])
 
-    # because historically we have had a mix of empty strings and null
-    # values, we need to use multiple excludes
-    partner_providers = (
-        all_providers.filter(country=country_code, is_listed=True)
-        .filter(partner__isnull=False)
-        .exclude(partner__in=["", "None"])
-        .order_by("name")
-    )
 
-    regular_providers = all_providers.exclude(id__in=partner_providers).order_by("name")
+def document_response(request, document, content, content_type, etag=None):
+    """
+    Return a response with the content of a prebuilt document, with
+    the headers clients need to revalidate it, or a 304 if the copy
+    the client already has is current.
+    Pass an `etag` when the content is more than the document itself.
+    """
+    etag = etag or document.etag
+    response = HttpResponse(content, content_type=content_type)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(document.last_modified)
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=document.last_modified,
+        response=response,
+    )
 
-    # destructure the providers to build a new list,
-    # with partner providers first, then regular providers
-    providers = [*partner_providers, *regular_providers]
 
-    return [
-        {
-            "iso": str(provider.country),
-            "id": str(provider.id),
-            "naam": provider.name,
-            "website": provider.website,
-            "partner": provider.partner,
-        }
-        for provider in providers
-    ]
+def jsonp_etag(etag: str, callback: str) -> str:
+    """
+    Return an ETag for a document wrapped in a JSONP callback, as the
+    same document has a different body for every callback.
+    """
+    digest = hashlib.sha256(f"{etag}{callback}".encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
 
 
 @api_view()
 @permission_classes([AllowAny])
 @renderer_classes([JSONPRenderer])
-@cache_page(60 * 15)
 def directory(request):
     """
     Return a JSON object keyed by countrycode, listing the providers
-    we have for each country:
+    we have for each country, from the prebuilt listing.
     """
-    country_list = {}
-
-    for country in countries:
-        country_obj = {
-            "iso": country.code,
-            "tld": f".{country.code.lower()}",
-            "countryname": country.name.upper(),
-        }
-
-        providers = fetch_providers_for_country(country.code)
-        if providers:
-            country_obj["providers"] = providers
-
-        country_list[country.code] = country_obj
+    listing = directory_listing()
+    callback = request.query_params.get(
+        JSONPRenderer.callback_parameter, JSONPRenderer.default_callback
+    )
 
-    return response.Response(country_list)
+    # this is what the JSONPRenderer would render, without re-rendering
+    # the listing on every request
+    return document_response(
+        request,
+        listing,
+        callback.encode("utf-8") + b"(" + listing.content + b");",
+        "application/javascript; charset=utf-8",
+        etag=jsonp_etag(listing.etag, callback),
+    )
 
 
 @api_view()
 @permission_classes([AllowAny])
-def directory_provider(self, id):
+def directory_provider(request, id):
     """
     Return a JSON object representing the provider,
     what they do, and evidence supporting their
@@ -105,34 +106,8 @@ def directory_provider(self, id):
             )
         )
 
-    provider = Hostingprovider.objects.get(pk=provider_id)
-    datacenters = [dc.legacy_representation() for dc in provider.datacenter.all() if dc]
-
-    from urllib import parse
-
-    # we strip out the protocol from our links because when the directory code is
-    # consumed in some old jquery code running in the browser to render our directory
-    # hyperlinks are mangled, and http://my-domain ends up as http//mydomain
-    # for more, see the trello card below
-    # https://trello.com/c/8Ou3mATw/124
-    domain_with_no_protocol = parse.urlparse(provider.website).netloc
-
-    # basic case, no datacenters or certificates
-    provider_dict = {
-        "id": str(provider.id),
-        "naam": provider.name,
-        # "website": provider.website,
-        "website": domain_with_no_protocol,
-        "countrydomain": str(provider.country),
-        "model": provider.model,
-        "certurl": None,
-        "valid_from": None,
-        "valid_to": None,
-        "mainenergytype": None,
-        "energyprovider": None,
-        "partner": provider.partner,
-        "datacenters": datacenters,
-    }
-    return response.Response([provider_dict])
-
+    details = provider_details(provider_id)
+    if details is None:
+        raise exceptions.NotFound(f"No provider found with the ID '{provider_id}'")
 
+    return document_response(request, details, details.content, "application/json")
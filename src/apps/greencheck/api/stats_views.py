@@ -0,0 +1,82 @@
+import datetime
+
+from django.utils import timezone
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import exceptions, permissions, views
+from rest_framework.response import Response
+
+from ..models import DailyStat, DailyTotal
+
+DEFAULT_STATS_DAYS = 30
+MAX_STATS_DAYS = 366
+
+
+def parse_date_range(request) -> tuple:
+    """
+    Return the `start` and `end` dates asked for in the query string,
+    defaulting to the last 30 days.
+    """
+    try:
+        end = datetime.date.fromisoformat(
+            request.query_params.get("end", timezone.now().date().isoformat())
+        )
+        start = datetime.date.fromisoformat(
+            request.query_params.get(
+                "start",
+                (end - datetime.timedelta(days=DEFAULT_STATS_DAYS - 1)).isoformat(),
+            )
+        )
+    except ValueError:
+        raise exceptions.ValidationError("Dates must be in the format YYYY-MM-DD")
+
+    if start > end:
+        raise exceptions.ValidationError("The start date must be before the end date")
+    if (end - start).days >= MAX_STATS_DAYS:
+        raise exceptions.ValidationError(
+            f"We can only return stats for up to {MAX_STATS_DAYS} days at a time"
+        )
+    return start, end
+
+
+class DailyStatsView(views.APIView):
+    """
+    Return the number of greenchecks we logged each day, how many were
+    green, and an estimate of the distinct domains checked, from the
+    daily rollups.
+    """
+
+    permission_classes = [permissions.AllowAny]
+
+    @swagger_auto_schema(tags=["Greencheck Stats"])
+    def get(self, request, format=None):
+        start, end = parse_date_range(request)
+        totals = DailyTotal.objects.filter(date__range=(start, end))
+        return Response(
+            {"start": start, "end": end, "results": DailyTotal.totals(totals)}
+        )
+
+
+class ProviderDailyStatsView(views.APIView):
+    """
+    Return the daily greencheck totals for a single hosting provider,
+    and optionally their totals over the whole range for each kind of match.
+    """
+
+    permission_classes = [permissions.AllowAny]
+
+    @swagger_auto_schema(tags=["Greencheck Stats"])
+    def get(self, request, provider_id, format=None):
+        start, end = parse_date_range(request)
+        stats = DailyStat.objects.filter(
+            hosting_provider_id=provider_id, date__range=(start, end)
+        )
+
+        data = {
+            "provider": provider_id,
+            "start": start,
+            "end": end,
+            "results": DailyStat.totals(stats),
+        }
+        if request.query_params.get("by_match_type"):
+            data["match_types"] = DailyStat.totals(stats, group_by="match_type")
+        return Response(data)
@@ -1,3 +1,4 @@
+import functools
 import logging
 
 from django.conf import settings
@@ -22,13 +23,31 @@ logger = logging.getLogger(__name__)
 geolookup = None
 
 try:
-    geolookup = GeoIP2(settings.GEOIP_PATH)
+    geolookup = GeoIP2(
+        settings.GEOIP_PATH,
+        cache=GeoIP2.MODE_MEMORY if settings.GEOIP_IN_MEMORY else GeoIP2.MODE_AUTO,
+    )
 except GeoIP2Exception:
     logger.warning(
         "No valid path found for the GeoIp binary database. "
         "We will not be able to serve ip-to-co2-intensity lookups."
     )
 
+
+@functools.lru_cache(maxsize=settings.GEOIP_CACHE_MAX_ENTRIES)
+def country_code_for_ip(ip_address):
+    """
+    Return the code of the country the IP is estimated to reside in,
+    or None if we can't find one. Results are kept until the process
+    restarts, as the GeoIP database only changes when we deploy.
+    """
+    try:
+        return geolookup.city(ip_address).get("country_code")
+    except errors.AddressNotFoundError:
+        logger.info("No matching result for the provided IP")
+    return None
+
+
 class IPCO2Intensity(views.APIView):
     """
     A view to return the CO2e intensity a given IP address.
@@ -65,14 +84,8 @@ class IPCO2Intensity(views.APIView):
         if not geolookup:
             return CO2Intensity.global_value()
 
-        res = None
-        try:
-            res = geolookup.city(ip_to_trace)
-        except errors.AddressNotFoundError:
-            logger.info("No matching result for the provided IP")
-
-        if res is not None:
-            country_code = res.get("country_code")
+        country_code = country_code_for_ip(ip_to_trace)
+        if country_code is not None:
             return CO2Intensity.check_for_country_code(country_code)
 
         # we couldn't trace this to a given country, fallback to default 'world' value
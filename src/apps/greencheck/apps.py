@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class GreencheckConfig(AppConfig):
     name = "apps.greencheck"
+
+    def ready(self):
+        # register our system checks
+        from . import checks  # noqa
@@ -0,0 +1,236 @@
+"""
+A local, longest-prefix-match table of announced IP prefixes and the AS
+networks originating them, so we can resolve an IP address to its ASN without
+making a live whois lookup over the network.
+
+The table is built from prefix-to-AS dumps in the tab separated format
+published by CAIDA's Routeviews Prefix to AS mappings dataset:
+
+    1.0.0.0     24      13335
+    1.0.4.0     22      38803_56203
+    1.0.16.0    24      2519,2520
+
+Where a prefix has multiple origins (separated by `_`), or originates from
+an AS set (separated by `,`), we return all the AS numbers as a space
+separated string, in the same format as our previous Team Cymru lookups.
+
+Prefixes are always either nested inside each other, or disjoint, so we
+flatten them into sorted, non-overlapping segments, and look up an address
+with a binary search over the segment start points.
+"""
+
+import array
+import bisect
+import gzip
+import ipaddress
+import logging
+import os
+import pathlib
+import threading
+import time
+import typing
+
+from django.conf import settings
+
+from .background_reload import BackgroundReloader
+
+logger = logging.getLogger(__name__)
+
+# the index in our list of origins we use for addresses no prefix covers
+NO_ORIGIN = 0
+
+AsnResult = typing.Union[int, str, None]
+
+
+class AsnPrefixTable:
+    """
+    An immutable table for finding the origin AS of the most specific
+    announced prefix containing an IP address.
+    """
+
+    def __init__(self, prefixes: typing.Iterable[tuple]):
+        """
+        Accept an iterable of (network, origin) tuples, where network is
+        an ipaddress.IPv4Network or IPv6Network, and origin is an integer
+        AS number, or a space separated string of them.
+        """
+        # we store each distinct origin once, and refer to it by its
+        # position in this list, to keep our segment arrays compact
+        self._origins = [None]
+        origin_positions = {}
+
+        by_version = {4: [], 6: []}
+        for network, origin in prefixes:
+            if origin not in origin_positions:
+                origin_positions[origin] = len(self._origins)
+                self._origins.append(origin)
+            by_version[network.version].append(
+                (
+                    int(network.network_address),
+                    int(network.broadcast_address),
+                    network.prefixlen,
+                    origin_positions[origin],
+                )
+            )
+
+        self._size = len(by_version[4]) + len(by_version[6])
+
+        # ipv4 addresses fit in an unsigned 32 bit int, but ipv6
+        # addresses need python's arbitrary length ints
+        self._segments = {
+            4: self._build_segments(
+                by_version[4], array.array("I"), 2 ** ipaddress.IPV4LENGTH - 1
+            ),
+            6: self._build_segments(
+                by_version[6], [], 2 ** ipaddress.IPV6LENGTH - 1
+            ),
+        }
+
+    @staticmethod
+    def _build_segments(
+        prefixes: list, starts: typing.MutableSequence, last_address: int
+    ):
+        """
+        Flatten a list of nested prefixes into two parallel sequences:
+        the sorted start points of each segment, and the origin of the
+        most specific prefix covering it.
+        """
+        origins = array.array("I")
+
+        def start_segment(position, origin):
+            # prefixes ending at the very last address don't need
+            # a segment after them
+            if position > last_address:
+                return
+            # a more specific prefix starting at the same address wins
+            if len(starts) and starts[-1] == position:
+                origins[-1] = origin
+            elif not len(origins) or origins[-1] != origin:
+                starts.append(position)
+                origins.append(origin)
+
+        # sorting by start, then by prefix length means enclosing prefixes
+        # are always visited before the prefixes nested inside them
+        prefixes.sort(key=lambda prefix: (prefix[0], prefix[2]))
+
+        enclosing = []
+        for start, end, _length, origin in prefixes:
+            while enclosing and enclosing[-1][0] < start:
+                closed_end, _ = enclosing.pop()
+                start_segment(closed_end + 1, enclosing[-1][1] if enclosing else NO_ORIGIN)
+            start_segment(start, origin)
+            enclosing.append((end, origin))
+
+        while enclosing:
+            closed_end, _ = enclosing.pop()
+            start_segment(closed_end + 1, enclosing[-1][1] if enclosing else NO_ORIGIN)
+
+        return starts, origins
+
+    def __len__(self) -> int:
+        return self._size
+
+    def asn_for(self, ip_address) -> AsnResult:
+        """
+        Return the origin AS of the most specific prefix containing
+        `ip_address`, or None if the address is not announced.
+        """
+        address = ipaddress.ip_address(ip_address)
+        starts, origins = self._segments[address.version]
+        segment = bisect.bisect_right(starts, int(address)) - 1
+        if segment < 0:
+            return None
+        return self._origins[origins[segment]]
+
+
+def parse_origin(origin: str) -> AsnResult:
+    """
+    Convert the origin column of a prefix-to-AS dump into either a single
+    integer AS number, or a space separated string of AS numbers.
+    """
+    asns = [asn for asn in origin.replace(",", "_").split("_") if asn]
+    if not asns:
+        return None
+    if len(asns) == 1:
+        return int(asns[0])
+    return " ".join(asns)
+
+
+def parse_prefix_dump(lines: typing.Iterable[str]) -> typing.Iterator[tuple]:
+    """
+    Parse the lines of a prefix-to-AS dump, yielding (network, origin) tuples,
+    and skipping any lines we can't make sense of.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            address, length, origin = line.split()
+            network = ipaddress.ip_network(f"{address}/{length}")
+        except ValueError:
+            logger.warning(f"Skipping unparseable prefix-to-AS line: {line}")
+            continue
+
+        if (parsed_origin := parse_origin(origin)) is not None:
+            yield network, parsed_origin
+
+
+def open_prefix_dump(path: pathlib.Path) -> typing.TextIO:
+    """
+    Open a prefix-to-AS dump for reading, whether it is gzipped or not.
+    """
+    if pathlib.Path(path).suffix == ".gz":
+        return gzip.open(path, "rt")
+    return open(path, "r")
+
+
+def load_asn_prefix_table(path: pathlib.Path) -> AsnPrefixTable:
+    """
+    Load a prefix-to-AS table from a dump file on disk.
+    """
+    with open_prefix_dump(path) as dump:
+        return AsnPrefixTable(parse_prefix_dump(dump))
+
+
+def _load_configured_table() -> AsnPrefixTable:
+    path = settings.ASN_PREFIX_TABLE_PATH
+    table = load_asn_prefix_table(path)
+    logger.info(f"Loaded {len(table)} prefixes from {path}")
+    return table
+
+
+_table = BackgroundReloader("ASN prefix table", _load_configured_table)
+_table_mtime = None
+_table_checked_at = None
+_table_check_lock = threading.Lock()
+
+
+def asn_prefix_table() -> typing.Union[AsnPrefixTable, None]:
+    """
+    Return this process's prefix-to-AS table, or None if we haven't loaded
+    one yet. At most every ASN_PREFIX_TABLE_CHECK_INTERVAL seconds, we check
+    if ASN_PREFIX_TABLE_PATH has been replaced, and if so, load it in the
+    background, returning the table we already have until it is ready.
+    """
+    global _table_mtime, _table_checked_at
+
+    now = time.monotonic()
+    changed = False
+    with _table_check_lock:
+        if (
+            _table_checked_at is None
+            or now - _table_checked_at >= settings.ASN_PREFIX_TABLE_CHECK_INTERVAL
+        ):
+            _table_checked_at = now
+            try:
+                mtime = os.stat(settings.ASN_PREFIX_TABLE_PATH).st_mtime
+            except FileNotFoundError:
+                mtime = None
+            changed = mtime is not None and mtime != _table_mtime
+            if changed:
+                _table_mtime = mtime
+
+    if changed:
+        _table.reload()
+    return _table.value
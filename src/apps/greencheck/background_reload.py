@@ -0,0 +1,90 @@
+"""
+Keeping in-memory tables that are slow to build, like our prefix-to-AS table,
+up to date without making the requests that need them wait.
+
+A `BackgroundReloader` builds a new value in a background thread when asked,
+and keeps serving the value it already has until the new one is ready. Until
+the first value is built, it serves None, and callers look things up the way
+they would without the table.
+
+With GREENCHECK_RELOAD_IN_BACKGROUND turned off, as in our tests, we build
+the new value before `reload` returns instead.
+"""
+
+import logging
+import threading
+import time
+import typing
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundReloader:
+    """
+    Hold the latest value returned by `load`, and run it again in a background
+    thread whenever `reload` is called, at most one at a time.
+    """
+
+    def __init__(self, name: str, load: typing.Callable[[], typing.Any]):
+        self.name = name
+        self._load = load
+        self._value = None
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._reload_again = False
+
+    @property
+    def value(self):
+        return self._value
+
+    def reload(self):
+        """
+        Start building a new value. If we are already building one, build
+        again once it is done, so we pick up changes made since it started.
+        """
+        with self._lock:
+            if self._reloading:
+                self._reload_again = True
+                return
+            self._reloading = True
+
+        if settings.GREENCHECK_RELOAD_IN_BACKGROUND:
+            threading.Thread(
+                target=self._reload_in_thread, name=f"reload {self.name}", daemon=True
+            ).start()
+        else:
+            self._reload_until_current()
+
+    def clear(self):
+        """
+        Forget the value we have, so we serve None until the next reload.
+        """
+        self._value = None
+
+    def _reload_in_thread(self):
+        try:
+            self._reload_until_current()
+        finally:
+            # there is no request cycle to close the connections this thread
+            # opened, if loading used the database
+            connections.close_all()
+
+    def _reload_until_current(self):
+        while True:
+            start = time.monotonic()
+            try:
+                self._value = self._load()
+                logger.info(
+                    f"Reloaded {self.name} in {time.monotonic() - start:.4f}s"
+                )
+            except Exception:
+                logger.exception(f"Unable to reload {self.name}, keeping the last one")
+
+            with self._lock:
+                if not self._reload_again:
+                    self._reloading = False
+                    return
+                self._reload_again = False
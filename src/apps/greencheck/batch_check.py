@@ -0,0 +1,151 @@
+"""
+Checking the domains in an uploaded CSV file in bulk, shared by the batch
+greencheck API, when streaming results back, and the background jobs that
+write results to object storage.
+
+We read the file a row at a time, and work through it in chunks of
+GREENCHECK_BATCH_LIVE_CHECK_CHUNK_SIZE domains, so memory use stays flat
+however large the upload is.
+"""
+
+import csv
+import itertools
+import logging
+import typing
+from io import TextIOWrapper
+
+import tld
+from django.conf import settings
+
+from ..accounts.models import Hostingprovider
+from . import models as gc_models
+from . import serializers as gc_serializers
+from .domain_check import GreenDomainChecker
+
+logger = logging.getLogger(__name__)
+
+# the columns of a batch check result
+RESULT_HEADER = gc_serializers.GreenDomainSerializer.Meta.fields
+
+
+def iter_csv_urls(url_file) -> typing.Iterator[str]:
+    """
+    Yield the url in the first column of each row of an uploaded CSV
+    file, reading the file a row at a time.
+    """
+    # attachments are by default binary, so we need to
+    # convert them to a format the CSV reader expects
+    encoded_file = TextIOWrapper(url_file, encoding="utf-8")
+    csv_file = csv.reader(encoded_file)
+
+    for row in csv_file:
+        if row:
+            url, *_ = row
+            yield url
+
+
+def batch_check_chunks(
+    urls: typing.Iterable[str], live_check: bool = True
+) -> typing.Iterator[typing.List[dict]]:
+    """
+    Yield a list of serialised results for each chunk of urls, in the order
+    given. We use our cached green and grey results where we have them. With
+    `live_check` set, we check the rest of each chunk together with
+    `GreenDomainChecker.check_domains`, otherwise we report them as grey.
+    """
+    checker = GreenDomainChecker()
+    urls = iter(urls)
+
+    while chunk := list(
+        itertools.islice(urls, settings.GREENCHECK_BATCH_LIVE_CHECK_CHUNK_SIZE)
+    ):
+        domains = {}
+        for url in chunk:
+            try:
+                domains[url] = tld.get_fld(url, fix_protocol=True)
+            except Exception:
+                logger.warning(f"unable to extract domain from {url}")
+
+        results = cached_results_for(set(domains.values()))
+        unchecked = [
+            domain for domain in dict.fromkeys(domains.values()) if domain not in results
+        ]
+        if live_check:
+            results.update(check_and_cache(checker, unchecked))
+
+        grey_domains = [
+            domain
+            for domain in dict.fromkeys(domains.get(url, url) for url in chunk)
+            if domain not in results
+        ]
+        for grey_domain in gc_models.GreenDomain.grey_results(grey_domains):
+            results[grey_domain.url] = grey_domain
+
+        green_domains = [results[domains.get(url, url)] for url in chunk]
+        yield gc_serializers.GreenDomainSerializer(green_domains, many=True).data
+
+
+def batch_check_rows(
+    urls: typing.Iterable[str], live_check: bool = True
+) -> typing.Iterator[dict]:
+    """
+    Yield a serialised result for each url, in the order given.
+    See `batch_check_chunks`.
+    """
+    for rows in batch_check_chunks(urls, live_check):
+        yield from rows
+
+
+def cached_results_for(domains: set) -> dict:
+    """
+    Return a dict of domain to the cached green or grey result
+    for each of the domains that we have one for.
+    """
+    results = {}
+    for green_domain in gc_models.GreenDomain.objects.filter(url__in=domains):
+        results.setdefault(green_domain.url, green_domain)
+
+    for domain in domains - results.keys():
+        if grey_domain := gc_models.GreenDomain.cached_grey_result(domain):
+            results[domain] = grey_domain
+    return results
+
+
+def check_and_cache(checker: GreenDomainChecker, domains: list) -> dict:
+    """
+    Run a full check of the domains, caching and logging the results like
+    `GreenDomain.green_domain_for` does, and return a dict of domain to
+    the resulting green or grey domain.
+    """
+    sitechecks = checker.check_domains(domains)
+    providers = Hostingprovider.objects.in_bulk(
+        {sitecheck.hosting_provider_id for sitecheck in sitechecks if sitecheck.green}
+    )
+
+    grey_domains = {
+        grey_domain.url: grey_domain
+        for grey_domain in gc_models.GreenDomain.grey_results(
+            [sitecheck.url for sitecheck in sitechecks if not sitecheck.green]
+        )
+    }
+
+    results = {}
+    new_green_domains = []
+    for sitecheck in sitechecks:
+        if sitecheck.green:
+            green_domain = gc_models.GreenDomain.from_sitecheck(
+                sitecheck, providers.get(sitecheck.hosting_provider_id)
+            )
+        else:
+            green_domain = grey_domains[sitecheck.url]
+
+        if green_domain.green:
+            new_green_domains.append(green_domain)
+        else:
+            gc_models.GreenDomain.cache_grey_result(green_domain)
+
+        gc_models.Greencheck.log_sitecheck_asynchronous(sitecheck)
+        results[sitecheck.url] = green_domain
+
+    gc_models.GreenDomain.save_green_results(new_green_domains)
+    return results
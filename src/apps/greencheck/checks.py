@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core import checks
+
+from .shared_cache import SHARED_CACHE, is_shared_between_processes
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Warn when deploying with a shared cache that only lives in the memory
+    of each process, as invalidating cached results relies on it.
+    """
+    if is_shared_between_processes():
+        return []
+    return [
+        checks.Warning(
+            f"The '{SHARED_CACHE}' cache is local memory, so cached results "
+            "cleared after a write are only cleared in the process that made it.",
+            hint="Set SHARED_CACHE_URL to a cache every process can reach.",
+            id="greencheck.W001",
+        )
+    ]
+
+
+@checks.register(checks.Tags.database, deploy=True)
+def check_read_replica(app_configs, **kwargs):
+    """
+    Warn when reading from the replica without a shared cache, as we can't
+    tell other processes to read a refreshed domain from the primary.
+    """
+    if not settings.READ_REPLICA_ENABLED or is_shared_between_processes():
+        return []
+    return [
+        checks.Warning(
+            "The read replica is enabled, but the shared cache is local memory, "
+            "so other processes may read refreshed domains from a lagging replica.",
+            hint="Set SHARED_CACHE_URL, or READ_REPLICA_ENABLED to False.",
+            id="greencheck.W002",
+        )
+    ]
@@ -18,6 +18,17 @@ class GreenlistChoice(models.TextChoices):
     CARBONTXT = "carbontxt", _("carbon.txt")
 
 
+class AddressCoverage(models.TextChoices):
+    """
+    Choices for describing how many of the IP addresses a domain
+    resolves to were found to be green.
+    """
+
+    ALL = "all", _("all")
+    SOME = "some", _("some")
+    NONE = "none", _("none")
+
+
 class CheckedOptions(models.TextChoices):
     """
     Options for describing the source of the green check.
@@ -79,3 +90,14 @@ class GreenStatChoice(models.TextChoices):
 
     YES = "yes"  #  for green domains
     NO = "no"  #  for grey domains
+
+
+class BatchCheckJobStatus(models.TextChoices):
+    """
+    Choices to describe how far along a batch check job is.
+    """
+
+    PENDING = "pending", _("Pending")
+    RUNNING = "running", _("Running")
+    COMPLETED = "completed", _("Completed")
+    FAILED = "failed", _("Failed")
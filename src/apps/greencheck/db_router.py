@@ -0,0 +1,145 @@
+"""
+Sending the reads for our busiest public views to the read replica, to take
+load off the primary database.
+
+Views opt in with the `replica_reads` decorator. While one of them handles
+a request, reads of greencheck and accounts models go to the replica, unless:
+
+- we are inside a transaction,
+- the request has already written something, so we read our own writes,
+- the domain being read was refreshed within READ_REPLICA_LAG seconds, so
+  the replica may not have caught up yet (see `mark_refreshed`),
+- the replica is down, in which case we leave it alone for
+  READ_REPLICA_RETRY_AFTER seconds.
+
+We check the replica is up at most every READ_REPLICA_CHECK_INTERVAL
+seconds, rather than connecting to it on every request.
+
+Reading our own writes needs the shared cache to be shared between
+processes, so the replica is off by default unless SHARED_CACHE_URL is set.
+
+Writes always go to the primary.
+"""
+
+import contextlib
+import contextvars
+import functools
+import logging
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .shared_cache import refreshed_domain_key, shared_cache
+
+logger = logging.getLogger(__name__)
+
+# The replica's alias in DATABASES
+REPLICA_DATABASE = "read_only"
+
+# The apps whose models we read from the replica
+REPLICA_APP_LABELS = {"greencheck", "accounts"}
+
+_reads_from_replica = contextvars.ContextVar("reads_from_replica", default=False)
+
+_replica_down_until = 0.0
+_replica_up_until = 0.0
+
+
+class ReadReplicaRouter:
+    """
+    Route reads to the replica for code running inside `read_from_replica`,
+    and everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _reads_from_replica.get():
+            return None
+        if model._meta.app_label not in REPLICA_APP_LABELS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return REPLICA_DATABASE
+
+    def db_for_write(self, model, **hints):
+        # once we have written something, read the rest of the request from
+        # the primary, so we see our own writes despite replica lag
+        _reads_from_replica.set(False)
+        # objects read from the replica would otherwise be saved back to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same data as the primary
+        databases = {DEFAULT_DB_ALIAS, REPLICA_DATABASE}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+def replica_available() -> bool:
+    """
+    Return True if we can connect to the replica, remembering the answer,
+    so we only check again after READ_REPLICA_CHECK_INTERVAL seconds if it
+    was up, or READ_REPLICA_RETRY_AFTER seconds if it was down.
+    """
+    global _replica_down_until, _replica_up_until
+
+    now = time.monotonic()
+    if now < _replica_up_until:
+        return True
+    if now < _replica_down_until:
+        return False
+
+    try:
+        connections[REPLICA_DATABASE].ensure_connection()
+    except DatabaseError as err:
+        logger.warning(f"Read replica unavailable, using the primary: {err}")
+        _replica_down_until = now + settings.READ_REPLICA_RETRY_AFTER
+        return False
+    _replica_up_until = now + settings.READ_REPLICA_CHECK_INTERVAL
+    return True
+
+
+@contextlib.contextmanager
+def read_from_replica():
+    """
+    Send reads inside this block to the replica, if it is enabled and available.
+    """
+    token = _reads_from_replica.set(
+        settings.READ_REPLICA_ENABLED and replica_available()
+    )
+    try:
+        yield
+    finally:
+        _reads_from_replica.reset(token)
+
+
+def replica_reads(view):
+    """
+    Decorate a view, so the reads it makes go to the replica.
+    """
+
+    @functools.wraps(view)
+    def wrapped_view(*args, **kwargs):
+        with read_from_replica():
+            return view(*args, **kwargs)
+
+    return wrapped_view
+
+
+def mark_refreshed(domain: str):
+    """
+    Remember that we have just rewritten our results for a domain, so we
+    read them from the primary until the replica has caught up.
+    """
+    shared_cache().set(refreshed_domain_key(domain), True, timeout=settings.READ_REPLICA_LAG)
+
+
+def read_from_primary_if_refreshed(domain: str):
+    """
+    If we are reading from the replica, but the domain's results were
+    refreshed too recently for it to have caught up, read the rest of
+    this request from the primary.
+    """
+    if _reads_from_replica.get() and shared_cache().get(refreshed_domain_key(domain)):
+        _reads_from_replica.set(False)
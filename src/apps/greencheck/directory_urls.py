@@ -1,8 +1,8 @@
 from django.urls import path
-from django.views.decorators.cache import cache_page
-from django.conf import settings
+from .db_router import replica_reads
 from .views import DirectoryView
 
 urlpatterns = [
-    path("", cache_page(settings.DIRECTORY_CACHE_TIMEOUT)(DirectoryView.as_view()), name="directory-index"),
+    # the list of providers on this page is cached, see DirectoryView
+    path("", replica_reads(DirectoryView.as_view()), name="directory-index"),
 ]
@@ -0,0 +1,259 @@
+"""
+The resolvers we use to turn a domain into the IP addresses it points to.
+
+By default we use `CachingResolver`, which queries DNS directly with an
+async stub resolver, so each query is bounded by a timeout, and we can
+resolve many domains at once. It remembers answers for as long as their
+TTL allows, and remembers domains that don't resolve for a while too.
+
+The resolver is chosen with the DNS_RESOLVER setting, so it can be swapped
+for `SystemResolver`, which uses the operating system's resolver like we
+used to, or `StaticResolver`, a local fake for tests and benchmarks.
+"""
+
+import asyncio
+import collections
+import ipaddress
+import logging
+import socket
+import threading
+import time
+import typing
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+IpAddress = typing.Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+
+def ip_literal(domain: str) -> typing.Union[IpAddress, None]:
+    """
+    Return the IP address if we have been given one instead of
+    a domain, otherwise None.
+    """
+    try:
+        return ipaddress.ip_address(domain)
+    except ValueError:
+        return None
+
+
+class Resolver:
+    """
+    The interface every resolver provides. Resolving a domain returns all
+    of its IP addresses, or raises socket.gaierror if it doesn't resolve.
+    """
+
+    def resolve(self, domain: str) -> typing.List[IpAddress]:
+        raise NotImplementedError
+
+    def resolve_many(
+        self, domains: typing.Iterable[str]
+    ) -> typing.Dict[str, typing.Union[typing.List[IpAddress], Exception]]:
+        """
+        Resolve several domains, returning a dict of domain to either its
+        addresses, or the exception raised trying to resolve it.
+        """
+        results = {}
+        for domain in domains:
+            try:
+                results[domain] = self.resolve(domain)
+            except Exception as err:
+                results[domain] = err
+        return results
+
+
+class SystemResolver(Resolver):
+    """
+    Resolve domains with the operating system's resolver, via getaddrinfo.
+    """
+
+    def resolve(self, domain: str) -> typing.List[IpAddress]:
+        # each item in the list is a tuple containing:
+
+        # Address family (like socket.AF_INET for IPv4 or socket.AF_INET6 for IPv6)
+        # Socket type (like socket.SOCK_STREAM for TCP or socket.SOCK_DGRAM for UDP)
+        # Protocol (usually just 0)
+        # Canonical name (an alias for the host, if applicable)
+        # Socket address (a tuple containing the IP address and port number)
+        ip_info = socket.getaddrinfo(domain, None)
+
+        addresses = []
+        for *_, socket_address in ip_info:
+            address = ipaddress.ip_address(socket_address[0])
+            if address not in addresses:
+                addresses.append(address)
+        return addresses
+
+
+class StaticResolver(Resolver):
+    """
+    Resolve domains from a fixed mapping of domain to addresses, without
+    touching the network. Domains not in the mapping don't resolve.
+    """
+
+    def __init__(self, records: typing.Dict[str, typing.List[str]] = None):
+        self.records = records or {}
+
+    def resolve(self, domain: str) -> typing.List[IpAddress]:
+        if (address := ip_literal(domain)) is not None:
+            return [address]
+        if domain not in self.records:
+            raise socket.gaierror(socket.EAI_NONAME, f"No records for {domain}")
+        return [ipaddress.ip_address(address) for address in self.records[domain]]
+
+
+class CachingResolver(Resolver):
+    """
+    Resolve A and AAAA records with an async stub resolver, caching answers
+    in this process for as long as their TTL allows, and caching domains
+    that don't exist for DNS_NEGATIVE_CACHE_TTL seconds.
+    """
+
+    def __init__(
+        self,
+        timeout: float = None,
+        max_concurrency: int = None,
+        max_entries: int = None,
+        min_ttl: int = None,
+        max_ttl: int = None,
+        negative_ttl: int = None,
+    ):
+        self.timeout = timeout or settings.DNS_RESOLVER_TIMEOUT
+        self.max_concurrency = max_concurrency or settings.DNS_RESOLVER_MAX_CONCURRENCY
+        self.max_entries = max_entries or settings.DNS_CACHE_MAX_ENTRIES
+        self.min_ttl = min_ttl if min_ttl is not None else settings.DNS_CACHE_MIN_TTL
+        self.max_ttl = max_ttl if max_ttl is not None else settings.DNS_CACHE_MAX_TTL
+        self.negative_ttl = (
+            negative_ttl if negative_ttl is not None else settings.DNS_NEGATIVE_CACHE_TTL
+        )
+
+        # domain -> (expiry time, list of addresses, or None if it doesn't exist)
+        self._cache = collections.OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._stub_resolver = None
+
+    # Cache
+
+    def _cached(self, domain: str):
+        with self._cache_lock:
+            entry = self._cache.get(domain)
+            if entry is None:
+                return None
+            expires_at, _ = entry
+            if expires_at < time.monotonic():
+                del self._cache[domain]
+                return None
+            self._cache.move_to_end(domain)
+            return entry
+
+    def _store(self, domain: str, addresses, ttl: int):
+        with self._cache_lock:
+            self._cache[domain] = (time.monotonic() + ttl, addresses)
+            self._cache.move_to_end(domain)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    # Lookups
+
+    async def _query(self, resolver, domain: str, record_type: str):
+        """
+        Return a list of addresses, and the TTL they can be cached for.
+        A domain with no records of this type returns an empty list.
+        """
+        try:
+            answer = await resolver.resolve(
+                domain, record_type, lifetime=self.timeout, search=False
+            )
+        except dns.resolver.NoAnswer:
+            return [], None
+        return [ipaddress.ip_address(rdata.address) for rdata in answer], answer.rrset.ttl
+
+    async def _resolve(self, resolver, domain: str) -> typing.List[IpAddress]:
+        if (address := ip_literal(domain)) is not None:
+            return [address]
+
+        if cached := self._cached(domain):
+            _, addresses = cached
+            if addresses is None:
+                raise socket.gaierror(socket.EAI_NONAME, f"{domain} does not resolve (cached)")
+            return addresses
+
+        try:
+            answers = await asyncio.gather(
+                self._query(resolver, domain, "A"),
+                self._query(resolver, domain, "AAAA"),
+            )
+        except dns.resolver.NXDOMAIN:
+            self._store(domain, None, self.negative_ttl)
+            raise socket.gaierror(socket.EAI_NONAME, f"{domain} does not exist")
+        except dns.exception.Timeout:
+            # we don't cache timeouts, as they are usually temporary
+            raise socket.gaierror(socket.EAI_AGAIN, f"Timed out resolving {domain}")
+        except dns.exception.DNSException as err:
+            raise socket.gaierror(socket.EAI_FAIL, f"Unable to resolve {domain}: {err}")
+
+        addresses = [address for found, _ in answers for address in found]
+        if not addresses:
+            self._store(domain, None, self.negative_ttl)
+            raise socket.gaierror(socket.EAI_NONAME, f"{domain} has no addresses")
+
+        ttl = min(ttl for found, ttl in answers if found)
+        self._store(domain, addresses, max(self.min_ttl, min(ttl, self.max_ttl)))
+        return addresses
+
+    async def _resolve_many(self, domains: typing.List[str]):
+        # we read the system's nameserver config once, on first use
+        if self._stub_resolver is None:
+            self._stub_resolver = dns.asyncresolver.Resolver()
+        resolver = self._stub_resolver
+        limit = asyncio.Semaphore(self.max_concurrency)
+
+        async def resolve_one(domain):
+            async with limit:
+                try:
+                    return await self._resolve(resolver, domain)
+                except Exception as err:
+                    return err
+
+        results = await asyncio.gather(*[resolve_one(domain) for domain in domains])
+        return dict(zip(domains, results))
+
+    def resolve(self, domain: str) -> typing.List[IpAddress]:
+        result = self.resolve_many([domain])[domain]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def resolve_many(
+        self, domains: typing.Iterable[str]
+    ) -> typing.Dict[str, typing.Union[typing.List[IpAddress], Exception]]:
+        # look up each domain once, however many times it is passed in
+        unique_domains = list(dict.fromkeys(domains))
+        return asyncio.run(self._resolve_many(unique_domains))
+
+
+_resolver = None
+_resolver_path = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver() -> Resolver:
+    """
+    Return this process's resolver, of the class named in DNS_RESOLVER.
+    """
+    global _resolver, _resolver_path
+
+    with _resolver_lock:
+        if _resolver is None or _resolver_path != settings.DNS_RESOLVER:
+            _resolver_path = settings.DNS_RESOLVER
+            _resolver = import_string(_resolver_path)()
+        return _resolver
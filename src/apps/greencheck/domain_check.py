@@ -11,12 +11,27 @@ This follows largely the same approach:
 4. if no match, look up ASN from provided ip address
 5. check against registered ASNs
 6. if no matches left, report grey
+
+With GREENCHECK_CHECK_ALL_ADDRESSES set, we convert the domain to every ip
+address it resolves to in step 2, and check them all at once, reporting whether
+all, some or none of them were green.
+
+Before any of this, we look for a carbon.txt for the domain. With
+GREENCHECK_PARALLEL_STAGES set, we look for the carbon.txt in a separate
+thread while we run the steps above, so a check takes as long as the slower
+of the two, rather than both added together.
 """
 
 import ipaddress
 import logging
 import socket
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
 
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
 from ipwhois.exceptions import (
     ASNLookupError,
     ASNOriginLookupError,
@@ -25,15 +40,79 @@ from ipwhois.exceptions import (
     IPDefinedError,
 )
 
+from .choices import AddressCoverage
+from .dns_resolver import get_resolver
 from .instrument import instrument
+from .ip_range_index import green_ip_range_index
 from .models.site_check import SiteCheck
-from .network_utils import asn_from_ip, convert_domain_to_ip, order_ip_range_by_size
+from .network_utils import (
+    asn_from_ip,
+    convert_domain_to_ip,
+    convert_domain_to_ips,
+    order_ip_range_by_size,
+)
 from ..accounts.models import ProviderCarbonTxt
 
 logger = logging.getLogger(__name__)
 
 UNRESOLVED_ADDRESS = "0.0.0.0"
 
+# the most addresses we match in a single query, when we
+# aren't using the in-memory index of ip ranges
+IP_RANGE_QUERY_BATCH_SIZE = 500
+
+# the pools of threads we run check stages in, by name. We keep them, and the
+# database connection each thread opens, for as long as the process runs, so
+# each check doesn't pay to connect to the database again
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def shared_executor(name: str, max_workers: int) -> ThreadPoolExecutor:
+    """
+    Return the pool of threads called `name`, creating it on first use.
+    """
+    with _executors_lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix=name
+            )
+        return _executors[name]
+
+
+def stage_executor() -> ThreadPoolExecutor:
+    """
+    Return the pool of threads we run check stages in, when running
+    them in parallel.
+    """
+    return shared_executor("greencheck-stage", settings.GREENCHECK_STAGE_WORKERS)
+
+
+def batch_executor() -> ThreadPoolExecutor:
+    """
+    Return the pool of threads we look up carbon.txt files in, when
+    checking many domains at once.
+    """
+    return shared_executor(
+        "greencheck-batch", settings.GREENCHECK_BATCH_CARBON_TXT_WORKERS
+    )
+
+
+def run_in_stage_thread(stage, *args, **kwargs):
+    """
+    Run a check stage, reusing the database connection this thread opened
+    for earlier stages, unless it has stopped working.
+
+    There is no request cycle to close connections in these threads, so
+    we check the connection ourselves, like Django does with
+    CONN_HEALTH_CHECKS, rather than reconnecting for every stage.
+    """
+    if connection.connection is not None and (
+        connection.errors_occurred or not connection.is_usable()
+    ):
+        connection.close()
+    return stage(*args, **kwargs)
+
 
 class GreenDomainChecker:
     """
@@ -48,12 +127,18 @@ class GreenDomainChecker:
         the best matching IP range for the ip address it resolves to,
         or a 'grey' Sitecheck
         """
+        if settings.GREENCHECK_PARALLEL_STAGES:
+            return self.check_domain_in_parallel(domain, refresh_carbon_txt_cache)
+
         ip_address = None
         try:
             # First, check for a green provider match by carbon_txt
             if carbon_txt := self.check_for_matching_carbon_txt(domain, refresh_carbon_txt_cache):
                     return SiteCheck.green_sitecheck_by_carbon_txt(domain, carbon_txt)
 
+            if settings.GREENCHECK_CHECK_ALL_ADDRESSES:
+                return self.check_all_addresses(domain)
+
             # If this fails, attempt to resolve the IP address for the domain
             if ip_address := self.ip_for_domain(domain):
                 # If we get a matching IP, check whether it matches the known ranges for a green provider
@@ -71,14 +156,206 @@ class GreenDomainChecker:
             ip_address = UNRESOLVED_ADDRESS
         return SiteCheck.grey_sitecheck(domain, ip_address)
 
+    def check_domain_in_parallel(self, domain: str, refresh_carbon_txt_cache : bool = False) -> SiteCheck:
+        """
+        Run the same checks as `check_domain`, but look for a carbon.txt in a
+        separate thread while we resolve and check the domain's IP address.
+        A valid carbon.txt still takes precedence over an IP range or ASN match.
+        """
+        carbon_txt_lookup = stage_executor().submit(
+            run_in_stage_thread,
+            self.check_for_matching_carbon_txt,
+            domain,
+            refresh_carbon_txt_cache,
+        )
+
+        ip_address = None
+        network_sitecheck = None
+        try:
+            if settings.GREENCHECK_CHECK_ALL_ADDRESSES:
+                network_sitecheck = self.check_all_addresses(domain)
+            elif ip_address := self.ip_for_domain(domain):
+                if ip_match := self.check_for_matching_ip_ranges(ip_address):
+                    network_sitecheck = SiteCheck.green_sitecheck_by_ip_range(domain, ip_address, ip_match)
+                elif matching_asn := self.check_for_matching_asn(ip_address):
+                    network_sitecheck = SiteCheck.green_sitecheck_by_asn(domain, ip_address, matching_asn)
+        except (socket.gaierror, UnicodeError):
+            pass
+
+        try:
+            carbon_txt = carbon_txt_lookup.result()
+        except (socket.gaierror, UnicodeError):
+            carbon_txt = None
+
+        if carbon_txt:
+            return SiteCheck.green_sitecheck_by_carbon_txt(domain, carbon_txt)
+
+        if network_sitecheck:
+            return network_sitecheck
+
+        if not ip_address:
+            ip_address = UNRESOLVED_ADDRESS
+        return SiteCheck.grey_sitecheck(domain, ip_address)
+
+    def check_all_addresses(self, domain: str) -> SiteCheck:
+        """
+        Check every ip address the domain resolves to, against our ip ranges
+        first, then the ASNs of any addresses left over, returning a
+        SiteCheck that reports whether all, some or none were green.
+        """
+        ip_addresses = self.ips_for_domain(domain)
+        ip_matches = dict(
+            zip(ip_addresses, self.check_for_matching_ip_ranges_for_all(ip_addresses))
+        )
+
+        unmatched = [ip_address for ip_address in ip_addresses if ip_matches[ip_address] is None]
+        asn_matches = dict(zip(unmatched, self.check_for_matching_asns(unmatched)))
+
+        return self.sitecheck_for_addresses(
+            domain, ip_addresses, ip_matches, asn_matches, report_coverage=True
+        )
+
+    def check_domains(
+        self, domains: typing.Iterable[str], refresh_carbon_txt_cache: bool = False
+    ) -> typing.List[SiteCheck]:
+        """
+        Check many domains at once, returning a SiteCheck for each, in the
+        order the domains were given. Domains given more than once are only
+        checked once.
+
+        We look for each domain's carbon.txt in a pool of threads, while
+        resolving all the domains concurrently. We then match all the
+        addresses against our ip ranges together, and look up the green ASNs
+        for any left over with a single query.
+        """
+        domains = list(domains)
+        unique_domains = list(dict.fromkeys(domains))
+        if not unique_domains:
+            return []
+
+        executor = batch_executor()
+        carbon_txt_lookups = {
+            domain: executor.submit(
+                run_in_stage_thread,
+                self.check_for_matching_carbon_txt,
+                domain,
+                refresh_carbon_txt_cache,
+            )
+            for domain in unique_domains
+        }
+
+        addresses_by_domain = self.ips_for_domains(unique_domains)
+        if not settings.GREENCHECK_CHECK_ALL_ADDRESSES:
+            addresses_by_domain = {
+                domain: ip_addresses[:1]
+                for domain, ip_addresses in addresses_by_domain.items()
+            }
+
+        all_addresses = list(
+            dict.fromkeys(
+                ip_address
+                for ip_addresses in addresses_by_domain.values()
+                for ip_address in ip_addresses
+            )
+        )
+        ip_matches = dict(
+            zip(all_addresses, self.check_for_matching_ip_ranges_for_all(all_addresses))
+        )
+        unmatched = [
+            ip_address for ip_address in all_addresses if ip_matches[ip_address] is None
+        ]
+        asn_matches = dict(zip(unmatched, self.check_for_matching_asns(unmatched)))
+
+        sitechecks = {}
+        for domain in unique_domains:
+            try:
+                carbon_txt = carbon_txt_lookups[domain].result()
+            except Exception as err:
+                logger.warning(
+                    f"Unable to check carbon.txt for: {domain} - error was: {err}"
+                )
+                carbon_txt = None
+
+            if carbon_txt:
+                sitechecks[domain] = SiteCheck.green_sitecheck_by_carbon_txt(
+                    domain, carbon_txt
+                )
+            else:
+                sitechecks[domain] = self.sitecheck_for_addresses(
+                    domain,
+                    addresses_by_domain[domain],
+                    ip_matches,
+                    asn_matches,
+                    report_coverage=settings.GREENCHECK_CHECK_ALL_ADDRESSES,
+                )
+
+        return [sitechecks[domain] for domain in domains]
+
+    def sitecheck_for_addresses(
+        self,
+        domain: str,
+        ip_addresses: list,
+        ip_matches: dict,
+        asn_matches: dict,
+        report_coverage: bool = False,
+    ) -> SiteCheck:
+        """
+        Return the SiteCheck for a domain, given the addresses it resolved to,
+        and the ip ranges and green ASNs we matched them to, keyed by address.
+
+        A domain counts as green if any of its addresses are green, and we
+        report the match for the first green address, in the order the
+        addresses were resolved. With `report_coverage` set, we also report
+        whether all, some or none of the addresses were green.
+        """
+        green_count = 0
+        first_green = None
+        for ip_address in ip_addresses:
+            ip_match = ip_matches.get(ip_address)
+            matching_asn = asn_matches.get(ip_address)
+            if ip_match is None and matching_asn is None:
+                continue
+            green_count += 1
+            if first_green is None:
+                first_green = (ip_address, ip_match, matching_asn)
+
+        address_coverage = None
+        if report_coverage:
+            if ip_addresses and green_count == len(ip_addresses):
+                address_coverage = AddressCoverage.ALL.value
+            elif green_count:
+                address_coverage = AddressCoverage.SOME.value
+            else:
+                address_coverage = AddressCoverage.NONE.value
+
+        if first_green is None:
+            ip_address = ip_addresses[0] if ip_addresses else UNRESOLVED_ADDRESS
+            return SiteCheck.grey_sitecheck(domain, ip_address, address_coverage)
+
+        ip_address, ip_match, matching_asn = first_green
+        if ip_match is not None:
+            return SiteCheck.green_sitecheck_by_ip_range(
+                domain, ip_address, ip_match, address_coverage
+            )
+        return SiteCheck.green_sitecheck_by_asn(
+            domain, ip_address, matching_asn, address_coverage
+        )
+
     @instrument("IP range check", "ip_address")
     def check_for_matching_ip_ranges(self, ip_address):
         """
         Look up the IP ranges that include this IP address, and return
         a list of IP ranges, ordered by smallest, most precise range first.
+
+        When GREEN_IP_RANGE_INDEX_ENABLED is set, we use the in-memory index
+        of active ranges, once it is built, instead of querying the database.
         """
         from .models import GreencheckIp
 
+        if settings.GREEN_IP_RANGE_INDEX_ENABLED:
+            if (index := green_ip_range_index()) is not None:
+                return index.smallest_range_for(ip_address)
+
         ip_matches = GreencheckIp.objects.filter(
             ip_end__gte=ip_address, ip_start__lte=ip_address, active=True
         )
@@ -91,6 +368,57 @@ class GreenDomainChecker:
         if ordered_matches:
             return ordered_matches[0]
 
+    @instrument("IP range check for all addresses", "ip_addresses")
+    def check_for_matching_ip_ranges_for_all(self, ip_addresses) -> list:
+        """
+        Return the smallest active IP range containing each of the given
+        IP addresses, in the same order, with None for addresses in no range.
+
+        We look these up in a single pass over the in-memory index, or when
+        it is disabled or not built yet, a single query for the ranges containing
+        any of the addresses, per IP_RANGE_QUERY_BATCH_SIZE addresses.
+        """
+        from .models import GreencheckIp
+
+        if not ip_addresses:
+            return []
+
+        if settings.GREEN_IP_RANGE_INDEX_ENABLED:
+            if (index := green_ip_range_index()) is not None:
+                return index.smallest_ranges_for(ip_addresses)
+
+        ip_ranges = {}
+        for offset in range(0, len(ip_addresses), IP_RANGE_QUERY_BATCH_SIZE):
+            contains_any_address = Q()
+            for ip_address in ip_addresses[offset : offset + IP_RANGE_QUERY_BATCH_SIZE]:
+                contains_any_address |= Q(ip_end__gte=ip_address, ip_start__lte=ip_address)
+
+            for ip_range in GreencheckIp.objects.filter(contains_any_address, active=True):
+                ip_ranges[ip_range.id] = ip_range
+
+        ip_ranges = order_ip_range_by_size(
+            sorted(ip_ranges.values(), key=lambda ip_range: ip_range.id)
+        )
+
+        # we compare the integer values, like the database does, as
+        # ipv4 and ipv6 addresses can't be compared with each other
+        ip_matches = []
+        for ip_address in ip_addresses:
+            address = int(ipaddress.ip_address(ip_address))
+            ip_matches.append(
+                next(
+                    (
+                        ip_range
+                        for ip_range in ip_ranges
+                        if int(ipaddress.ip_address(ip_range.ip_start))
+                        <= address
+                        <= int(ipaddress.ip_address(ip_range.ip_end))
+                    ),
+                    None,
+                )
+            )
+        return ip_matches
+
     @instrument("Carbon.txt check", "domain")
     def check_for_matching_carbon_txt(self, domain, refresh_carbon_txt_cache):
         if carbon_txt := ProviderCarbonTxt.find_for_domain(domain, refresh_cache=refresh_carbon_txt_cache):
@@ -140,6 +468,60 @@ class GreenDomainChecker:
                 return asn_match.first()
 
 
+    @instrument("ASN check for all addresses", "ip_addresses")
+    def check_for_matching_asns(self, ip_addresses) -> list:
+        """
+        Return the green ASN that each of the given IP addresses 'belongs'
+        to, in the same order, with None for addresses we found no green
+        ASN for. We look up all the ASNs in a single query.
+        """
+        from .models import GreencheckASN
+
+        # look up each address once, even if several domains share it
+        asns_by_address = {}
+        for ip_address in dict.fromkeys(ip_addresses):
+            try:
+                asn_result = asn_from_ip(ip_address)
+            except Exception as err:
+                logger.warning(
+                    f"Unable to parse ASN for IP: {ip_address} - error type: {type(err).__name__} {err}"
+                )
+                asn_result = None
+            asns_by_address[ip_address] = self.parse_asns(ip_address, asn_result)
+
+        candidate_asns = [asns_by_address[ip_address] for ip_address in ip_addresses]
+        all_asns = {asn for asns in candidate_asns for asn in asns}
+        if not all_asns:
+            return [None] * len(ip_addresses)
+
+        green_asns = {}
+        for green_asn in GreencheckASN.objects.filter(asn__in=all_asns, active=True).order_by("id"):
+            green_asns.setdefault(green_asn.asn, green_asn)
+
+        return [
+            next((green_asns[asn] for asn in asns if asn in green_asns), None)
+            for asns in candidate_asns
+        ]
+
+    def parse_asns(self, ip_address, asn_result) -> list:
+        """
+        Return the ASNs in a result from `asn_from_ip`, which is either a
+        single ASN, or a string of them separated by spaces, skipping any
+        part of the result that isn't a number.
+        """
+        if isinstance(asn_result, int):
+            return [asn_result]
+        if not asn_result or asn_result == "NA":
+            return []
+
+        asns = []
+        for asn in asn_result.split():
+            try:
+                asns.append(int(asn))
+            except ValueError:
+                logger.warning(f"Skipping malformed ASN for IP: {ip_address} - {asn}")
+        return asns
+
     @instrument("IP lookup for domain name", "domain")
     def ip_for_domain(self, domain):
         try:
@@ -152,3 +534,34 @@ class GreenDomainChecker:
                 f"Unexpected exception looking up: {domain} - error was: {err}"
             )
             pass
+
+    @instrument("IP lookup for all addresses of domain name", "domain")
+    def ips_for_domain(self, domain) -> list:
+        try:
+            return convert_domain_to_ips(domain)
+        except (ipaddress.AddressValueError, socket.gaierror):
+            return []
+        except Exception as err:
+            logger.warning(
+                f"Unexpected exception looking up: {domain} - error was: {err}"
+            )
+            return []
+
+    @instrument("IP lookup for many domain names", "domains")
+    def ips_for_domains(self, domains) -> typing.Dict[str, list]:
+        """
+        Resolve all the given domains concurrently, returning a dict of
+        domain to the addresses it resolves to, or an empty list if it
+        doesn't resolve.
+        """
+        addresses_by_domain = {}
+        for domain, result in get_resolver().resolve_many(domains).items():
+            if isinstance(result, (ipaddress.AddressValueError, socket.gaierror)):
+                result = []
+            elif isinstance(result, Exception):
+                logger.warning(
+                    f"Unexpected exception looking up: {domain} - error was: {result}"
+                )
+                result = []
+            addresses_by_domain[domain] = result
+        return addresses_by_domain
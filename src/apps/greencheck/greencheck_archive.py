@@ -0,0 +1,211 @@
+"""
+Moving old greenchecks out of MySQL, into compressed Parquet files, so the
+greencheck table only holds recent checks, while we can still analyse the
+older ones offline.
+
+Archived checks are kept in one directory per day they were made in, like
+`day=2024-01-31/greenchecks-1001-2000.parquet`, where the numbers are the
+range of greencheck ids in the chunk we archived the file from. That lets
+us read only the days we need, and makes re-running an interrupted
+archive overwrite the files it wrote, rather than duplicating them.
+
+When GREENCHECK_ARCHIVE_BUCKET is set, files are uploaded to object
+storage, and the local directory only serves as a cache for queries.
+"""
+
+import collections
+import csv
+import datetime
+import logging
+import os
+import tempfile
+import typing
+
+import duckdb
+from django.conf import settings
+
+from .models import Greencheck
+from .object_storage import object_storage_bucket
+
+logger = logging.getLogger(__name__)
+
+# the greencheck columns we archive, and their types in the Parquet files
+ARCHIVE_COLUMNS = {
+    "id": "BIGINT",
+    "hostingprovider": "INTEGER",
+    "greencheck_ip": "INTEGER",
+    "date": "TIMESTAMP",
+    "green": "VARCHAR",
+    "ip": "VARCHAR",
+    "tld": "VARCHAR",
+    "type": "VARCHAR",
+    "url": "VARCHAR",
+}
+
+
+class GreencheckArchive:
+    """
+    An archive of greenchecks, in a local directory, and optionally in an
+    object storage bucket.
+    """
+
+    def __init__(self, directory: str, bucket_name: str = None, prefix: str = ""):
+        self.directory = directory
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+
+    @classmethod
+    def from_settings(cls) -> "GreencheckArchive":
+        return cls(
+            settings.GREENCHECK_ARCHIVE_DIR,
+            bucket_name=settings.GREENCHECK_ARCHIVE_BUCKET or None,
+            prefix="greenchecks/",
+        )
+
+    def archive_before(self, cutoff: datetime.datetime, chunk_size: int) -> int:
+        """
+        Move every greencheck made before `cutoff` into the archive, in
+        chunks of `chunk_size`, deleting each chunk from the database once
+        it is archived.
+        Returns the number of greenchecks archived.
+        """
+        archived = 0
+        while True:
+            rows = list(
+                Greencheck.objects.filter(date__lt=cutoff)
+                .order_by("id")
+                .values_list(*ARCHIVE_COLUMNS)[:chunk_size]
+            )
+            if not rows:
+                return archived
+
+            first_id, last_id = rows[0][0], rows[-1][0]
+            self._archive_chunk(rows, f"greenchecks-{first_id}-{last_id}.parquet")
+
+            # ids only ever go up, so every check before the cutoff in this
+            # range of ids is one we just archived
+            Greencheck.objects.filter(
+                id__gte=first_id, id__lte=last_id, date__lt=cutoff
+            ).delete()
+            archived += len(rows)
+            logger.info(f"Archived greenchecks {first_id} to {last_id}")
+
+    def query(
+        self,
+        start: datetime.date,
+        end: datetime.date,
+        sql: str = "SELECT * FROM greenchecks ORDER BY id",
+    ) -> typing.List[dict]:
+        """
+        Run `sql` against the greenchecks archived from `start` to `end`
+        inclusive, available to it as the `greenchecks` view, and return
+        the resulting rows as dicts.
+        """
+        if self.bucket_name:
+            self._fetch_days(start, end)
+
+        paths = []
+        for day in _days(start, end):
+            day_directory = os.path.join(self.directory, _day_path(day))
+            if os.path.isdir(day_directory):
+                paths.extend(
+                    os.path.join(day_directory, name)
+                    for name in sorted(os.listdir(day_directory))
+                    if name.endswith(".parquet")
+                )
+
+        with duckdb.connect() as connection:
+            if paths:
+                connection.read_parquet(paths).create_view("greenchecks")
+            else:
+                connection.execute(f"CREATE VIEW greenchecks AS {_empty_select()}")
+
+            cursor = connection.execute(sql)
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _archive_chunk(self, rows: list, file_name: str):
+        rows_by_day = collections.defaultdict(list)
+        for row in rows:
+            checked_at = _naive_datetime(row[3])
+            rows_by_day[checked_at.date()].append(
+                [
+                    *row[:3],
+                    checked_at.isoformat(sep=" "),
+                    row[4],
+                    str(row[5]) if row[5] is not None else None,
+                    *row[6:],
+                ]
+            )
+
+        for day, day_rows in rows_by_day.items():
+            path = os.path.join(self.directory, _day_path(day), file_name)
+            _write_parquet(path, day_rows)
+
+            if self.bucket_name:
+                bucket = object_storage_bucket(self.bucket_name)
+                bucket.upload_file(path, f"{self.prefix}{_day_path(day)}/{file_name}")
+                os.remove(path)
+
+    def _fetch_days(self, start: datetime.date, end: datetime.date):
+        """
+        Download the archived files for each day from `start` to `end` that
+        we don't already have locally.
+        """
+        bucket = object_storage_bucket(self.bucket_name)
+        for day in _days(start, end):
+            day_prefix = f"{self.prefix}{_day_path(day)}/"
+            for archived_file in bucket.objects.filter(Prefix=day_prefix):
+                path = os.path.join(
+                    self.directory, _day_path(day), archived_file.key[len(day_prefix) :]
+                )
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    bucket.download_file(archived_file.key, path)
+
+
+def _write_parquet(path: str, rows: list):
+    """
+    Write rows of greencheck values to a zstd compressed Parquet file at
+    `path`, via a CSV file that DuckDB can load in one go.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".csv", newline="", encoding="utf-8"
+    ) as csv_file:
+        csv.writer(csv_file).writerows(rows)
+        csv_file.flush()
+
+        with duckdb.connect() as connection:
+            relation = connection.read_csv(
+                csv_file.name,
+                header=False,
+                columns=ARCHIVE_COLUMNS,
+                timestamp_format="%Y-%m-%d %H:%M:%S",
+            )
+            relation.write_parquet(path, compression="zstd")
+
+
+def _empty_select() -> str:
+    columns = ", ".join(
+        f"CAST(NULL AS {column_type}) AS {column}"
+        for column, column_type in ARCHIVE_COLUMNS.items()
+    )
+    return f"SELECT {columns} WHERE false"
+
+
+def _naive_datetime(checked_at: datetime.datetime) -> datetime.datetime:
+    # we store greencheck dates without a timezone, but convert any
+    # that have one to UTC, to be safe
+    if checked_at.tzinfo is not None:
+        checked_at = checked_at.astimezone(datetime.timezone.utc)
+    return checked_at.replace(tzinfo=None, microsecond=0)
+
+
+def _day_path(day: datetime.date) -> str:
+    return f"day={day.isoformat()}"
+
+
+def _days(start: datetime.date, end: datetime.date) -> typing.Iterator[datetime.date]:
+    for offset in range((end - start).days + 1):
+        yield start + datetime.timedelta(days=offset)
@@ -0,0 +1,76 @@
+"""
+A small HyperLogLog sketch, for approximate counts of distinct domains in
+our greencheck statistics, without keeping every domain we have seen.
+
+With the default precision of 12, each sketch takes 4KB, and counts are
+typically within about 1.6% of the true number. Sketches can be merged,
+so we can count the distinct domains across any range of days and
+providers by merging their daily sketches.
+"""
+
+import hashlib
+import math
+import typing
+
+DEFAULT_PRECISION = 12
+
+
+class HyperLogLog:
+    def __init__(self, registers: bytes = None, precision: int = DEFAULT_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        if registers:
+            if len(registers) != self.size:
+                raise ValueError(
+                    f"Expected {self.size} registers, got {len(registers)}"
+                )
+            self.registers = bytearray(registers)
+        else:
+            self.registers = bytearray(self.size)
+
+    @classmethod
+    def from_values(cls, values: typing.Iterable[str]) -> "HyperLogLog":
+        sketch = cls()
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def add(self, value: str):
+        hashed = int.from_bytes(
+            hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        # the first `precision` bits pick a register, and the register keeps the
+        # longest run of leading zeros we have seen in the rest of the hash
+        register = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[register]:
+            self.registers[register] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        """
+        Add everything counted by another sketch to this one.
+        """
+        if other.precision != self.precision:
+            raise ValueError("Can only merge sketches with the same precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        """
+        Return the estimated number of distinct values added.
+        """
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = (
+            alpha * self.size**2 / sum(2.0**-register for register in self.registers)
+        )
+
+        # use linear counting for small numbers of values, where the
+        # raw estimate is biased
+        empty_registers = self.registers.count(0)
+        if estimate <= 2.5 * self.size and empty_registers:
+            estimate = self.size * math.log(self.size / empty_registers)
+
+        return round(estimate)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
@@ -0,0 +1,218 @@
+"""
+An in-memory index of the active green IP ranges, so we can find the
+smallest range enclosing an IP address without a round trip to the database.
+
+The ranges we store can overlap and nest arbitrarily (resellers often
+register a small slice of a larger provider's range), so rather than
+storing the ranges themselves, we split the whole address space into
+"elementary segments" at every range boundary, and precompute the smallest
+active range covering each segment. Looking up an address is then a
+binary search over the sorted segment start points.
+
+Each process keeps its own copy of the index. It is rebuilt in the
+background once a GreencheckIp saved or deleted in this process is committed,
+and in any case after GREEN_IP_RANGE_INDEX_TTL seconds, to pick up changes
+made in other processes, or by bulk `update()` calls in the importers. We
+keep using the index we have while the new one is built, and until the first
+one is built, we query the database instead.
+"""
+
+import bisect
+import heapq
+import ipaddress
+import logging
+import threading
+import time
+import typing
+
+from django.conf import settings
+
+from .background_reload import BackgroundReloader
+
+logger = logging.getLogger(__name__)
+
+IpAddress = typing.Union[str, int, ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+
+class IpRangeIndex:
+    """
+    A static interval index over IP ranges, answering "which is the
+    smallest range containing this address?" in O(log n).
+    """
+
+    def __init__(self, ranges: typing.Iterable[tuple]):
+        """
+        Accept an iterable of (start, end, payload) tuples, where start and end
+        are the integer values of the first and last ip addresses in the range,
+        and payload is what we return for a matching lookup.
+        """
+        # we sort by start, so we can add ranges to our sweep in order
+        sorted_ranges = sorted(
+            (
+                (int(start), int(end), position, payload)
+                for position, (start, end, payload) in enumerate(ranges)
+                if int(start) <= int(end)
+            ),
+            key=lambda rng: (rng[0], rng[2]),
+        )
+
+        # every start, and every address just after an end is a point
+        # where the set of ranges covering an address can change
+        boundaries = sorted(
+            {rng[0] for rng in sorted_ranges} | {rng[1] + 1 for rng in sorted_ranges}
+        )
+
+        self._starts = []
+        self._payloads = []
+        self._size = len(sorted_ranges)
+
+        # a heap of the ranges covering the current segment, smallest first.
+        # Ties are broken by the order the ranges were passed in, which
+        # matches the stable sort in `order_ip_range_by_size`
+        covering = []
+        next_range = 0
+
+        for boundary in boundaries:
+            while (
+                next_range < len(sorted_ranges)
+                and sorted_ranges[next_range][0] <= boundary
+            ):
+                start, end, position, payload = sorted_ranges[next_range]
+                heapq.heappush(covering, (end - start + 1, position, end, payload))
+                next_range += 1
+
+            # drop ranges that ended before this segment
+            while covering and covering[0][2] < boundary:
+                heapq.heappop(covering)
+
+            smallest = covering[0][3] if covering else None
+
+            # merge adjacent segments with the same answer to save memory
+            if self._payloads and self._payloads[-1] is smallest:
+                continue
+
+            self._starts.append(boundary)
+            self._payloads.append(smallest)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def smallest_range_for(self, ip_address: IpAddress):
+        """
+        Return the payload for the smallest range containing `ip_address`,
+        or None if no range contains it.
+        """
+        address = int(ipaddress.ip_address(ip_address))
+        segment = bisect.bisect_right(self._starts, address) - 1
+        if segment < 0:
+            return None
+        return self._payloads[segment]
+
+    def smallest_ranges_for(self, ip_addresses: typing.Iterable[IpAddress]) -> list:
+        """
+        Return the payloads for the smallest ranges containing each of
+        `ip_addresses`, in the same order, with None for addresses no range
+        contains. We look up the addresses in ascending order, so each
+        search only covers the segments after the previous match.
+        """
+        addresses = [int(ipaddress.ip_address(address)) for address in ip_addresses]
+        payloads = [None] * len(addresses)
+
+        segment = 0
+        for position in sorted(range(len(addresses)), key=addresses.__getitem__):
+            segment = bisect.bisect_right(self._starts, addresses[position], lo=segment)
+            if segment > 0:
+                payloads[position] = self._payloads[segment - 1]
+        return payloads
+
+
+def build_green_ip_range_index() -> IpRangeIndex:
+    """
+    Build an index of all the active green ip ranges, using unsaved
+    GreencheckIp instances as the payloads, so they can be used
+    anywhere we would use the result of a queryset.
+    """
+    from .models import GreencheckIp  # Prevent circular import error
+
+    rows = GreencheckIp.objects.filter(active=True).order_by("id").values_list(
+        "id", "ip_start", "ip_end", "hostingprovider_id"
+    )
+
+    ranges = []
+    for id, ip_start, ip_end, hostingprovider_id in rows.iterator():
+        green_ip = GreencheckIp(
+            id=id,
+            active=True,
+            ip_start=ip_start,
+            ip_end=ip_end,
+            hostingprovider_id=hostingprovider_id,
+        )
+        ranges.append(
+            (
+                int(ipaddress.ip_address(ip_start)),
+                int(ipaddress.ip_address(ip_end)),
+                green_ip,
+            )
+        )
+
+    return IpRangeIndex(ranges)
+
+
+def _build_logged_green_ip_range_index() -> IpRangeIndex:
+    index = build_green_ip_range_index()
+    logger.info(f"Built green ip range index of {len(index)} ranges")
+    return index
+
+
+_index = BackgroundReloader("green ip range index", _build_logged_green_ip_range_index)
+_rebuilt_at = None
+_index_lock = threading.Lock()
+
+
+def green_ip_range_index() -> typing.Union[IpRangeIndex, None]:
+    """
+    Return this process's index of active green ip ranges, or None if we
+    haven't built one yet. We start building it on the first call, and
+    rebuild it once it is older than GREEN_IP_RANGE_INDEX_TTL, returning
+    the index we have until the new one is ready.
+    """
+    global _rebuilt_at
+
+    now = time.monotonic()
+    with _index_lock:
+        expired = (
+            _rebuilt_at is None
+            or now - _rebuilt_at > settings.GREEN_IP_RANGE_INDEX_TTL
+        )
+        if expired:
+            _rebuilt_at = now
+
+    if expired:
+        _index.reload()
+    return _index.value
+
+
+def invalidate_green_ip_range_index():
+    """
+    Mark this process's index as stale, rebuilding it in the background,
+    if this process uses it.
+    """
+    global _rebuilt_at
+
+    with _index_lock:
+        if _rebuilt_at is None:
+            return
+        _rebuilt_at = time.monotonic()
+
+    _index.reload()
+
+
+def clear_green_ip_range_index():
+    """
+    Forget this process's index, so the next lookup builds a new one.
+    """
+    global _rebuilt_at
+
+    with _index_lock:
+        _rebuilt_at = None
+    _index.clear()
@@ -0,0 +1,195 @@
+"""
+The documents served by our legacy directory API, for older versions of
+our directory, and the directory widgets embedded in other sites:
+
+- the listing of every listed hosting provider grouped by country, served
+  at /data/directory/
+- the details of each provider and its datacenters, served at
+  /data/hostingprovider/<id>
+
+We keep each rendered document in the shared cache along with an ETag and
+the time we rendered it, so requests are served without touching the
+database, and clients that already have the current document get a 304.
+
+Saving or deleting a provider in a way that changes the listing rebuilds
+it. Saving or deleting a provider, or any of its datacenters, certificates
+or locations clears its cached details.
+"""
+
+import collections
+import hashlib
+import logging
+import time
+import typing
+from urllib import parse
+
+from django.conf import settings
+from django_countries import countries
+from rest_framework.renderers import JSONRenderer
+
+from ..accounts.models import Hostingprovider
+from .shared_cache import NO_RESULT, directory_provider_key, shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Bump this when changing the shape of the listing, so we don't serve
+# listings cached before a deploy
+LEGACY_DIRECTORY_VERSION = 2
+
+# The provider fields shown in the listing. Changing any of these, or
+# whether a provider is listed, means we need to rebuild it.
+LISTING_FIELDS = ("country", "id", "name", "website", "partner")
+LISTING_CHANGING_FIELDS = {"country", "name", "website", "partner", "is_listed"}
+
+
+class RenderedDocument(typing.NamedTuple):
+    etag: str
+    # the unix timestamp we rendered the document at
+    last_modified: int
+    content: bytes
+
+
+def render_document(data) -> RenderedDocument:
+    content = JSONRenderer().render(data)
+    return RenderedDocument(
+        etag=f'"{hashlib.sha256(content).hexdigest()[:32]}"',
+        last_modified=int(time.time()),
+        content=content,
+    )
+
+
+def legacy_directory_key() -> str:
+    return f"legacy_directory:v{LEGACY_DIRECTORY_VERSION}"
+
+
+def is_partner(partner: typing.Optional[str]) -> bool:
+    # historically we have had a mix of empty strings, "None" and null
+    # values for providers that are not partners
+    return partner not in (None, "", "None")
+
+
+def providers_by_country(queryset) -> typing.Dict[str, typing.List[dict]]:
+    """
+    Return the listed providers in `queryset` grouped by country code,
+    with partners listed first in each country, then in alphabetical order.
+    """
+    providers = collections.defaultdict(list)
+    for country, provider_id, name, website, partner in (
+        queryset.filter(is_listed=True).order_by("name").values_list(*LISTING_FIELDS)
+    ):
+        providers[str(country)].append(
+            {
+                "iso": str(country),
+                "id": str(provider_id),
+                "naam": name,
+                "website": website,
+                "partner": partner,
+            }
+        )
+
+    # sorting is stable, so each group stays in alphabetical order
+    for country_providers in providers.values():
+        country_providers.sort(key=lambda provider: not is_partner(provider["partner"]))
+    return providers
+
+
+def build_directory() -> dict:
+    """
+    Return the listing, keyed by country code, for every country.
+    """
+    providers = providers_by_country(Hostingprovider.objects.all())
+
+    directory = {}
+    for country in countries:
+        country_obj = {
+            "iso": country.code,
+            "tld": f".{country.code.lower()}",
+            "countryname": country.name.upper(),
+        }
+        if country.code in providers:
+            country_obj["providers"] = providers[country.code]
+        directory[country.code] = country_obj
+    return directory
+
+
+def rebuild_directory_listing() -> RenderedDocument:
+    """
+    Render the listing to JSON, and store it in the shared cache.
+    """
+    listing = render_document(build_directory())
+    shared_cache().set(
+        legacy_directory_key(), listing, timeout=settings.DIRECTORY_CACHE_TIMEOUT
+    )
+    logger.debug(f"Rebuilt legacy directory listing {listing.etag}")
+    return listing
+
+
+def directory_listing() -> RenderedDocument:
+    """
+    Return the rendered listing, from the shared cache if we can.
+    """
+    if listing := shared_cache().get(legacy_directory_key()):
+        return listing
+    return rebuild_directory_listing()
+
+
+def build_provider_details(provider_id: int) -> typing.Optional[list]:
+    """
+    Return the details of a provider and its datacenters, in the shape
+    the legacy directory expects, or None if there is no such provider.
+    """
+    provider = (
+        Hostingprovider.objects.filter(pk=provider_id)
+        .prefetch_related(
+            "datacenter__datacenter_certificates",
+            "datacenter__datacenterlocation_set",
+        )
+        .first()
+    )
+    if provider is None:
+        return None
+
+    datacenters = [dc.legacy_representation() for dc in provider.datacenter.all() if dc]
+
+    # we strip out the protocol from our links because when the directory code is
+    # consumed in some old jquery code running in the browser to render our directory
+    # hyperlinks are mangled, and http://my-domain ends up as http//mydomain
+    # for more, see the trello card below
+    # https://trello.com/c/8Ou3mATw/124
+    domain_with_no_protocol = parse.urlparse(provider.website).netloc
+
+    # basic case, no datacenters or certificates
+    provider_dict = {
+        "id": str(provider.id),
+        "naam": provider.name,
+        # "website": provider.website,
+        "website": domain_with_no_protocol,
+        "countrydomain": str(provider.country),
+        "model": provider.model,
+        "certurl": None,
+        "valid_from": None,
+        "valid_to": None,
+        "mainenergytype": None,
+        "energyprovider": None,
+        "partner": provider.partner,
+        "datacenters": datacenters,
+    }
+    return [provider_dict]
+
+
+def provider_details(provider_id: int) -> typing.Optional[RenderedDocument]:
+    """
+    Return the rendered details of a provider, from the shared cache if
+    we can, or None if there is no such provider.
+    """
+    key = directory_provider_key(provider_id)
+    cached = shared_cache().get(key)
+    if cached == NO_RESULT:
+        return None
+    if cached:
+        return cached
+
+    details = build_provider_details(provider_id)
+    document = render_document(details) if details is not None else None
+    shared_cache().set(key, document or NO_RESULT)
+    return document
@@ -0,0 +1,173 @@
+"""
+Buffering the sitechecks we log in each process, and sending them to
+RabbitMQ in batches, so logging a check on the request path only costs an
+append to a list, rather than a round trip to the broker.
+
+A background thread sends everything buffered as one `process_logs`
+message every GREENCHECK_LOG_BUFFER_INTERVAL milliseconds, or sooner, once
+GREENCHECK_LOG_BUFFER_SIZE sitechecks are waiting. Whatever is left in the
+buffer is sent when the process exits.
+
+If RabbitMQ is down, we spool batches to local disk rather than dropping
+them, and replay them once it is back. See `log_spool`.
+"""
+
+import atexit
+import logging
+import threading
+import typing
+
+import dramatiq
+import pika
+from django.conf import settings
+
+from .log_spool import BrokerCircuitBreaker, LogSpool
+from .tasks import process_logs
+
+logger = logging.getLogger(__name__)
+
+
+class SitecheckLogBuffer:
+    """
+    Collect sitechecks to log from any thread, and pass them to `send_batch`
+    in lists of at most `max_size`, from a background thread.
+    """
+
+    def __init__(
+        self,
+        send_batch: typing.Callable[[list], None],
+        max_size: int,
+        flush_interval: float,
+        spool: LogSpool,
+        circuit_breaker: BrokerCircuitBreaker,
+    ):
+        self._send_batch = send_batch
+        self._max_size = max_size
+        self._flush_interval = flush_interval
+        self._spool = spool
+        self._circuit_breaker = circuit_breaker
+        # look for batches spooled by processes that exited during
+        # an outage the first time we flush
+        self._spool_may_have_batches = True
+        self._lock = threading.Lock()
+        self._sitechecks = []
+        self._full = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def add(self, sitecheck: dict):
+        with self._lock:
+            self._sitechecks.append(sitecheck)
+            full = len(self._sitechecks) >= self._max_size
+            # threads don't survive a fork, so we start ours in the process
+            # that first logs a check, and again if it is no longer running
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="sitecheck-log-buffer", daemon=True
+                )
+                self._thread.start()
+
+        if full:
+            self._full.set()
+
+    def flush(self):
+        """
+        Send everything in the buffer now, or spool it if the broker is down,
+        then replay any spooled batches if the broker is up.
+        """
+        with self._lock:
+            sitechecks, self._sitechecks = self._sitechecks, []
+
+        for start in range(0, len(sitechecks), self._max_size):
+            self._send_or_spool(sitechecks[start : start + self._max_size])
+
+        if self._spool_may_have_batches and not self._circuit_breaker.is_open:
+            self._replay_spool()
+
+    def _send_or_spool(self, batch: list):
+        if self._circuit_breaker.is_open:
+            self._spool_batch(batch)
+            return
+
+        try:
+            self._send_batch(batch)
+            self._circuit_breaker.record_success()
+        except (
+            pika.exceptions.AMQPConnectionError,
+            dramatiq.errors.ConnectionClosed,
+        ):
+            self._circuit_breaker.record_failure()
+            self._spool_batch(batch)
+        except Exception as err:
+            logger.exception(f"Unexpected error of type {err}")
+
+    def _spool_batch(self, batch: list):
+        try:
+            self._spool.append(batch)
+            self._spool_may_have_batches = True
+        except OSError as err:
+            logger.error(f"Unable to spool {len(batch)} sitechecks, dropping them: {err}")
+
+    def _replay_spool(self):
+        try:
+            sent = self._spool.replay(self._send_batch)
+        except (
+            pika.exceptions.AMQPConnectionError,
+            dramatiq.errors.ConnectionClosed,
+        ):
+            self._circuit_breaker.record_failure()
+            return
+        except Exception as err:
+            logger.exception(f"Unexpected error replaying spooled sitechecks: {err}")
+            return
+
+        self._circuit_breaker.record_success()
+        self._spool_may_have_batches = False
+        if sent:
+            logger.info(f"Replayed {sent} spooled sitechecks")
+
+    def stop(self):
+        """
+        Stop the background thread, and send what is left in the buffer.
+        """
+        self._stopping.set()
+        self._full.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self._flush_interval + 5)
+        self.flush()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._full.wait(timeout=self._flush_interval)
+            self._full.clear()
+            self.flush()
+
+
+def send_sitechecks(sitechecks: list):
+    process_logs.send(sitechecks)
+
+
+_log_buffer = None
+_log_buffer_lock = threading.Lock()
+
+
+def sitecheck_log_buffer() -> SitecheckLogBuffer:
+    """
+    Return this process's buffer of sitechecks to log, sending anything
+    still in it when the process exits.
+    """
+    global _log_buffer
+
+    with _log_buffer_lock:
+        if _log_buffer is None:
+            _log_buffer = SitecheckLogBuffer(
+                send_sitechecks,
+                max_size=settings.GREENCHECK_LOG_BUFFER_SIZE,
+                flush_interval=settings.GREENCHECK_LOG_BUFFER_INTERVAL / 1000,
+                spool=LogSpool(settings.GREENCHECK_LOG_SPOOL_DIR),
+                circuit_breaker=BrokerCircuitBreaker(
+                    retry_after=settings.GREENCHECK_LOG_BROKER_RETRY_AFTER
+                ),
+            )
+            atexit.register(_log_buffer.stop)
+        return _log_buffer
@@ -0,0 +1,160 @@
+"""
+Keeping the sitechecks we log when RabbitMQ is down, so our greencheck
+statistics stay complete through a broker outage.
+
+`BrokerCircuitBreaker` remembers that the broker is down, so we stop
+paying a connection timeout for every batch we try to send. While it is
+open, batches are appended to a spool file on local disk instead, one JSON
+list of sitechecks per line. Once the broker is back, we replay the spool.
+
+Each process appends to its own spool file, so lines from different
+processes can't interleave. Before replaying a file, we rename it, so the
+process writing it starts a new one, and so no two processes replay it.
+We replay our own files, and any left behind by processes that have
+since exited, including files they claimed but died before replaying, or
+that were claimed more than CLAIM_TIMEOUT seconds ago.
+"""
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+# How long a spool file can stay claimed by a process replaying it, before
+# we assume the replay was abandoned, even if the process is still running
+CLAIM_TIMEOUT = 10 * 60
+
+CLAIMED_SUFFIX = ".replaying-"
+
+
+class BrokerCircuitBreaker:
+    """
+    Track whether the broker is down. After a failure, the circuit is open
+    for `retry_after` seconds, then we let the next send try the broker again.
+    """
+
+    def __init__(self, retry_after: float):
+        self._retry_after = retry_after
+        self._open_until = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._open_until is not None and time.monotonic() < self._open_until
+
+    def record_failure(self):
+        if self._open_until is None:
+            logger.warning(
+                f"RabbitMQ not available, spooling sitechecks for {self._retry_after}s"
+            )
+        self._open_until = time.monotonic() + self._retry_after
+
+    def record_success(self):
+        if self._open_until is not None:
+            logger.info("RabbitMQ available again")
+        self._open_until = None
+
+
+class LogSpool:
+    """
+    An append-only spool of batches of sitechecks, in a directory on local disk.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"sitechecks-{os.getpid()}.jsonl")
+
+    def append(self, sitechecks: list):
+        """
+        Append a batch of sitechecks to this process's spool file, syncing it
+        to disk, so we keep it if the process dies before we can replay it.
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as spool_file:
+                spool_file.write(json.dumps(sitechecks) + "\n")
+                spool_file.flush()
+                os.fsync(spool_file.fileno())
+
+    def replay(self, send_batch: typing.Callable[[list], None]) -> int:
+        """
+        Pass each spooled batch to `send_batch`, deleting each spool file once
+        all its batches are sent. If sending fails, we put the batches we
+        haven't sent back in the spool, and raise the error.
+        Returns the number of sitechecks sent.
+        """
+        sent = 0
+        for path in self._replayable_paths():
+            spool_path = path.split(CLAIMED_SUFFIX)[0]
+            claimed_path = f"{spool_path}{CLAIMED_SUFFIX}{os.getpid()}"
+            try:
+                os.rename(path, claimed_path)
+            except FileNotFoundError:
+                # another process claimed it first
+                continue
+            # renaming keeps the time the file was last written, but we time
+            # out claims from when they were made
+            os.utime(claimed_path)
+
+            batches = []
+            with open(claimed_path, encoding="utf-8") as spool_file:
+                for line in spool_file:
+                    try:
+                        batches.append(json.loads(line))
+                    except ValueError:
+                        # a line cut short when a process died while writing it
+                        logger.warning(f"Skipping a damaged line in {claimed_path}")
+
+            for position, batch in enumerate(batches):
+                try:
+                    send_batch(batch)
+                except Exception:
+                    for unsent_batch in batches[position:]:
+                        self.append(unsent_batch)
+                    os.remove(claimed_path)
+                    raise
+                sent += len(batch)
+
+            os.remove(claimed_path)
+        return sent
+
+    def _replayable_paths(self) -> list:
+        paths = []
+        for path in glob.glob(os.path.join(self.directory, "sitechecks-*.jsonl")):
+            pid = int(os.path.basename(path).split("-")[1].split(".")[0])
+            if pid == os.getpid() or not _process_is_running(pid):
+                paths.append(path)
+
+        # files claimed for replaying by a process that died, or has been
+        # replaying them for too long
+        claimed_pattern = f"sitechecks-*.jsonl{CLAIMED_SUFFIX}*"
+        for path in glob.glob(os.path.join(self.directory, claimed_pattern)):
+            pid = int(path.rsplit(CLAIMED_SUFFIX, 1)[1])
+            try:
+                claimed_for = time.time() - os.path.getmtime(path)
+            except FileNotFoundError:
+                continue
+            if claimed_for > CLAIM_TIMEOUT or (
+                pid != os.getpid() and not _process_is_running(pid)
+            ):
+                paths.append(path)
+        return paths
+
+
+def _process_is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # it exists, but belongs to someone else
+        return True
+    return True
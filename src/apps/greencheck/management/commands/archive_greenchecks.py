@@ -0,0 +1,39 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...greencheck_archive import GreencheckArchive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move greenchecks older than GREENCHECK_ARCHIVE_AFTER_DAYS out of the "
+        "database, into Parquet files partitioned by day"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.GREENCHECK_ARCHIVE_AFTER_DAYS,
+            help="archive greenchecks made more than this many days ago",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.GREENCHECK_ARCHIVE_CHUNK_SIZE,
+            help="how many greenchecks to archive and delete at a time",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = datetime.datetime.now().replace(
+            hour=0, minute=0, second=0, microsecond=0
+        ) - datetime.timedelta(days=options["days"])
+
+        archive = GreencheckArchive.from_settings()
+        archived = archive.archive_before(cutoff, chunk_size=options["chunk_size"])
+
+        self.stdout.write(
+            f"Archived {archived} greenchecks made before {cutoff.isoformat()}."
+        )
@@ -4,14 +4,18 @@ from django.core.management.base import BaseCommand
 from sentry_sdk.crons import monitor
 
 from apps.accounts.models import Hostingprovider
-from ...models import GreenDomain, GreenDomainBadge
+from ...models import BatchCheckJob, GreenDomain, GreenDomainBadge
 
 
 class Command(BaseCommand):
 
     TIME_TO_LIVE_DAYS = 365
 
-    help = "Clear expired GreenDomain records"
+    # batch check results are only meant to be downloaded once they are ready,
+    # so we don't keep them, or the uploads they came from, for long
+    BATCH_CHECK_JOB_TIME_TO_LIVE_DAYS = 7
+
+    help = "Clear expired GreenDomain records, and old batch check jobs"
 
 
     def _clear_archived_provider_domains(self):
@@ -64,6 +68,23 @@ class Command(BaseCommand):
             f"Cleared expired greenweb badges: Deleted {badge_count} badge images created before {cutoff_date_string}."
         )
 
+    def _clear_expired_batch_check_jobs(self):
+        """
+        Clears all batch check jobs created more than BATCH_CHECK_JOB_TIME_TO_LIVE_DAYS
+        days ago, along with their uploads and results
+        """
+        cutoff_date = (
+                datetime.datetime.now() - datetime.timedelta(days=self.BATCH_CHECK_JOB_TIME_TO_LIVE_DAYS)
+        ).replace(hour=0, minute=0, second=0, microsecond=0)
+        query_set = BatchCheckJob.objects.filter(created__lte=cutoff_date)
+        job_count = query_set.count()
+        # deleting each job deletes its files from storage too
+        query_set.delete()
+        cutoff_date_string = cutoff_date.isoformat()
+        self.stdout.write(
+            f"Cleared expired batch check jobs: Deleted {job_count} jobs created before {cutoff_date_string}."
+        )
+
     # This is called by a cronjob which runs at 1AM every day, as specified in
     # ansible/setup_cronjobs.yml in this repository.
     # Please note that when changing the cron schedule there, the "schedule" attribute
@@ -74,3 +95,4 @@ class Command(BaseCommand):
         self._clear_archived_provider_domains()
         self._clear_expired_domains()
         self._clear_expired_badges()
+        self._clear_expired_batch_check_jobs()
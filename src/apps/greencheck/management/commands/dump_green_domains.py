@@ -7,7 +7,11 @@ from requests import request, HTTPError
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError, CommandParser
 
-from ...object_storage import public_url, green_domains_bucket
+from ...object_storage import (
+    clear_green_domain_snapshots,
+    green_domains_bucket,
+    public_url,
+)
 
 
 _COMPRESSION_TYPES = {
@@ -105,6 +109,7 @@ class GreenDomainExporter:
         with open(file_path, "rb") as file_to_upload:
             bucket = green_domains_bucket()
             bucket.put_object(ACL="public-read", Key=file_path, Body=file_to_upload)
+        clear_green_domain_snapshots()
 
         try:
             access_check_response = request("head", public_url(bucket_name, file_path))
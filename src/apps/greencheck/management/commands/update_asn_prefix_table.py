@@ -0,0 +1,113 @@
+import gzip
+import io
+import os
+import tempfile
+from urllib.parse import urljoin
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...asn_prefix_table import AsnPrefixTable, parse_prefix_dump
+
+# CAIDA publish a log of every dump they create in each dataset directory
+CREATION_LOG = "pfx2as-creation.log"
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the local prefix-to-AS table we use to look up the ASN "
+        "for an IP address, from Routeviews prefix-to-AS dumps"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "sources",
+            nargs="*",
+            help=(
+                "Local paths or URLs of prefix-to-AS dumps to combine. URLs ending "
+                "in a slash are treated as CAIDA dataset directories, and the "
+                "latest dump in them is used. Defaults to ASN_PREFIX_TABLE_SOURCES."
+            ),
+        )
+
+    def _latest_dump_url(self, dataset_url: str) -> str:
+        """
+        Read the creation log for a CAIDA dataset directory, and return
+        the url of the most recently created dump listed in it.
+        """
+        response = requests.get(urljoin(dataset_url, CREATION_LOG), timeout=30)
+        response.raise_for_status()
+
+        # each line is: sequence number, timestamp, path to the dump
+        entries = [
+            line.split()
+            for line in response.text.splitlines()
+            if line.strip() and not line.startswith("#")
+        ]
+        if not entries:
+            raise CommandError(f"No prefix-to-AS dumps listed at {dataset_url}")
+
+        *_, latest_path = entries[-1]
+        return urljoin(dataset_url, latest_path)
+
+    def _read_dump(self, source: str) -> list:
+        """
+        Return the lines of the prefix-to-AS dump at `source`, fetching
+        it first if it is a url.
+        """
+        if source.startswith(("http://", "https://")):
+            if source.endswith("/"):
+                source = self._latest_dump_url(source)
+            self.stdout.write(f"Fetching {source}")
+            response = requests.get(source, timeout=300)
+            response.raise_for_status()
+            content = response.content
+        else:
+            with open(source, "rb") as dump:
+                content = dump.read()
+
+        if content[:2] == b"\x1f\x8b":
+            content = gzip.decompress(content)
+
+        return io.StringIO(content.decode("utf-8")).readlines()
+
+    def _write_table(self, prefixes: list):
+        """
+        Write the combined prefixes to ASN_PREFIX_TABLE_PATH, replacing the
+        old table in one step, so running workers never read a partial file.
+        """
+        destination = settings.ASN_PREFIX_TABLE_PATH
+        destination.parent.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(
+            dir=destination.parent, suffix=".gz", delete=False
+        ) as tmp_file:
+            with gzip.open(tmp_file, "wt") as table:
+                for network, origin in prefixes:
+                    asns = str(origin).replace(" ", "_")
+                    table.write(
+                        f"{network.network_address}\t{network.prefixlen}\t{asns}\n"
+                    )
+
+        os.replace(tmp_file.name, destination)
+
+    def handle(self, *args, **options):
+        sources = options["sources"] or settings.ASN_PREFIX_TABLE_SOURCES
+
+        prefixes = []
+        for source in sources:
+            prefixes.extend(parse_prefix_dump(self._read_dump(source)))
+
+        if not prefixes:
+            raise CommandError("No prefixes found. Leaving the existing table in place.")
+
+        # make sure the table builds before we replace the old one
+        AsnPrefixTable(prefixes)
+        self._write_table(prefixes)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Prefix-to-AS table updated with {len(prefixes)} prefixes"
+            )
+        )
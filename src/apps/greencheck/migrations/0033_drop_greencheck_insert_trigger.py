@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Logging greenchecks now keeps the green_presenting table up to date in
+    batches, with `Greencheck.update_green_presenting`, so we no longer
+    need the trigger that called the `insert_urls` procedure for every
+    single greencheck we inserted.
+    """
+
+    dependencies = [
+        ("greencheck", "0032_batchcheckjob"),
+    ]
+
+    operations = [
+        # the table was previously only created by the `insert_procedures`
+        # management command, so make sure it exists now that we write to it
+        migrations.RunSQL(
+            """
+            CREATE TABLE IF NOT EXISTS `green_presenting` (
+                `id` Int( 11 ) AUTO_INCREMENT NOT NULL,
+                `url` VarChar( 255 ) CHARACTER SET utf8 COLLATE utf8_general_ci NOT NULL,
+                `hosted_by` VarChar( 255 ) CHARACTER SET utf8 COLLATE utf8_general_ci NOT NULL,
+                `hosted_by_website` VarChar( 255 ) CHARACTER SET utf8 COLLATE utf8_general_ci NOT NULL,
+                `partner` VarChar( 255 ) CHARACTER SET utf8 COLLATE utf8_general_ci NULL,
+                `green` TinyInt( 2 ) NOT NULL,
+                `hosted_by_id` Int( 11 ) NOT NULL,
+                `modified` DateTime NOT NULL,
+                PRIMARY KEY ( `id` ),
+                CONSTRAINT `unique_url` UNIQUE( `url` ) )
+            CHARACTER SET = utf8
+            COLLATE = utf8_general_ci
+            ENGINE = InnoDB;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            "DROP TRIGGER IF EXISTS after_greencheck_insert;",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.9 on 2026-10-17 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("greencheck", "0033_drop_greencheck_insert_trigger"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyStat",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("hosting_provider_id", models.IntegerField(default=0)),
+                ("match_type", models.CharField(blank=True, max_length=16)),
+                ("green", models.BooleanField()),
+                ("checks", models.PositiveBigIntegerField(default=0)),
+                ("domains_sketch", models.BinaryField(default=bytes)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["hosting_provider_id", "date"],
+                        name="greencheck__hosting_6f0a2b_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "hosting_provider_id", "match_type", "green"),
+                        name="unique_daily_stat",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.9 on 2026-10-17 18:20
+
+import collections
+
+from django.db import migrations, models
+
+from apps.greencheck.hyperloglog import HyperLogLog
+
+
+def add_totals_from_daily_stats(apps, schema_editor):
+    """
+    Add up the daily stats we already have into the totals for each day,
+    then remove the grey daily stats, as the totals are all we use them for.
+    """
+    DailyStat = apps.get_model("greencheck", "DailyStat")
+    DailyTotal = apps.get_model("greencheck", "DailyTotal")
+
+    totals = collections.defaultdict(
+        lambda: {"checks": 0, "green_checks": 0, "sketch": HyperLogLog()}
+    )
+    for stat in DailyStat.objects.order_by("date").iterator():
+        total = totals[stat.date]
+        total["checks"] += stat.checks
+        if stat.green:
+            total["green_checks"] += stat.checks
+        total["sketch"].merge(HyperLogLog(stat.domains_sketch))
+
+    DailyTotal.objects.bulk_create(
+        [
+            DailyTotal(
+                date=date,
+                checks=total["checks"],
+                green_checks=total["green_checks"],
+                domains_sketch=total["sketch"].to_bytes(),
+            )
+            for date, total in totals.items()
+        ],
+        batch_size=500,
+    )
+    DailyStat.objects.filter(green=False).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("greencheck", "0034_dailystat"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyTotal",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(unique=True)),
+                ("checks", models.PositiveBigIntegerField(default=0)),
+                ("green_checks", models.PositiveBigIntegerField(default=0)),
+                ("domains_sketch", models.BinaryField(default=bytes)),
+            ],
+        ),
+        # the grey daily stats can't be recovered from the totals
+        migrations.RunPython(
+            add_totals_from_daily_stats, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -4,3 +4,5 @@ from .green_check import *  #  noqa
 from .green_domain import * # noqa
 from .green_domain_badge import *  # noqa
 from .co2_intensity import * # noqa
+from .batch_check_job import * # noqa
+from .daily_stat import * # noqa
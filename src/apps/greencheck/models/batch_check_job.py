@@ -0,0 +1,79 @@
+import uuid
+
+from django.core.files.storage import default_storage
+from django.db import models
+from django.dispatch import receiver
+from model_utils.models import TimeStampedModel
+
+from .. import choices as gc_choices
+
+
+class BatchCheckJob(TimeStampedModel):
+    """
+    A batch check of the domains in an uploaded CSV file, run in the
+    background by a dramatiq worker, rather than in the request.
+
+    The upload and the compressed results are kept in whatever file or
+    object storage service is configured in the application, and the
+    job's id is the only way to find them, so we use a random UUID.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(
+        max_length=16,
+        choices=gc_choices.BatchCheckJobStatus.choices,
+        default=gc_choices.BatchCheckJobStatus.PENDING,
+    )
+    live_check = models.BooleanField(default=False)
+    upload_path = models.CharField(max_length=255, blank=True)
+    result_path = models.CharField(max_length=255, blank=True)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    checked = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.id} - {self.status}"
+
+    def save_upload(self, url_file):
+        """
+        Save the uploaded CSV file, to be read by the worker.
+        """
+        self.upload_path = default_storage.save(
+            f"batch_checks/{self.id}/upload.csv", url_file
+        )
+
+    def save_result(self, result_file):
+        """
+        Save the compressed CSV file of results, once the job is done.
+        """
+        self.result_path = default_storage.save(
+            f"batch_checks/{self.id}/results.csv.gz", result_file
+        )
+
+    def delete_files(self):
+        """
+        Delete the upload and results from storage, if we saved them.
+        """
+        for path in (self.upload_path, self.result_path):
+            if path:
+                default_storage.delete(path)
+
+    @property
+    def result_url(self):
+        """
+        Returns a URL to download the results from, once the job is done.
+        """
+        if self.result_path:
+            return default_storage.url(self.result_path)
+
+    @property
+    def is_finished(self):
+        return self.status in (
+            gc_choices.BatchCheckJobStatus.COMPLETED,
+            gc_choices.BatchCheckJobStatus.FAILED,
+        )
+
+
+@receiver(models.signals.post_delete, sender=BatchCheckJob)
+def delete_batch_check_job_files(instance, **_kwargs):
+    instance.delete_files()
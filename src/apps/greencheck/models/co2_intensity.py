@@ -1,4 +1,11 @@
+import threading
+import time
+
+from django.conf import settings
 from django.db import models
+from django.dispatch import receiver
+
+from ..shared_cache import co2_intensity_version_key, shared_cache
 
 # https://ember-data-api-scg3n.ondigitalocean.app/ember/generation_yearly?_sort=rowid&_facet=year&_facet=variable&country_or_region__exact=World&variable__exact=Fossil&year__exact=2021
 GLOBAL_AVG_FOSSIL_SHARE = 61.56
@@ -6,6 +13,19 @@ GLOBAL_AVG_FOSSIL_SHARE = 61.56
 # https://ember-data-api-scg3n.ondigitalocean.app/ember?sql=select+country_or_region%2C+country_code%2C+year%2C+emissions_intensity_gco2_per_kwh%0D%0Afrom+country_overview_yearly%0D%0Awhere+year+%3D+2021%0D%0Aand+country_or_region+%3D+%22World%22%0D%0Aorder+by+country_code+limit+300
 GLOBAL_AVG_CO2_INTENSITY = 442.23
 
+# The latest CO2Intensity for each country, keyed by ISO2 code, so looking up
+# an IP's carbon intensity doesn't need a query. There are only a few hundred
+# rows, so each process loads them all on first use, and again when the shared
+# version changes, after we import new figures, or once its copy is
+# CO2_INTENSITY_MAX_AGE seconds old, in case the import's change to the
+# version didn't reach this process.
+_intensities = None
+_intensities_version = None
+_intensities_loaded_at = 0.0
+_intensities_checked_at = 0.0
+_intensities_lock = threading.Lock()
+
+
 class CO2Intensity(models.Model):
     """
     A lookup table for returning carbon intensity figures
@@ -37,11 +57,7 @@ class CO2Intensity(models.Model):
         # we try to return the latest value we have for a given country
         # in some places data can be more than a year old, so we allow
         # for this
-        res = (
-            cls.objects.filter(country_code_iso_2=country_code)
-            .order_by("-year")
-            .first()
-        )
+        res = cls.latest_by_country().get(country_code)
 
         # do we have a result? return it
         if res:
@@ -50,6 +66,51 @@ class CO2Intensity(models.Model):
         # otherwise fall back to global value
         return cls.global_value()
 
+    @classmethod
+    def latest_by_country(cls) -> dict:
+        """
+        Return the latest CO2 Intensity figures for each country, keyed by
+        ISO2 country code, from this process's copy of the table.
+        """
+        global _intensities, _intensities_version
+        global _intensities_loaded_at, _intensities_checked_at
+
+        with _intensities_lock:
+            now = time.monotonic()
+            if (
+                _intensities is not None
+                and now - _intensities_checked_at < settings.CO2_INTENSITY_CHECK_INTERVAL
+            ):
+                return _intensities
+
+            version = shared_cache().get(co2_intensity_version_key())
+            if (
+                _intensities is None
+                or version != _intensities_version
+                or now - _intensities_loaded_at >= settings.CO2_INTENSITY_MAX_AGE
+            ):
+                # later years replace earlier ones
+                _intensities = {
+                    intensity.country_code_iso_2: intensity
+                    for intensity in cls.objects.order_by("year")
+                }
+                _intensities_version = version
+                _intensities_loaded_at = now
+            _intensities_checked_at = now
+            return _intensities
+
+    @classmethod
+    def expire_cached_intensities(cls):
+        """
+        Make every process reload its copy of the table, the next time it
+        checks the shared version.
+        """
+        global _intensities
+
+        with _intensities_lock:
+            _intensities = None
+        shared_cache().set(co2_intensity_version_key(), time.time_ns(), timeout=None)
+
     @classmethod
     def global_value(cls):
         """
@@ -66,3 +127,9 @@ class CO2Intensity(models.Model):
             generation_from_fossil=GLOBAL_AVG_FOSSIL_SHARE,
             year=2021,
         )
+
+
+@receiver(models.signals.post_save, sender=CO2Intensity)
+@receiver(models.signals.post_delete, sender=CO2Intensity)
+def expire_cached_intensities(**_kwargs):
+    CO2Intensity.expire_cached_intensities()
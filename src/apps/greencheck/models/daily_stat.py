@@ -0,0 +1,249 @@
+import collections
+import datetime
+import typing
+
+from django.db import models, transaction
+
+from .. import choices as gc_choices
+from ..hyperloglog import HyperLogLog
+
+
+class DailyStat(models.Model):
+    """
+    A rollup of the green checks we logged on one day, for one hosting
+    provider and one kind of match, so we can answer questions about our
+    check volumes without scanning the greencheck table.
+
+    Alongside the number of checks, we keep a HyperLogLog sketch of the
+    domains checked, to estimate how many distinct domains they covered.
+    Grey checks have no provider, so they are only counted in the
+    `DailyTotal` for their day.
+    """
+
+    date = models.DateField()
+    hosting_provider_id = models.IntegerField(default=0)
+    match_type = models.CharField(max_length=16, blank=True)
+    green = models.BooleanField()
+    checks = models.PositiveBigIntegerField(default=0)
+    domains_sketch = models.BinaryField(default=bytes)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "hosting_provider_id", "match_type", "green"],
+                name="unique_daily_stat",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["hosting_provider_id", "date"],
+                name="greencheck__hosting_6f0a2b_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.hosting_provider_id} - {self.match_type}"
+
+    @property
+    def domains(self) -> int:
+        """
+        The estimated number of distinct domains checked.
+        """
+        return HyperLogLog(self.domains_sketch).count()
+
+    @classmethod
+    def record_checks(cls, checks: typing.Iterable):
+        """
+        Add a batch of logged greenchecks to the daily rollups, merging
+        them into the existing counters and sketches, and into the
+        totals for each day.
+        """
+        checks = list(checks)
+        counts = collections.Counter()
+        sketches = collections.defaultdict(HyperLogLog)
+
+        for check in checks:
+            key = cls._key_for_check(check)
+            if not key[3]:
+                continue
+            counts[key] += 1
+            sketches[key].add(check.url)
+
+        with transaction.atomic():
+            if counts:
+                cls._merge_into_rows(counts, sketches)
+            DailyTotal.record_checks(checks)
+
+    @classmethod
+    def _merge_into_rows(cls, counts: collections.Counter, sketches: dict):
+        # make sure a row exists for every key, so we can lock them
+        # all, and merge into them without racing other workers
+        cls.objects.bulk_create(
+            [
+                cls(
+                    date=date,
+                    hosting_provider_id=provider_id,
+                    match_type=match_type,
+                    green=green,
+                )
+                for date, provider_id, match_type, green in counts
+            ],
+            ignore_conflicts=True,
+        )
+        # lock rows in the same order in every worker, so concurrent
+        # batches wait for each other rather than deadlocking
+        rows = (
+            cls.objects.select_for_update()
+            .filter(
+                date__in={key[0] for key in counts},
+                hosting_provider_id__in={key[1] for key in counts},
+            )
+            .order_by("date", "hosting_provider_id", "match_type", "green")
+        )
+
+        updated = []
+        for row in rows:
+            key = (row.date, row.hosting_provider_id, row.match_type, row.green)
+            if key not in counts:
+                continue
+            sketch = HyperLogLog(row.domains_sketch)
+            sketch.merge(sketches[key])
+            row.checks += counts[key]
+            row.domains_sketch = sketch.to_bytes()
+            updated.append(row)
+
+        cls.objects.bulk_update(updated, ["checks", "domains_sketch"])
+
+    @classmethod
+    def _key_for_check(cls, check) -> tuple:
+        date = check.date
+        if isinstance(date, datetime.datetime):
+            date = date.date()
+        green = check.green == gc_choices.BoolChoice.YES
+        return (
+            date,
+            (check.hostingprovider or 0) if green else 0,
+            (check.type or "") if green else "",
+            green,
+        )
+
+    @classmethod
+    def totals(
+        cls, queryset: models.QuerySet, group_by: str = "date"
+    ) -> typing.List[dict]:
+        """
+        Sum the rollups in a queryset for each value of `group_by`,
+        merging their sketches to estimate the distinct domains checked,
+        in order of `group_by`.
+        """
+        totals = {}
+        for row in queryset.order_by(group_by):
+            group = getattr(row, group_by)
+            if group not in totals:
+                totals[group] = {
+                    group_by: group,
+                    "checks": 0,
+                    "green_checks": 0,
+                    "sketch": HyperLogLog(),
+                }
+            total = totals[group]
+            total["checks"] += row.checks
+            if row.green:
+                total["green_checks"] += row.checks
+            total["sketch"].merge(HyperLogLog(row.domains_sketch))
+
+        results = []
+        for total in totals.values():
+            sketch = total.pop("sketch")
+            total["green_ratio"] = (
+                round(total["green_checks"] / total["checks"], 4)
+                if total["checks"]
+                else None
+            )
+            total["domains"] = sketch.count()
+            results.append(total)
+        return results
+
+
+class DailyTotal(models.Model):
+    """
+    The greenchecks we logged on one day, across every provider, green or
+    grey, so the stats for all providers read one row for each day, rather
+    than merging the sketches of every provider's `DailyStat`.
+    """
+
+    date = models.DateField(unique=True)
+    checks = models.PositiveBigIntegerField(default=0)
+    green_checks = models.PositiveBigIntegerField(default=0)
+    domains_sketch = models.BinaryField(default=bytes)
+
+    def __str__(self):
+        return f"{self.date} - {self.checks}"
+
+    @property
+    def domains(self) -> int:
+        """
+        The estimated number of distinct domains checked.
+        """
+        return HyperLogLog(self.domains_sketch).count()
+
+    @classmethod
+    def record_checks(cls, checks: typing.Iterable):
+        """
+        Add a batch of logged greenchecks to the totals for their days.
+        Call this after `DailyStat` has locked its rows for the batch, so
+        every worker locks rows in the same order.
+        """
+        counts = collections.Counter()
+        green_counts = collections.Counter()
+        sketches = collections.defaultdict(HyperLogLog)
+
+        for check in checks:
+            date, _provider_id, _match_type, green = DailyStat._key_for_check(check)
+            counts[date] += 1
+            if green:
+                green_counts[date] += 1
+            sketches[date].add(check.url)
+
+        if not counts:
+            return
+
+        with transaction.atomic():
+            cls.objects.bulk_create(
+                [cls(date=date) for date in counts], ignore_conflicts=True
+            )
+            rows = cls.objects.select_for_update().filter(date__in=counts).order_by(
+                "date"
+            )
+
+            updated = []
+            for row in rows:
+                sketch = HyperLogLog(row.domains_sketch)
+                sketch.merge(sketches[row.date])
+                row.checks += counts[row.date]
+                row.green_checks += green_counts[row.date]
+                row.domains_sketch = sketch.to_bytes()
+                updated.append(row)
+
+            cls.objects.bulk_update(
+                updated, ["checks", "green_checks", "domains_sketch"]
+            )
+
+    @classmethod
+    def totals(cls, queryset: models.QuerySet) -> typing.List[dict]:
+        """
+        Return the totals in a queryset for each day, in the same shape
+        as `DailyStat.totals`, in order of date.
+        """
+        return [
+            {
+                "date": row.date,
+                "checks": row.checks,
+                "green_checks": row.green_checks,
+                "green_ratio": (
+                    round(row.green_checks / row.checks, 4) if row.checks else None
+                ),
+                "domains": row.domains,
+            }
+            for row in queryset.order_by("date")
+        ]
@@ -1,11 +1,11 @@
+import functools
 import ipaddress
 import logging
 
-import dramatiq
-import pika
 import tld
 
-from django.db import models
+from django.db import connection, models, transaction
+from django.dispatch import receiver
 from django.utils import timezone
 from django_mysql import models as dj_mysql_models
 from django_mysql import models as mysql_models
@@ -15,14 +15,25 @@ from apps.greencheck.validators import validate_ip_range
 
 from ...accounts import models as ac_models
 from .. import choices as gc_choices
-from ..tasks import process_log
+from ..ip_range_index import invalidate_green_ip_range_index
+from ..log_buffer import sitecheck_log_buffer
 
+from .daily_stat import DailyStat
 from .fields import IpAddressField
 from .site_check import SiteCheck
 
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=10_000)
+def tld_for_url(url: str) -> str:
+    """
+    Return the top level domain for a url, remembering it, as we log
+    checks for the same domains over and over.
+    """
+    return tld.get_tld(url, fix_protocol=True)
+
+
 class GreencheckIp(mu_models.TimeStampedModel):
     """
     An IP Range associated with a hosting provider, to act as a way to
@@ -139,17 +150,10 @@ class Greencheck(mysql_models.Model):
     @classmethod
     def log_sitecheck_asynchronous(cls, sitecheck):
         """
-        Asynchronously logs a sitecheck to the greencheck table
+        Asynchronously logs a sitecheck to the greencheck table, adding it
+        to this process's buffer of sitechecks to send to the worker.
         """
-        try:
-            process_log.send(sitecheck.asdict())
-        except (
-            pika.exceptions.AMQPConnectionError,
-            dramatiq.errors.ConnectionClosed,
-        ):
-            logger.warn("RabbitMQ not available, not logging to RabbitMQ")
-        except Exception as err:
-            logger.exception(f"Unexpected error of type {err}")
+        sitecheck_log_buffer().add(sitecheck.asdict())
 
 
     @classmethod
@@ -160,23 +164,118 @@ class Greencheck(mysql_models.Model):
     @classmethod
     def log_sitecheck_synchronous(cls, sitecheck):
         """
-        Synchronously logs a sitecheck to the greencheck table - called from
-        within the dramatiq worker
+        Synchronously logs a sitecheck to the greencheck table
         """
-        if sitecheck.url is None:
-            return {
-                "status": "Sitecheck has no URL. Skipping.",
-                "sitecheck": sitecheck,
+        check, status = cls._greencheck_for_sitecheck(sitecheck)
+        if check is None:
+            return {"status": status, "sitecheck": sitecheck}
+
+        with transaction.atomic():
+            check.save()
+            cls.update_green_presenting([check])
+            DailyStat.record_checks([check])
+        logger.debug(f"Greencheck logged: {check}")
+
+        # return result so we can inspect if need be
+        return { "status": "OK", "sitecheck": sitecheck, "res": check }
+
+    @classmethod
+    def log_sitechecks_synchronous(cls, sitechecks) -> list:
+        """
+        Synchronously logs many sitechecks to the greencheck table in
+        a single INSERT - called from within the dramatiq worker.
+        """
+        checks = []
+        for sitecheck in sitechecks:
+            check, _status = cls._greencheck_for_sitecheck(sitecheck)
+            if check is not None:
+                checks.append(check)
+
+        # if any stage fails, the worker retries the whole batch, so none of
+        # it can be committed without the rest
+        with transaction.atomic():
+            cls.objects.bulk_create(checks)
+            cls.update_green_presenting(checks)
+            DailyStat.record_checks(checks)
+        logger.debug(f"Greenchecks logged: {len(checks)}")
+        return checks
+
+    @classmethod
+    def update_green_presenting(cls, checks):
+        """
+        Bring the green_presenting table up to date with the latest of the
+        given checks for each url, adding or updating the urls that were
+        green, and removing the ones that were grey.
+        This replaces the `insert_urls` procedure the database used to run
+        after inserting every single greencheck.
+        """
+        latest_checks = {}
+        for check in checks:
+            latest_check = latest_checks.get(check.url)
+            if latest_check is None or check.date >= latest_check.date:
+                latest_checks[check.url] = check
+
+        green_checks = [
+            check for check in latest_checks.values()
+            if check.green == gc_choices.BoolChoice.YES
+        ]
+        grey_urls = [
+            check.url for check in latest_checks.values()
+            if check.green != gc_choices.BoolChoice.YES
+        ]
+
+        providers = {}
+        if green_checks:
+            providers = {
+                id: (name, website, partner)
+                for id, name, website, partner in ac_models.Hostingprovider.objects.filter(
+                    id__in={check.hostingprovider for check in green_checks}
+                ).values_list("id", "name", "website", "partner")
             }
 
+        rows = []
+        for check in green_checks:
+            if check.hostingprovider not in providers:
+                continue
+            name, website, partner = providers[check.hostingprovider]
+            rows.append(
+                (check.date, 1, name, check.hostingprovider, website, partner, check.url)
+            )
+
+        with connection.cursor() as cursor:
+            if rows:
+                placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(rows))
+                cursor.execute(
+                    (
+                        "INSERT INTO green_presenting "
+                        "(`modified`, `green`, `hosted_by`, `hosted_by_id`, "
+                        "`hosted_by_website`, `partner`, `url`) "
+                        f"VALUES {placeholders} "
+                        "ON DUPLICATE KEY UPDATE modified = VALUES(modified)"
+                    ),
+                    [value for row in rows for value in row],
+                )
+            if grey_urls:
+                placeholders = ", ".join(["%s"] * len(grey_urls))
+                cursor.execute(
+                    f"DELETE FROM green_presenting WHERE url IN ({placeholders})",
+                    grey_urls,
+                )
+
+    @classmethod
+    def _greencheck_for_sitecheck(cls, sitecheck) -> tuple:
+        """
+        Return an unsaved greencheck log entry for a sitecheck, and the status
+        "OK", or None and the reason we can't log the sitecheck.
+        """
+        if sitecheck.url is None:
+            return None, "Sitecheck has no URL. Skipping."
+
         try:
-            fixed_tld = tld.get_tld(sitecheck.url, fix_protocol=True)
+            fixed_tld = tld_for_url(sitecheck.url)
         except tld.exceptions.TldDomainNotFound:
             if sitecheck.url == "localhost":
-                return {
-                    "status": "We can't look up localhost. Skipping.",
-                    "sitecheck": sitecheck,
-                }
+                return None, "We can't look up localhost. Skipping."
 
             try:
                 ipaddress.ip_address(sitecheck.url)
@@ -188,7 +287,7 @@ class Greencheck(mysql_models.Model):
                         f"Sitecheck results: {sitecheck}"
                     )
                 )
-                return {"status": "Error", "sitecheck": sitecheck}
+                return None, "Error"
 
         except Exception:
             logger.exception(
@@ -197,10 +296,10 @@ class Greencheck(mysql_models.Model):
                     f"Sitecheck results: {sitecheck}"
                 )
             )
-            return {"status": "Error", "sitecheck": sitecheck}
+            return None, "Error"
 
         if sitecheck.hosting_provider_id is not None:
-            check = Greencheck.objects.create(
+            check = Greencheck(
                 hostingprovider=sitecheck.hosting_provider_id,
                 greencheck_ip=sitecheck.match_ip_range or 0,
                 date=sitecheck.checked_at,
@@ -210,19 +309,15 @@ class Greencheck(mysql_models.Model):
                 type=sitecheck.match_type,
                 url=sitecheck.url,
             )
-            logger.debug(f"Greencheck logged: {check}")
         else:
-            check = Greencheck.objects.create(
+            check = Greencheck(
                 date=sitecheck.checked_at,
                 green="no",
                 ip=sitecheck.ip or 0,
                 tld=fixed_tld,
                 url=sitecheck.url,
             )
-            logger.debug(f"Greencheck logged: {check}")
-
-        # return result so we can inspect if need be
-        return { "status": "OK", "sitecheck": sitecheck, "res": check }
+        return check, "OK"
 
 
 class GreencheckIpApprove(mu_models.TimeStampedModel):
@@ -403,3 +498,8 @@ class TopUrl(models.Model):
         db_table = "top_1m_urls"
 
 
+@receiver(models.signals.post_save, sender=GreencheckIp)
+@receiver(models.signals.post_delete, sender=GreencheckIp)
+def invalidate_ip_range_index(**_kwargs):
+    # rebuild the index once the change is committed, so the rebuild sees it
+    transaction.on_commit(invalidate_green_ip_range_index)
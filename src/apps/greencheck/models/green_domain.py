@@ -2,20 +2,36 @@ import logging
 import typing
 from datetime import datetime
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.core.cache import caches
 from django.core.serializers import serialize
+from django.dispatch import receiver
 from django.utils import timezone
 from django_mysql import models as dj_mysql_models
 
 from ...accounts import models as ac_models
 from .. import choices as gc_choices
+from .. import db_router
 from ..network_utils import validate_domain
+from ..shared_cache import green_domain_key, grey_domain_key, shared_cache
+from ..single_flight import SingleFlight, shared_lock
 
 from .green_domain_badge import GreenDomainBadge
 from .green_check import Greencheck
+from .site_check import SiteCheck
 
 logger = logging.getLogger(__name__)
 
+# The cache alias we use to remember recent grey results, so repeat
+# checks of grey domains don't run a full lookup every time. This is in
+# front of the shared cache, where we keep grey results too, so checks
+# in other processes see them
+GREY_DOMAIN_CACHE = "grey_domains"
+
+# Full lookups currently in flight in this process, keyed by domain
+domain_checks = SingleFlight()
+
 class GreenDomain(models.Model):
     """
     The model we use for quick lookups against a domain.
@@ -47,10 +63,11 @@ class GreenDomain(models.Model):
         This is the principal method to look up a domain for checking, using the cache.
         It validates the URL, then EITHER returns a cached greendomain result, OR performs a full
         lookup, if no cached result is availble (or if the caller has passed the skip_cache flag).
-        Green results are cached to the greendomains table, while grey results are returned without saving.
+        Green results are cached to the greendomains table, and in front of it, the shared
+        cache, while grey results are kept in the size-capped GREY_DOMAIN_CACHE, and the
+        shared cache, expiring after GREY_DOMAIN_CACHE_TTL seconds.
+        Concurrent lookups of the same domain are coalesced, so only one of them hits the network.
         """
-        from ..domain_check import GreenDomainChecker # Prevent circular import error
-        checker = GreenDomainChecker()
         try:
             domain = validate_domain(url)
         except Exception as ex:
@@ -60,22 +77,138 @@ class GreenDomain(models.Model):
 
         if skip_cache:
             cls.clear_from_all_caches(domain)
+            db_router.mark_refreshed(domain)
         else:
-            # Try the database green domain cache table first:
-            if green_domain := cls.objects.filter(url=domain).first():
-                Greencheck.log_greendomain_asynchronous(green_domain)
-                return green_domain
+            db_router.read_from_primary_if_refreshed(domain)
+            if cached_domain := cls.cached_result(domain):
+                Greencheck.log_greendomain_asynchronous(cached_domain)
+                return cached_domain
 
         # Otherwise, there is no cached domain OR we are explicitly refreshing the cache,
-        # try full lookup using network:
-        sitecheck = checker.check_domain(domain, refresh_carbon_txt_cache=skip_cache)
+        # try full lookup using network, sharing the result with any other requests
+        # for the same domain that arrive while we are checking it:
+        sitecheck, green_domain = domain_checks.do(
+            (domain, skip_cache), cls._check_and_cache, domain, skip_cache
+        )
         Greencheck.log_sitecheck_asynchronous(sitecheck)
-        if sitecheck.green:
-            green_domain = cls.from_sitecheck(sitecheck)
-            green_domain.save()
-            return green_domain
-        else:
-            return cls.grey_result(domain=sitecheck.url)
+        return green_domain
+
+    @classmethod
+    def _check_and_cache(cls, domain, skip_cache=False):
+        """
+        Run a full lookup for a domain, and cache the result, returning both
+        the sitecheck and the resulting green or grey domain.
+        If another process is already checking the same domain, we wait for
+        it to finish, and use the result it cached instead.
+        """
+        from ..domain_check import GreenDomainChecker # Prevent circular import error
+        checker = GreenDomainChecker()
+
+        with shared_lock(
+            f"green_domain_for:{domain}",
+            settings.GREENCHECK_LOCK_CACHE,
+            settings.GREENCHECK_LOCK_TIMEOUT,
+        ) as acquired:
+            if not acquired and not skip_cache:
+                if cached_domain := cls.cached_result(domain):
+                    return SiteCheck.from_greendomain(cached_domain), cached_domain
+
+            sitecheck = checker.check_domain(domain, refresh_carbon_txt_cache=skip_cache)
+            if sitecheck.green:
+                green_domain = cls.from_sitecheck(sitecheck)
+                green_domain.save()
+                cls.cache_green_result(green_domain)
+                return sitecheck, green_domain
+
+            grey_domain = cls.grey_result(domain=sitecheck.url)
+            cls.cache_grey_result(grey_domain)
+            return sitecheck, grey_domain
+
+    @classmethod
+    def cached_result(cls, domain) -> typing.Union["GreenDomain", None]:
+        """
+        Return the cached green or grey result for a domain, if we have one.
+        """
+        # Try the green domain cache first, then see if we have
+        # checked this domain recently, and found it grey:
+        return cls.cached_green_result(domain) or cls.cached_grey_result(domain)
+
+    @classmethod
+    def cached_green_result(cls, domain) -> typing.Union["GreenDomain", None]:
+        """
+        Return the green domain for a domain from the shared cache, falling
+        back to the greendomains table, and caching what we find there.
+        """
+        if cached := shared_cache().get(green_domain_key(domain)):
+            return GreenDomain(**cached)
+
+        green_domain = cls.objects.filter(url=domain).first()
+        if green_domain:
+            cls.cache_green_result(green_domain)
+        return green_domain
+
+    @classmethod
+    def cache_green_result(cls, green_domain):
+        """
+        Put a saved green domain in the shared cache, so checks in
+        every process can skip the database.
+        """
+        shared_cache().set(
+            green_domain_key(green_domain.url),
+            {
+                field.attname: getattr(green_domain, field.attname)
+                for field in cls._meta.concrete_fields
+            },
+        )
+
+    @classmethod
+    def save_green_results(cls, green_domains):
+        """
+        Save many green domains at once, updating the rows we already have
+        for their urls, rather than adding duplicates, and clearing them from
+        the shared cache, as saving in bulk doesn't send the signals that would.
+
+        The greendomain table has no unique key on url, so we look up the
+        existing rows first, rather than have the database detect conflicts.
+        """
+        green_domains = {green_domain.url: green_domain for green_domain in green_domains}
+        if not green_domains:
+            return
+
+        with transaction.atomic():
+            existing_ids = {}
+            for domain_id, url in (
+                cls.objects.select_for_update()
+                .filter(url__in=green_domains)
+                .order_by("id")
+                .values_list("id", "url")
+            ):
+                existing_ids.setdefault(url, domain_id)
+
+            updated, created = [], []
+            for url, green_domain in green_domains.items():
+                if url in existing_ids:
+                    green_domain.id = existing_ids[url]
+                    updated.append(green_domain)
+                else:
+                    created.append(green_domain)
+
+            cls.objects.bulk_update(
+                updated,
+                [
+                    "hosted_by_id",
+                    "hosted_by",
+                    "hosted_by_website",
+                    "listed_provider",
+                    "partner",
+                    "green",
+                    "modified",
+                    "type",
+                ],
+            )
+            cls.objects.bulk_create(created)
+
+        shared_cache().delete_many([green_domain_key(url) for url in green_domains])
 
     @classmethod
     def grey_result(cls, domain=None, type=gc_choices.GreenlistChoice.NONE.value):
@@ -97,21 +230,87 @@ class GreenDomain(models.Model):
         )
 
     @classmethod
-    def from_sitecheck(cls, sitecheck):
+    def grey_results(cls, domains, type=gc_choices.GreenlistChoice.NONE.value) -> list:
+        """
+        Return a grey domain for each of the given domains, like `grey_result`,
+        looking up when any cached carbon.txt results were last modified
+        in a single query.
+        """
+        last_modified = ac_models.CarbonTxtDomainResultCache.last_modified_for(domains)
+        now = timezone.now()
+        return [
+            GreenDomain(
+                green=False,
+                url=domain,
+                hosted_by=None,
+                hosted_by_id=None,
+                hosted_by_website=None,
+                listed_provider=False,
+                partner=None,
+                type=type,
+                modified=last_modified.get(domain) or now,
+            )
+            for domain in domains
+        ]
+
+    @classmethod
+    def cached_grey_result(cls, domain) -> typing.Union["GreenDomain", None]:
+        """
+        Return a grey domain for a domain we have recently checked and found
+        to be grey, or None if we have no recent grey result cached.
+        We look in this process's grey domain cache first, then in the shared
+        cache, for grey results found by other processes.
+        """
+        cached = caches[GREY_DOMAIN_CACHE].get(domain)
+        if cached is None:
+            cached = shared_cache().get(grey_domain_key(domain))
+            if cached is None:
+                return None
+            caches[GREY_DOMAIN_CACHE].set(domain, cached)
+
+        return GreenDomain(
+            green=False,
+            url=domain,
+            hosted_by=None,
+            hosted_by_id=None,
+            hosted_by_website=None,
+            listed_provider=False,
+            partner=None,
+            type=cached["type"],
+            modified=cached["modified"],
+        )
+
+    @classmethod
+    def cache_grey_result(cls, grey_domain):
+        """
+        Remember a grey result, so the next check of the same domain, in this
+        or any other process, can skip the full lookup.
+        """
+        cached = {"type": grey_domain.type, "modified": grey_domain.modified}
+        caches[GREY_DOMAIN_CACHE].set(grey_domain.url, cached)
+        shared_cache().set(
+            grey_domain_key(grey_domain.url),
+            cached,
+            timeout=settings.GREY_DOMAIN_CACHE_TTL,
+        )
+
+    @classmethod
+    def from_sitecheck(cls, sitecheck, hosting_provider=None):
         """
         Return a greendomain model for a given sitecheck. Note that this can represent
         either a green or a grey domain, depending on the result of the sitecheck itself.
+        Pass in the sitecheck's hosting provider if you have already fetched it, otherwise
+        we use the provider's details from the shared cache.
         """
-        hosting_provider = None
-        try:
-            hosting_provider = ac_models.Hostingprovider.objects.get(
-                pk=sitecheck.hosting_provider_id
-            )
-        except ac_models.Hostingprovider.DoesNotExist:
-            logger.warning(
-                ("We expected to find a provider for this sitecheck, But didn't. ")
+        if hosting_provider is None:
+            hosting_provider = ac_models.Hostingprovider.cached_details(
+                sitecheck.hosting_provider_id
             )
-            return cls.grey_result(domain=sitecheck.url)
+            if hosting_provider is None:
+                logger.warning(
+                    ("We expected to find a provider for this sitecheck, But didn't. ")
+                )
+                return cls.grey_result(domain=sitecheck.url)
 
         return GreenDomain(
             url=sitecheck.url,
@@ -138,6 +337,8 @@ class GreenDomain(models.Model):
     def clear_cache(cls, domain):
         if obj := cls.objects.filter(url=domain).first():
             obj.delete()
+        shared_cache().delete_many([green_domain_key(domain), grey_domain_key(domain)])
+        caches[GREY_DOMAIN_CACHE].delete(domain)
 
     # Queries
     @property
@@ -189,3 +390,7 @@ class GreenDomain(models.Model):
         db_table = "greendomain"
 
 
+@receiver(models.signals.post_save, sender=GreenDomain)
+@receiver(models.signals.post_delete, sender=GreenDomain)
+def clear_shared_green_domain(instance, **_kwargs):
+    shared_cache().delete(green_domain_key(instance.url))
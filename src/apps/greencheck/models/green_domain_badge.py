@@ -77,7 +77,7 @@ class GreenDomainBadge(TimeStampedModel):
         sitecheck = checker.check_domain(self.domain)
 
         if sitecheck.hosting_provider_id:
-            hosting_provider_name = Hostingprovider.objects.get(pk=sitecheck.hosting_provider_id).name
+            hosting_provider_name = Hostingprovider.cached_details(sitecheck.hosting_provider_id).name
         else:
             hosting_provider_name = None
 
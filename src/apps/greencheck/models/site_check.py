@@ -25,6 +25,9 @@ class SiteCheck:
     match_type: str
     match_ip_range: int
     cached: bool
+    # when we check every address a domain resolves to, whether
+    # all, some or none of them were green. See AddressCoverage
+    address_coverage: str = None
 
     # Factories
 
@@ -71,7 +74,7 @@ class SiteCheck:
 
 
     @classmethod
-    def green_sitecheck_by_ip_range(cls, domain, ip_address, ip_match):
+    def green_sitecheck_by_ip_range(cls, domain, ip_address, ip_match, address_coverage=None):
         """
         Return a SiteCheck object, that has been marked as green by
         looking up against an IP range
@@ -81,15 +84,16 @@ class SiteCheck:
             ip=str(ip_address),
             data=True,
             green=True,
-            hosting_provider_id=ip_match.hostingprovider.id,
+            hosting_provider_id=ip_match.hostingprovider_id,
             match_type=GreenlistChoice.IP.value,
             match_ip_range=ip_match.id,
             cached=False,
             checked_at=timezone.now(),
+            address_coverage=address_coverage,
         )
 
     @classmethod
-    def green_sitecheck_by_asn(cls, domain, ip_address, matching_asn):
+    def green_sitecheck_by_asn(cls, domain, ip_address, matching_asn, address_coverage=None):
         """
         Return a SiteCheck object, that has been marked as green by
         looking up against an IP range
@@ -99,15 +103,16 @@ class SiteCheck:
             ip=str(ip_address),
             data=True,
             green=True,
-            hosting_provider_id=matching_asn.hostingprovider.id,
+            hosting_provider_id=matching_asn.hostingprovider_id,
             match_type=GreenlistChoice.ASN.value,
             match_ip_range=matching_asn.id,
             cached=False,
             checked_at=timezone.now(),
+            address_coverage=address_coverage,
         )
 
     @classmethod
-    def grey_sitecheck(cls, domain, ip_address):
+    def grey_sitecheck(cls, domain, ip_address, address_coverage=None):
         """
         Return a SiteCheck object, that has been marked as grey
         for failure to match either by carbon.txt, ASN or IP.
@@ -122,6 +127,7 @@ class SiteCheck:
             match_ip_range=None,
             cached=False,
             checked_at=timezone.now(),
+            address_coverage=address_coverage,
         )
 
     # Queries
@@ -1,13 +1,16 @@
 import typing
-import socket
 import logging
 import ipaddress
 import urllib
 import tld
 
+from django.conf import settings
 from ipwhois.net import Net
 from ipwhois.asn import IPASN
 
+from .asn_prefix_table import asn_prefix_table
+from .dns_resolver import get_resolver
+
 logger = logging.getLogger(__name__)
 
 def validate_domain(url) -> typing.Union[str, None]:
@@ -42,10 +45,16 @@ def validate_domain(url) -> typing.Union[str, None]:
 
 def asn_from_ip(ip_address):
     """
-    Check the IP against the IP 2 ASN service provided by the
-    Team Cymru IP to ASN Mapping Service
+    Look up the ASN for an IP in our local prefix-to-AS table, falling
+    back to checking the IP against the IP 2 ASN service provided by the
+    Team Cymru IP to ASN Mapping Service if we have no table to use,
+    or haven't finished loading it yet.
     https://ipwhois.readthedocs.io/en/latest/ASN.html#asn-origin-lookups
     """
+    if settings.ASN_PREFIX_TABLE_ENABLED:
+        if (table := asn_prefix_table()) is not None:
+            return table.asn_for(ip_address)
+
     network = Net(ip_address)
     obj = IPASN(network)
     res = obj.lookup()
@@ -59,34 +68,24 @@ def convert_domain_to_ip(
     address, raising an exception if not resolution occurs.
     """
 
-    # TODO: support multiple addresses being returned:
-    # `getaddrinfo`` actually returns a list of possible addresses,
-    # but our current code only assumes a domain would resolve to a single IP
-    # address when we look up a domain.
-    # Ideally we'd check that ALL the IP addresses resolved are within our
-    # green IP ranges but until we know how much this impacts performance
-    # we choose the first one.
-    ip_info = socket.getaddrinfo(domain, None)
-
-    # each item in the list is a tuple containing:
-
-    # Address family (like socket.AF_INET for IPv4 or socket.AF_INET6 for IPv6)
-    # Socket type (like socket.SOCK_STREAM for TCP or socket.SOCK_DGRAM for UDP)
-    # Protocol (usually just 0)
-    # Canonical name (an alias for the host, if applicable)
-    # Socket address (a tuple containing the IP address and port number)
-
-    ip_address_list = [
-        # we are fetching the ip address in our socket address returned above
-        ip[4][0]
-        for ip in ip_info
-    ]
-
-    ip = ipaddress.ip_address(ip_address_list[0])
+    # a domain can resolve to more than one IP address. By default
+    # we only check the first one. See `convert_domain_to_ips`, and
+    # GREENCHECK_CHECK_ALL_ADDRESSES for checking them all.
+    ip = convert_domain_to_ips(domain)[0]
     logger.debug(ip)
+    return ip
+
+def convert_domain_to_ips(
+    domain
+) -> typing.List[typing.Union[ipaddress.IPv4Address, ipaddress.IPv6Address]]:
+    """
+    Accepts a domain name or IP address, and returns all the IPV4 and IPV6
+    addresses it resolves to, raising an exception if not resolution occurs.
+    """
+    ip_address_list = get_resolver().resolve(domain)
 
-    if ip:
-        return ip
+    if ip_address_list:
+        return ip_address_list
 
     raise ipaddress.AddressValueError(f"Unable to convert domain to IP: {domain}")
 
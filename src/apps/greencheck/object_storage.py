@@ -1,24 +1,51 @@
 """
 We use scaleway as a AWS S3 API compatible provider of object storage.
 Below is the wrapper around it for working with the objects.
+
+Creating a boto3 session and resource is slow, so we create them lazily, the
+first time they are needed, then reuse them. boto3 resources are not safe to
+share between threads, so each thread gets its own.
 """
+import threading
+
 import boto3
 from django.conf import settings
 
+from .shared_cache import green_domain_snapshots_key, shared_cache
+
+_object_storage = threading.local()
+
+
+def object_storage_resource():
+    """
+    Return this thread's S3 resource for our object storage, creating it
+    on first use. We create a new one if the connection settings change.
+    """
+    connection_settings = (
+        settings.OBJECT_STORAGE_REGION,
+        settings.OBJECT_STORAGE_ENDPOINT,
+        settings.OBJECT_STORAGE_ACCESS_KEY_ID,
+        settings.OBJECT_STORAGE_SECRET_ACCESS_KEY,
+    )
+    if getattr(_object_storage, "settings", None) != connection_settings:
+        region, endpoint, access_key_id, secret_access_key = connection_settings
+        session = boto3.Session(region_name=region)
+        _object_storage.resource = session.resource(
+            "s3",
+            endpoint_url=endpoint,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+        )
+        _object_storage.settings = connection_settings
+    return _object_storage.resource
+
 
 def object_storage_bucket(bucket_name: str):
     """
     Return the bucket identified by `bucket_name` for uploading
     and downloading files.
     """
-    session = boto3.Session(region_name=settings.OBJECT_STORAGE_REGION)
-    object_storage = session.resource(
-        "s3",
-        endpoint_url=settings.OBJECT_STORAGE_ENDPOINT,
-        aws_access_key_id=settings.OBJECT_STORAGE_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.OBJECT_STORAGE_SECRET_ACCESS_KEY,
-    )
-    return object_storage.Bucket(bucket_name)
+    return object_storage_resource().Bucket(bucket_name)
 
 
 def green_domains_bucket():
@@ -29,6 +56,30 @@ def green_domains_bucket():
     return object_storage_bucket(settings.DOMAIN_SNAPSHOT_BUCKET)
 
 
+def green_domain_snapshots() -> list:
+    """
+    Return the name and public url of each green domain snapshot,
+    from the shared cache if we listed them in the last
+    DOMAIN_SNAPSHOT_LISTING_TTL seconds.
+    """
+    key = green_domain_snapshots_key()
+    snapshots = shared_cache().get(key)
+    if snapshots is None:
+        snapshots = [
+            (obj.key, public_url(obj.bucket_name, obj.key))
+            for obj in green_domains_bucket().objects.all()
+        ]
+        shared_cache().set(key, snapshots, timeout=settings.DOMAIN_SNAPSHOT_LISTING_TTL)
+    return snapshots
+
+
+def clear_green_domain_snapshots():
+    """
+    Forget the cached list of snapshots, after uploading a new one.
+    """
+    shared_cache().delete(green_domain_snapshots_key())
+
+
 def public_url(bucket: str, key: str) -> str:
     """
     Return the public url for a given key in object storage.
@@ -41,4 +92,3 @@ def public_url(bucket: str, key: str) -> str:
     else:
         hostname = f"{bucket}.s3.{region}.scw.cloud"
     return f"https://{hostname}/{key}"
-
@@ -1,5 +1,7 @@
 import ipaddress
 
+from django.db import models
+from django.urls import reverse
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 from taggit import serializers as tag_serializers
@@ -11,7 +13,7 @@ from apps.accounts.models import (
 )
 from apps.greencheck.models.co2_intensity import CO2Intensity
 
-from .models import GreencheckASN, GreencheckIp, GreenDomain
+from .models import BatchCheckJob, GreencheckASN, GreencheckIp, GreenDomain
 
 HIGHEST_ASN_POSSIBLE = 4294967295
 LOWEST_ASN_POSSIBLE = 1
@@ -119,11 +121,71 @@ class GreenDomainBatchSerializer(serializers.Serializer):
             "Without this, csv information is returned as an inline response."
         ),
     )
+    live_check = serializers.BooleanField(
+        required=False,
+        help_text=(
+            "Set to true to run a full check for any domains we have no cached "
+            "result for, instead of reporting them as grey. Results are streamed "
+            "back as they are checked."
+        ),
+    )
 
     class Meta:
         ref_name = "Batch Greencheck"
 
 
+class BatchCheckJobRequestSerializer(serializers.Serializer):
+    """
+    The upload to start a batch check job with.
+    """
+
+    urls = serializers.FileField(
+        help_text="Accepts a csv file, with one domain per line."
+    )
+    live_check = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text=(
+            "Set to true to run a full check for any domains we have no cached "
+            "result for, instead of reporting them as grey."
+        ),
+    )
+
+    class Meta:
+        ref_name = "Batch Greencheck Job Request"
+
+
+class BatchCheckJobSerializer(serializers.ModelSerializer):
+    """
+    The progress of a batch check job, with a link to download
+    the results once it has completed.
+    """
+
+    result_url = serializers.SerializerMethodField()
+
+    def get_result_url(self, instance):
+        if not instance.result_path:
+            return None
+
+        request = self.context.get("request")
+        path = reverse("green-domain-batch-job-download", kwargs={"pk": instance.pk})
+        return request.build_absolute_uri(path) if request else path
+
+    class Meta:
+        model = BatchCheckJob
+        fields = [
+            "id",
+            "status",
+            "live_check",
+            "total",
+            "checked",
+            "created",
+            "modified",
+            "result_url",
+        ]
+        ref_name = "Batch Greencheck Job"
+
+
 class HostingDocumentSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         return {
@@ -159,6 +221,50 @@ class HostingProviderSerializer(
         ]
 
 
+def public_supporting_documents_by_provider(provider_ids) -> dict:
+    """
+    Return a dict of hosting provider id to the provider's public supporting
+    documents, for each of the providers that exist, in two queries however
+    many providers we are asked for.
+    """
+    if not provider_ids:
+        return {}
+
+    documents = {
+        provider_id: []
+        for provider_id in Hostingprovider.objects.filter(id__in=provider_ids).values_list(
+            "id", flat=True
+        )
+    }
+    for doc in HostingProviderSupportingDocument.objects.filter(
+        hostingprovider_id__in=documents.keys(), public=True
+    ):
+        documents[doc.hostingprovider_id].append(doc)
+
+    return documents
+
+
+class GreenDomainListSerializer(serializers.ListSerializer):
+    """
+    Serialises many green domains at once, loading the supporting documents
+    for all of their hosting providers together, rather than once per domain.
+    """
+
+    def to_representation(self, data):
+        if isinstance(data, models.manager.BaseManager):
+            data = data.all()
+        green_domains = list(data)
+
+        self.supporting_documents_by_provider = public_supporting_documents_by_provider(
+            {
+                green_domain.hosted_by_id
+                for green_domain in green_domains
+                if green_domain.hosted_by_id
+            }
+        )
+        return super().to_representation(green_domains)
+
+
 class GreenDomainSerializer(serializers.ModelSerializer):
     """
     The serialiser for our green domains checking table.
@@ -170,10 +276,17 @@ class GreenDomainSerializer(serializers.ModelSerializer):
         """
 
         ret = super().to_representation(instance)
-        provider = instance.hosting_provider
-        if provider:
+
+        # when serialising many domains, the list serialiser
+        # has already loaded the documents for us
+        documents_by_provider = getattr(self.parent, "supporting_documents_by_provider", None)
+        if documents_by_provider is None:
+            documents_by_provider = public_supporting_documents_by_provider(
+                {instance.hosted_by_id} if instance.hosted_by_id else set()
+            )
+
+        if (docs := documents_by_provider.get(instance.hosted_by_id)) is not None:
             # we only want to show public supporting docs
-            docs = provider.supporting_documents.filter(public=True)
             ret["supporting_documents"] = HostingDocumentSerializer(
                 docs, many=True
             ).data
@@ -182,6 +295,7 @@ class GreenDomainSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = GreenDomain
+        list_serializer_class = GreenDomainListSerializer
         fields = [
             "url",
             "hosted_by",
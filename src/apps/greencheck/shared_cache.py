@@ -0,0 +1,97 @@
+"""
+A cache shared between all our processes, for results that are expensive
+to look up, and read on almost every greencheck: green domains, carbon.txt
+lookups for domains, and hosting provider details, along with the documents
+served by our legacy directory API.
+
+The backend is set with the SHARED_CACHE_URL setting, so it can be memcached
+or Redis in production, so every gunicorn worker sees the same entries, or a
+local memory cache in development. It is a dummy cache in tests. Entries
+expire after SHARED_CACHE_TTL seconds.
+
+Each kind of entry has its own key prefix, and the code that writes the
+underlying rows is responsible for deleting the matching entry, so we don't
+serve stale results until they expire.
+
+That only works if the cache really is shared. With the local memory
+default, invalidating an entry, or marking a domain as refreshed for the
+read replica, only reaches the process that did it, and the others serve
+what they have until it expires. So production needs SHARED_CACHE_URL set
+to memcached or Redis, and we warn about it in the `greencheck.W001` system
+check.
+"""
+
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+# The cache alias for the shared cache, in CACHES
+SHARED_CACHE = "shared"
+
+# What we store for a lookup we know has no result, as the cache
+# returns None for a missing key
+NO_RESULT = "none"
+
+
+def shared_cache():
+    return caches[SHARED_CACHE]
+
+
+def is_shared_between_processes() -> bool:
+    """
+    Return False if the shared cache is only local memory, so entries we
+    set or delete are not seen by other processes.
+    """
+    return not isinstance(shared_cache(), LocMemCache)
+
+
+def green_domain_key(domain: str) -> str:
+    return f"greendomain:{domain}"
+
+
+def grey_domain_key(domain: str) -> str:
+    return f"greydomain:{domain}"
+
+
+def carbon_txt_domain_key(domain: str) -> str:
+    return f"carbontxt_domain:{domain}"
+
+
+def provider_key(provider_id: int) -> str:
+    return f"provider:{provider_id}"
+
+
+def directory_provider_key(provider_id: int) -> str:
+    return f"directory_provider:{provider_id}"
+
+
+def green_domain_snapshots_key() -> str:
+    return "green_domain_snapshots"
+
+
+def co2_intensity_version_key() -> str:
+    return "co2_intensity_version"
+
+
+def refreshed_domain_key(domain: str) -> str:
+    return f"refreshed:{domain}"
+
+
+def directory_generation_key() -> str:
+    return "directory_generation"
+
+
+def directory_generation() -> int:
+    """
+    Return the current generation of the public directory page. Cached
+    fragments of the page include it in their keys, so changing it expires
+    all of them at once.
+    """
+    return shared_cache().get_or_set(
+        directory_generation_key(), time.time_ns, timeout=None
+    )
+
+
+def expire_directory():
+    shared_cache().set(directory_generation_key(), time.time_ns(), timeout=None)
@@ -0,0 +1,109 @@
+"""
+Helpers for coalescing concurrent work on the same key, so that when many
+requests check the same domain at once, only one of them does the expensive
+lookups, and the rest use its result.
+
+`SingleFlight` coalesces calls between threads in the same process. To
+coalesce across processes, `shared_lock` uses a cache that every process can
+see as a lock, so that callers in other processes can wait for the holder
+to finish, then read its result from wherever it was stored.
+"""
+
+import logging
+import threading
+import time
+import typing
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """
+    A call in flight, that other callers with the same key can wait on.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Run at most one call at a time per key in this process. Callers arriving
+    while a call for their key is in flight wait for it, and share its result,
+    or its exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: typing.Hashable, fn: typing.Callable, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+@contextmanager
+def shared_lock(
+    key: str,
+    cache_alias: typing.Union[str, None],
+    timeout: float,
+    poll_interval: float = 0.05,
+) -> typing.Iterator[bool]:
+    """
+    Try to take a lock named `key` in the cache `cache_alias`, yielding True
+    if we hold it. If another process holds it, wait until they release it,
+    or it expires after `timeout` seconds, then yield False, so the caller
+    can look for the result the holder stored.
+
+    With no cache alias we don't coalesce across processes, and always
+    yield True.
+    """
+    if cache_alias is None:
+        yield True
+        return
+
+    cache = caches[cache_alias]
+    lock_key = f"lock:{key}"
+    token = uuid.uuid4().hex
+
+    if cache.add(lock_key, token, timeout=timeout):
+        try:
+            yield True
+        finally:
+            # only release the lock if it is still ours, and hasn't
+            # expired and been taken by someone else
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+        return
+
+    deadline = time.monotonic() + timeout
+    while cache.get(lock_key) is not None and time.monotonic() < deadline:
+        time.sleep(poll_interval)
+
+    yield False
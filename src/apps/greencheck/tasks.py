@@ -1,31 +1,103 @@
+import csv
+import gzip
 import logging
+import tempfile
 
 import dramatiq
 import MySQLdb
+from django import db as django_db
+from django.core.files import File
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-@dramatiq.actor
+# the longest we let a batch check job run, in milliseconds
+BATCH_CHECK_TIME_LIMIT = 1000 * 60 * 60 * 6
+# batch check jobs run on their own queue, with their own workers, so long
+# jobs can't hold up logging greenchecks on the default queue
+BATCH_CHECK_QUEUE = "batch_checks"
+
+@dramatiq.actor(max_retries=3)
 def process_log(sitecheck_args):
+    """
+    Log a single sitecheck to the greencheck table. Web processes now send
+    their sitechecks in batches to `process_logs` instead, so this only handles
+    messages queued before they did. If the sitecheck can't be written for
+    reasons that might pass, like a lost connection to the database, we
+    raise, so dramatiq retries the message.
+    """
+    return process_logs([sitecheck_args])
+
+
+@dramatiq.actor(max_retries=3)
+def process_logs(sitechecks_args):
+    """
+    Log a batch of sitechecks sent from a web process's log buffer to the
+    greencheck table, in one INSERT. If the batch can't be written for
+    reasons that might pass, we raise, so dramatiq retries the message.
+    """
     from .models import Greencheck, SiteCheck # Prevent circular import error
-    sitecheck = SiteCheck.from_dict(sitecheck_args)
+    sitechecks = [SiteCheck.from_dict(sitecheck_args) for sitecheck_args in sitechecks_args]
+
+    logger.debug(f"logging {len(sitechecks)} checks")
+
+    try:
+        Greencheck.log_sitechecks_synchronous(sitechecks)
+    except (MySQLdb.OperationalError, django_db.OperationalError) as err:
+        logger.warning(
+            f"Problem reported by the database when trying to log {len(sitechecks)} checks"
+        )
+        logger.warning(err)
+        raise
+    except Exception as err:
+        logger.exception(err)
+        return False
 
-    logger.debug(f"logging a check for {sitecheck.url}")
 
-    if sitecheck is not None:
-        try:
+@dramatiq.actor(
+    max_retries=0, time_limit=BATCH_CHECK_TIME_LIMIT, queue_name=BATCH_CHECK_QUEUE
+)
+def process_batch_check(job_id):
+    """
+    Check every domain in a batch check job's upload, a chunk at a time,
+    writing the results to a compressed CSV file in object storage, and
+    recording our progress on the job as we go.
+    """
+    from django.core.files.storage import default_storage
+    from .batch_check import RESULT_HEADER, batch_check_chunks, iter_csv_urls
+    from .choices import BatchCheckJobStatus
+    from .models import BatchCheckJob # Prevent circular import error
 
-            Greencheck.log_sitecheck_synchronous(sitecheck)
-        except MySQLdb.OperationalError as err:
-            logger.warning(
-                (
-                    f"Problem reported by the database when trying to "
-                    f"log domain: {sitecheck.url}"
+    job = BatchCheckJob.objects.get(id=job_id)
+    job.status = BatchCheckJobStatus.RUNNING
+    job.save(update_fields=["status", "modified"])
+
+    try:
+        with default_storage.open(job.upload_path, "rb") as upload:
+            job.total = sum(1 for _ in iter_csv_urls(upload))
+        job.save(update_fields=["total", "modified"])
+
+        with tempfile.TemporaryFile() as result_file:
+            with gzip.open(result_file, "wt", newline="") as compressed:
+                writer = csv.DictWriter(
+                    compressed, fieldnames=RESULT_HEADER, extrasaction="ignore"
                 )
-            )
-            logger.warning(err)
-            return False
-        except Exception as err:
-            logger.exception(err)
-            return False
+                writer.writeheader()
+
+                with default_storage.open(job.upload_path, "rb") as upload:
+                    for rows in batch_check_chunks(iter_csv_urls(upload), job.live_check):
+                        writer.writerows(rows)
+                        job.checked += len(rows)
+                        job.save(update_fields=["checked", "modified"])
+
+            result_file.seek(0)
+            job.save_result(File(result_file))
+    except Exception as err:
+        logger.exception(err)
+        job.status = BatchCheckJobStatus.FAILED
+        job.error = str(err)
+        job.save(update_fields=["status", "error", "modified"])
+        return False
+
+    job.status = BatchCheckJobStatus.COMPLETED
+    job.save(update_fields=["status", "result_path", "modified"])
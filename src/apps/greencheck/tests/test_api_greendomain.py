@@ -1,5 +1,7 @@
+import contextlib
 import csv
 from datetime import timezone
+import gzip
 import io
 import logging
 from typing import List
@@ -8,15 +10,19 @@ from dateutil.relativedelta import relativedelta
 
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management import call_command
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework.test import APIRequestFactory
 
-from ..models import GreencheckIp, GreenDomain
+from ..dns_resolver import StaticResolver
+from ..models import BatchCheckJob, GreencheckIp, GreenDomain, SiteCheck
+from ..tasks import process_batch_check
 
 from ...accounts import models as ac_models
 
-from ..viewsets import GreenDomainViewset
+from ..viewsets import BatchViewHelpers, GreenDomainViewset
 from . import greencheck_sitecheck, setup_domains, create_greendomain
 
 User = get_user_model()
@@ -374,6 +380,69 @@ class TestGreenDomainViewset:
         green_domain_badge_cache_mock.assert_called_with(new_domain)
         carbon_txt_cache_mock.assert_called_with(new_domain)
 
+    def test_grey_results_are_cached(self, locmem_cache, mocker):
+        """
+        When we check a grey domain twice, do we only run the full lookup
+        once, unless we explicitly bust the cache?
+        """
+        locmem_cache("grey_domains")
+        mocked_network_function = mocker.patch(
+            "apps.greencheck.domain_check.convert_domain_to_ip",
+            return_value="192.168.0.1",
+        )
+
+        grey_domain = "a-grey-domain.com"
+        url_path = reverse("green-domain-detail", kwargs={"url": grey_domain})
+        view = GreenDomainViewset.as_view({"get": "retrieve"})
+
+        first_response = view(rf.get(url_path), url=grey_domain)
+        second_response = view(rf.get(url_path), url=grey_domain)
+
+        assert first_response.data["green"] is False
+        assert second_response.data["green"] is False
+        assert mocked_network_function.call_count == 1
+
+        view(rf.get(url_path, data={"nocache": "true"}), url=grey_domain)
+
+        assert mocked_network_function.call_count == 2
+
+    def test_grey_results_are_shared_between_processes(
+        self, shared_cache, locmem_cache, settings, mocker
+    ):
+        """
+        When a check waits for another process checking the same grey domain,
+        does it use the grey result that process found, rather than running
+        the full lookup again?
+        """
+        locmem_cache("grey_domains")
+        check_domain = mocker.patch(
+            "apps.greencheck.domain_check.GreenDomainChecker.check_domain",
+            side_effect=lambda domain, **kwargs: SiteCheck.grey_sitecheck(
+                domain, "192.168.0.1"
+            ),
+        )
+        grey_domain = "a-grey-domain.com"
+
+        GreenDomain._check_and_cache(grey_domain)
+
+        # another process, with its own grey domain cache, waiting on the
+        # lock the first one held
+        settings.CACHES = {
+            **settings.CACHES,
+            "grey_domains": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "test_other_grey_domains",
+            },
+        }
+        mocker.patch(
+            "apps.greencheck.models.green_domain.shared_lock",
+            return_value=contextlib.nullcontext(False),
+        )
+        _, result = GreenDomain._check_and_cache(grey_domain)
+
+        assert result.green is False
+        assert check_domain.call_count == 1
+
 
 class TestGreenDomainBatchView:
     def test_check_multple_urls_via_post(
@@ -477,3 +546,217 @@ class TestGreenDomainBatchView:
         assert (
             response["Content-Disposition"] == "attachment; filename=given_filename.csv"
         )
+
+    def test_live_check_streams_results(
+        self,
+        hosting_provider_with_sample_user: ac_models.Hostingprovider,
+        green_ip: GreencheckIp,
+        client,
+        mocker,
+    ):
+        """
+        With a live check, do we check the domains we have no cached
+        result for, instead of reporting them grey?
+        """
+        cached_domains = ["google.com"]
+        uncached_green_domains = ["anothergreendomain.com"]
+        grey_domains = ["fossilfuels4ever.com"]
+
+        fake_csv_file = io.StringIO()
+        for domain in cached_domains + uncached_green_domains + grey_domains:
+            fake_csv_file.write(f"{domain}\n")
+        fake_csv_file.seek(0)
+
+        setup_domains(cached_domains, hosting_provider_with_sample_user, green_ip)
+        mocker.patch(
+            "apps.greencheck.domain_check.get_resolver",
+            return_value=StaticResolver(
+                {
+                    "anothergreendomain.com": ["172.217.168.238"],
+                    "fossilfuels4ever.com": ["10.0.0.1"],
+                }
+            ),
+        )
+        mocker.patch(
+            "apps.greencheck.domain_check.ProviderCarbonTxt.find_for_domain",
+            return_value=None,
+        )
+        mocker.patch("apps.greencheck.domain_check.asn_from_ip", return_value=None)
+
+        url_path = reverse("green-domain-batch")
+        response = client.post(
+            url_path,
+            {"urls": fake_csv_file, "live_check": "true"},
+            HTTP_ACCEPT="text/csv",
+        )
+
+        assert response.status_code == 200
+        assert response.streaming
+
+        content = b"".join(response.streaming_content).decode("utf-8")
+        parsed_rows = list(csv.DictReader(io.StringIO(content)))
+
+        assert [row["url"] for row in parsed_rows] == [
+            "google.com",
+            "anothergreendomain.com",
+            "fossilfuels4ever.com",
+        ]
+        assert [row["green"] for row in parsed_rows] == ["True", "True", "False"]
+        # the new green result is cached for next time
+        assert GreenDomain.objects.filter(url="anothergreendomain.com").exists()
+
+
+class TestBatchViewHelpers:
+    def test_batch_lookup_queries_do_not_grow_with_urls(
+        self,
+        hosting_provider_with_sample_user: ac_models.Hostingprovider,
+        green_ip: GreencheckIp,
+        django_assert_num_queries,
+    ):
+        """
+        Do we look up a batch of urls in a fixed number of queries, however
+        many grey domains there are, and only return each domain once?
+        """
+        green_domains = ["google.com", "anothergreendomain.com"]
+        grey_domains = [f"fossilfuels{number}.com" for number in range(20)]
+        setup_domains(green_domains, hosting_provider_with_sample_user, green_ip)
+
+        urls = green_domains + grey_domains + [" Google.com ", "fossilfuels1.com", ""]
+
+        # green domains, carbon.txt timestamps for the grey domains,
+        # then providers and their supporting documents
+        with django_assert_num_queries(4):
+            data = BatchViewHelpers().response_for_urls_list(urls).data
+
+        returned_domains = [row["url"] for row in data]
+        assert sorted(returned_domains) == sorted(green_domains + grey_domains)
+
+
+class TestSaveGreenResults:
+    def test_updates_existing_rows_rather_than_duplicating(
+        self,
+        hosting_provider_with_sample_user: ac_models.Hostingprovider,
+        green_domain_factory,
+    ):
+        provider = hosting_provider_with_sample_user
+        existing = green_domain_factory.create(url="google.com", hosted_by=provider)
+        new_results = [
+            GreenDomain(
+                url=url,
+                hosted_by=provider.name,
+                hosted_by_id=provider.id,
+                hosted_by_website="https://example.com",
+                partner="",
+                listed_provider=provider.is_listed,
+                modified=timezone.now(),
+                green=True,
+                type="ip",
+            )
+            for url in ["google.com", "anothergreendomain.com"]
+        ]
+
+        GreenDomain.save_green_results(new_results)
+
+        assert GreenDomain.objects.filter(url="google.com").count() == 1
+        assert GreenDomain.objects.filter(url="anothergreendomain.com").count() == 1
+        existing.refresh_from_db()
+        assert existing.hosted_by_website == "https://example.com"
+
+
+class TestBatchCheckJob:
+    @pytest.fixture(autouse=True)
+    def media_root(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+
+    def upload(self, client, domains, mocker):
+        fake_csv_file = io.StringIO()
+        for domain in domains:
+            fake_csv_file.write(f"{domain}\n")
+        fake_csv_file.seek(0)
+
+        send = mocker.patch("apps.greencheck.viewsets.process_batch_check.send")
+        response = client.post(reverse("green-domain-batch-jobs"), {"urls": fake_csv_file})
+        return response, send
+
+    def test_upload_starts_a_job(self, client, mocker):
+        response, send = self.upload(client, ["google.com"], mocker)
+
+        assert response.status_code == 202
+        assert response.data["status"] == "pending"
+        assert response.data["result_url"] is None
+        send.assert_called_once_with(response.data["id"])
+
+    def test_job_writes_compressed_results(
+        self,
+        hosting_provider_with_sample_user: ac_models.Hostingprovider,
+        green_ip: GreencheckIp,
+        client,
+        mocker,
+    ):
+        green_domains = ["google.com", "anothergreendomain.com"]
+        grey_domains = ["fossilfuels4ever.com"]
+        setup_domains(green_domains, hosting_provider_with_sample_user, green_ip)
+
+        response, _ = self.upload(client, green_domains + grey_domains, mocker)
+        job_id = response.data["id"]
+
+        process_batch_check(job_id)
+
+        job = BatchCheckJob.objects.get(id=job_id)
+        assert job.status == "completed"
+        assert job.total == job.checked == 3
+
+        status_response = client.get(
+            reverse("green-domain-batch-job-detail", kwargs={"pk": job_id})
+        )
+        assert status_response.data["status"] == "completed"
+        assert status_response.data["result_url"].endswith(
+            reverse("green-domain-batch-job-download", kwargs={"pk": job_id})
+        )
+
+        download = client.get(
+            reverse("green-domain-batch-job-download", kwargs={"pk": job_id})
+        )
+        assert download.status_code == 302
+
+        with job_result_file(job) as result_file:
+            parsed_rows = list(csv.DictReader(result_file))
+
+        assert [row["url"] for row in parsed_rows] == green_domains + grey_domains
+        assert [row["green"] for row in parsed_rows] == ["True", "True", "False"]
+
+    def test_download_before_completion(self, client, mocker):
+        response, _ = self.upload(client, ["google.com"], mocker)
+
+        download = client.get(
+            reverse("green-domain-batch-job-download", kwargs={"pk": response.data["id"]})
+        )
+
+        assert download.status_code == 404
+
+
+    def test_deleting_a_job_deletes_its_files(self, client, mocker):
+        response, _ = self.upload(client, ["google.com"], mocker)
+        job = BatchCheckJob.objects.get(id=response.data["id"])
+        assert default_storage.exists(job.upload_path)
+
+        job.delete()
+
+        assert not default_storage.exists(job.upload_path)
+
+    def test_old_jobs_are_cleared(self, client, mocker):
+        old_response, _ = self.upload(client, ["google.com"], mocker)
+        new_response, _ = self.upload(client, ["google.com"], mocker)
+        BatchCheckJob.objects.filter(id=old_response.data["id"]).update(
+            created=timezone.now() - relativedelta(days=30)
+        )
+
+        call_command("clear_expired_greendomains", stdout=io.StringIO())
+
+        assert list(BatchCheckJob.objects.values_list("id", flat=True)) == [
+            new_response.data["id"]
+        ]
+
+
+def job_result_file(job):
+    return gzip.open(default_storage.open(job.result_path, "rb"), "rt")
@@ -0,0 +1,141 @@
+import pathlib
+import threading
+
+import pytest
+from django.core.management import call_command
+
+from .. import asn_prefix_table
+from .. import network_utils
+
+
+@pytest.fixture
+def sample_pfx2as_path() -> pathlib.Path:
+    this_file = pathlib.Path(__file__)
+    return this_file.parent.parent.joinpath("fixtures", "test_dataset_pfx2as.txt")
+
+
+@pytest.fixture
+def prefix_table(sample_pfx2as_path) -> asn_prefix_table.AsnPrefixTable:
+    return asn_prefix_table.load_asn_prefix_table(sample_pfx2as_path)
+
+
+class TestAsnPrefixTable:
+    @pytest.mark.parametrize(
+        "ip_address,expected_asn",
+        [
+            ("1.0.0.1", 13335),
+            ("1.0.0.255", 13335),
+            ("1.0.1.0", None),
+            # the /24 is more specific than the enclosing /22
+            ("1.0.4.1", "38803 56203"),
+            ("1.0.5.1", 64500),
+            ("1.0.6.1", "38803 56203"),
+            # as sets are separated by commas
+            ("1.0.16.10", "2519 2520"),
+            ("172.217.168.238", 15169),
+            ("2a00:1450:4001::1", 64501),
+            ("2a00:1450:4002::1", 15169),
+            ("2a00:1451::1", None),
+            ("0.0.0.0", None),
+            ("255.255.255.255", None),
+        ],
+    )
+    def test_longest_prefix_match(self, prefix_table, ip_address, expected_asn):
+        assert prefix_table.asn_for(ip_address) == expected_asn
+
+    def test_prefix_covering_the_last_address(self):
+        table = asn_prefix_table.AsnPrefixTable(
+            asn_prefix_table.parse_prefix_dump(["255.255.255.0\t24\t64500"])
+        )
+
+        assert table.asn_for("255.255.255.255") == 64500
+        assert table.asn_for("255.255.254.255") is None
+
+    def test_skips_unparseable_lines(self):
+        prefixes = list(
+            asn_prefix_table.parse_prefix_dump(
+                ["# a comment", "", "not a prefix", "1.0.0.0\t24\t13335"]
+            )
+        )
+
+        assert len(prefixes) == 1
+
+
+@pytest.fixture
+def fresh_table(monkeypatch):
+    """
+    Make sure we load the table in each test, rather than using one
+    loaded by an earlier test.
+    """
+    monkeypatch.setattr(asn_prefix_table, "_table_mtime", None)
+    monkeypatch.setattr(asn_prefix_table, "_table_checked_at", None)
+    asn_prefix_table._table.clear()
+    yield
+    asn_prefix_table._table.clear()
+
+
+@pytest.mark.usefixtures("fresh_table")
+class TestAsnPrefixTableReloading:
+    def test_checks_for_a_new_table_on_an_interval(
+        self, settings, sample_pfx2as_path, mocker
+    ):
+        settings.ASN_PREFIX_TABLE_PATH = sample_pfx2as_path
+        settings.ASN_PREFIX_TABLE_CHECK_INTERVAL = 60
+        stat = mocker.spy(asn_prefix_table.os, "stat")
+
+        tables = [asn_prefix_table.asn_prefix_table() for _ in range(3)]
+
+        assert stat.call_count == 1
+        assert tables[0] is not None
+        assert tables[0] is tables[1] is tables[2]
+
+    def test_loads_the_table_in_the_background(
+        self, settings, sample_pfx2as_path, mocker
+    ):
+        """
+        Do lookups carry on without the table while it loads, rather
+        than waiting for it?
+        """
+        settings.ASN_PREFIX_TABLE_PATH = sample_pfx2as_path
+        settings.GREENCHECK_RELOAD_IN_BACKGROUND = True
+        release = threading.Event()
+        load_table = asn_prefix_table.load_asn_prefix_table
+
+        def slow_load(path):
+            release.wait(timeout=5)
+            return load_table(path)
+
+        mocker.patch.object(asn_prefix_table, "load_asn_prefix_table", slow_load)
+
+        assert asn_prefix_table.asn_prefix_table() is None
+
+        release.set()
+        for thread in threading.enumerate():
+            if thread.name == "reload ASN prefix table":
+                thread.join(timeout=5)
+        assert asn_prefix_table._table.value.asn_for("172.217.168.238") == 15169
+
+
+@pytest.mark.usefixtures("fresh_table")
+class TestAsnFromIp:
+    def test_asn_from_ip_uses_local_table(self, settings, sample_pfx2as_path, mocker):
+        """
+        When we have a local prefix-to-AS table, do we use it instead of
+        making a live whois lookup?
+        """
+        settings.ASN_PREFIX_TABLE_PATH = sample_pfx2as_path
+        live_lookup = mocker.patch("apps.greencheck.network_utils.IPASN")
+
+        assert network_utils.asn_from_ip("172.217.168.238") == 15169
+        live_lookup.assert_not_called()
+
+
+class TestUpdateAsnPrefixTable:
+    def test_update_from_local_dump(self, settings, tmp_path, sample_pfx2as_path):
+        settings.ASN_PREFIX_TABLE_PATH = tmp_path / "pfx2as.txt.gz"
+
+        call_command("update_asn_prefix_table", str(sample_pfx2as_path))
+
+        table = asn_prefix_table.load_asn_prefix_table(settings.ASN_PREFIX_TABLE_PATH)
+        assert len(table) == 7
+        assert table.asn_for("1.0.4.1") == "38803 56203"
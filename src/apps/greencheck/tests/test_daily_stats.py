@@ -0,0 +1,186 @@
+import datetime
+
+import pytest
+from django.urls import reverse
+
+from ..hyperloglog import HyperLogLog
+from ..models import DailyStat, DailyTotal, Greencheck
+
+DAY = datetime.datetime(2024, 1, 1, 12, tzinfo=datetime.timezone.utc)
+
+
+def greencheck(url, provider_id=None, date=DAY):
+    return Greencheck(
+        url=url,
+        date=date,
+        green="yes" if provider_id else "no",
+        hostingprovider=provider_id or 0,
+        type="ip" if provider_id else "none",
+    )
+
+
+class TestHyperLogLog:
+    def test_estimates_distinct_values(self):
+        sketch = HyperLogLog.from_values(
+            f"{n}.example.com" for n in list(range(10_000)) * 2
+        )
+
+        assert sketch.count() == pytest.approx(10_000, rel=0.05)
+
+    def test_merged_sketches_count_the_union(self):
+        sketch = HyperLogLog.from_values(f"{n}.example.com" for n in range(0, 600))
+        sketch.merge(
+            HyperLogLog.from_values(f"{n}.example.com" for n in range(400, 1000))
+        )
+
+        assert sketch.count() == pytest.approx(1000, rel=0.05)
+
+    def test_round_trips_through_bytes(self):
+        sketch = HyperLogLog.from_values(["example.com", "example.org"])
+
+        assert HyperLogLog(sketch.to_bytes()).count() == 2
+
+
+@pytest.mark.django_db
+class TestDailyStat:
+    def test_record_checks_merges_batches(self, hosting_provider_factory):
+        provider = hosting_provider_factory.create()
+
+        DailyStat.record_checks(
+            [
+                greencheck("green.example.com", provider.id),
+                greencheck("green.example.com", provider.id),
+                greencheck("grey.example.com"),
+            ]
+        )
+        DailyStat.record_checks(
+            [
+                greencheck("green.example.com", provider.id),
+                greencheck("other.example.com", provider.id),
+            ]
+        )
+
+        green_stat = DailyStat.objects.get(green=True)
+        assert green_stat.date == DAY.date()
+        assert green_stat.hosting_provider_id == provider.id
+        assert green_stat.match_type == "ip"
+        assert green_stat.checks == 4
+        assert green_stat.domains == 2
+
+        # grey checks are only counted in the totals for the day
+        assert not DailyStat.objects.filter(green=False).exists()
+        total = DailyTotal.objects.get()
+        assert total.date == DAY.date()
+        assert total.checks == 5
+        assert total.green_checks == 4
+        assert total.domains == 3
+
+    def test_totals_by_date(self, hosting_provider_factory):
+        provider = hosting_provider_factory.create()
+        DailyStat.record_checks(
+            [
+                greencheck("green.example.com", provider.id),
+                greencheck("grey.example.com"),
+                greencheck("grey.example.com"),
+                greencheck(
+                    "green.example.com",
+                    provider.id,
+                    date=DAY + datetime.timedelta(days=1),
+                ),
+            ]
+        )
+
+        totals = DailyTotal.totals(DailyTotal.objects.all())
+
+        assert totals == [
+            {
+                "date": DAY.date(),
+                "checks": 3,
+                "green_checks": 1,
+                "green_ratio": 0.3333,
+                "domains": 2,
+            },
+            {
+                "date": (DAY + datetime.timedelta(days=1)).date(),
+                "checks": 1,
+                "green_checks": 1,
+                "green_ratio": 1.0,
+                "domains": 1,
+            },
+        ]
+
+    def test_totals_read_one_row_per_day(
+        self, hosting_provider_factory, django_assert_num_queries
+    ):
+        """
+        However many providers we logged checks for, do the totals for all
+        providers read a single row of one sketch for each day?
+        """
+        providers = hosting_provider_factory.create_batch(5)
+        days = [DAY + datetime.timedelta(days=day) for day in range(3)]
+        DailyStat.record_checks(
+            [
+                greencheck(f"{provider.id}.example.com", provider.id, date=day)
+                for provider in providers
+                for day in days
+            ]
+            + [greencheck("grey.example.com", date=day) for day in days]
+        )
+
+        with django_assert_num_queries(1):
+            totals = DailyTotal.totals(DailyTotal.objects.all())
+
+        assert [total["checks"] for total in totals] == [6, 6, 6]
+        assert [total["domains"] for total in totals] == [6, 6, 6]
+        assert DailyTotal.objects.count() == len(days)
+        assert all(
+            len(total.domains_sketch) == HyperLogLog().size
+            for total in DailyTotal.objects.all()
+        )
+
+
+@pytest.mark.django_db
+class TestDailyStatsViews:
+    def test_daily_stats(self, client, hosting_provider_factory):
+        provider = hosting_provider_factory.create()
+        DailyStat.record_checks(
+            [greencheck("green.example.com", provider.id), greencheck("grey.com")]
+        )
+
+        response = client.get(
+            reverse("stats-daily"), {"start": "2024-01-01", "end": "2024-01-31"}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["results"] == [
+            {
+                "date": "2024-01-01",
+                "checks": 2,
+                "green_checks": 1,
+                "green_ratio": 0.5,
+                "domains": 2,
+            }
+        ]
+
+    def test_provider_daily_stats_by_match_type(
+        self, client, hosting_provider_factory
+    ):
+        provider = hosting_provider_factory.create()
+        DailyStat.record_checks(
+            [greencheck("green.example.com", provider.id), greencheck("grey.com")]
+        )
+
+        response = client.get(
+            reverse("stats-daily-provider", args=[provider.id]),
+            {"start": "2024-01-01", "end": "2024-01-31", "by_match_type": "true"},
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [total["checks"] for total in data["results"]] == [1]
+        assert [total["match_type"] for total in data["match_types"]] == ["ip"]
+
+    def test_rejects_invalid_dates(self, client):
+        response = client.get(reverse("stats-daily"), {"start": "yesterday"})
+
+        assert response.status_code == 400
@@ -0,0 +1,71 @@
+import pytest
+from django.contrib.auth.models import Group
+from django.db import OperationalError
+
+from .. import db_router
+from ..models import GreenDomain
+
+
+@pytest.fixture
+def router():
+    return db_router.ReadReplicaRouter()
+
+
+@pytest.fixture
+def replica(settings, mocker, monkeypatch):
+    settings.READ_REPLICA_ENABLED = True
+    monkeypatch.setattr(db_router, "_replica_down_until", 0.0)
+    monkeypatch.setattr(db_router, "_replica_up_until", 0.0)
+    return mocker.patch.object(
+        db_router.connections[db_router.REPLICA_DATABASE], "ensure_connection"
+    )
+
+
+class TestReadReplicaRouter:
+    def test_reads_use_primary_by_default(self, router, replica):
+        assert router.db_for_read(GreenDomain) is None
+
+    def test_reads_use_replica_when_opted_in(self, router, replica):
+        with db_router.read_from_replica():
+            assert router.db_for_read(GreenDomain) == db_router.REPLICA_DATABASE
+            # models from other apps are left alone
+            assert router.db_for_read(Group) is None
+
+        assert router.db_for_read(GreenDomain) is None
+
+    def test_reads_use_primary_after_a_write(self, router, replica):
+        with db_router.read_from_replica():
+            assert router.db_for_write(GreenDomain) == "default"
+            assert router.db_for_read(GreenDomain) is None
+
+    def test_reads_use_primary_when_replica_is_down(self, router, replica):
+        replica.side_effect = OperationalError("replica is down")
+
+        with db_router.read_from_replica():
+            assert router.db_for_read(GreenDomain) is None
+
+        # we wait before trying the replica again
+        with db_router.read_from_replica():
+            assert router.db_for_read(GreenDomain) is None
+        assert replica.call_count == 1
+
+    def test_replica_health_is_remembered(self, router, replica):
+        with db_router.read_from_replica():
+            assert router.db_for_read(GreenDomain) == db_router.REPLICA_DATABASE
+        with db_router.read_from_replica():
+            assert router.db_for_read(GreenDomain) == db_router.REPLICA_DATABASE
+
+        # we only connect to check the replica once per interval
+        assert replica.call_count == 1
+
+    def test_reads_use_primary_after_domain_is_refreshed(
+        self, router, replica, shared_cache
+    ):
+        db_router.mark_refreshed("example.com")
+
+        with db_router.read_from_replica():
+            db_router.read_from_primary_if_refreshed("example.org")
+            assert router.db_for_read(GreenDomain) == db_router.REPLICA_DATABASE
+
+            db_router.read_from_primary_if_refreshed("example.com")
+            assert router.db_for_read(GreenDomain) is None
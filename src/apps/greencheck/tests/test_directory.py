@@ -1,6 +1,7 @@
 from django.urls import reverse
 from waffle.testutils import override_flag
 from apps.accounts.models import ProviderCarbonTxt
+from apps.greencheck.shared_cache import directory_generation
 
 
 import pytest
@@ -165,3 +166,72 @@ def test_directory_shows_upstream_providers_when_flag_is_on(
     content = res.content.decode()
     assert "Relies on:" in content
     assert "Upstream Green" in content
+
+
+@pytest.mark.django_db
+def test_directory_results_are_cached(client, shared_cache, hosting_provider_factory):
+    """
+    Check that we serve the rendered list of providers from the cache
+    """
+    hosting_provider_factory.create(country="DE", is_listed=True)
+    client.get(reverse("directory-index"))
+
+    res = client.get(reverse("directory-index"))
+
+    templates = [tpl.name for tpl in res.templates]
+    assert "greencheck/partials/_directory_results.html" not in templates
+    assert "verified green hosting" in res.content.decode()
+
+
+@pytest.mark.django_db
+def test_directory_results_expire_when_listed_provider_changes(
+    client, shared_cache, hosting_provider_factory, django_capture_on_commit_callbacks
+):
+    """
+    Check that changing a listed provider expires the cached list
+    """
+    provider = hosting_provider_factory.create(country="DE", is_listed=True)
+    client.get(reverse("directory-index"))
+
+    provider.name = "A renamed provider"
+    with django_capture_on_commit_callbacks(execute=True):
+        provider.save()
+    res = client.get(reverse("directory-index"))
+
+    assert "A renamed provider" in res.content.decode()
+
+
+@pytest.mark.django_db
+def test_directory_results_kept_when_unlisted_provider_changes(
+    shared_cache, hosting_provider_factory, django_capture_on_commit_callbacks
+):
+    """
+    Check that changing a provider outside the directory leaves the cache alone
+    """
+    provider = hosting_provider_factory.create(country="DE", is_listed=False)
+    generation = directory_generation()
+
+    provider.name = "A renamed provider"
+    with django_capture_on_commit_callbacks(execute=True):
+        provider.save()
+
+    assert directory_generation() == generation
+
+
+@pytest.mark.django_db
+def test_invalid_filters_are_cached_by_their_valid_filters(
+    client, shared_cache, hosting_provider_factory
+):
+    """
+    Check that a query with an invalid filter doesn't share its cached list
+    with other invalid queries, as the valid filters are still applied
+    """
+    hosting_provider_factory.create(country="DE", name="German provider", is_listed=True)
+    hosting_provider_factory.create(country="NL", name="Dutch provider", is_listed=True)
+    client.get(reverse("directory-index"), {"country": "DE", "services": "bogus"})
+
+    res = client.get(reverse("directory-index"), {"country": "NL", "services": "bogus"})
+
+    content = res.content.decode()
+    assert "Dutch provider" in content
+    assert "German provider" not in content
@@ -0,0 +1,126 @@
+import ipaddress
+import socket
+from types import SimpleNamespace
+
+import dns.exception
+import dns.resolver
+import pytest
+
+from .. import dns_resolver
+from .. import network_utils
+
+
+class FakeAnswer(list):
+    def __init__(self, rdatas, ttl):
+        super().__init__(rdatas)
+        self.rrset = SimpleNamespace(ttl=ttl)
+
+
+class FakeStubResolver:
+    """
+    Stands in for dnspython's async resolver, answering from
+    a dict of (domain, record type) to (addresses, ttl).
+    """
+
+    def __init__(self, answers, missing_domains=()):
+        self.answers = answers
+        self.missing_domains = missing_domains
+        self.queries = []
+
+    async def resolve(self, domain, record_type, **kwargs):
+        self.queries.append((domain, record_type))
+        if domain in self.missing_domains:
+            raise dns.resolver.NXDOMAIN()
+        if (domain, record_type) == ("slow.example.com", "A"):
+            raise dns.exception.Timeout()
+        if (domain, record_type) not in self.answers:
+            raise dns.resolver.NoAnswer()
+
+        addresses, ttl = self.answers[(domain, record_type)]
+        answer = [SimpleNamespace(address=address) for address in addresses]
+        return FakeAnswer(answer, ttl)
+
+
+@pytest.fixture
+def stub_resolver():
+    return FakeStubResolver(
+        {
+            ("example.com", "A"): (["93.184.215.14"], 300),
+            ("example.com", "AAAA"): (["2606:2800:21f:cb07:6820:80da:af6b:8b2c"], 60),
+        },
+        missing_domains=["does-not-exist.example.com"],
+    )
+
+
+@pytest.fixture
+def resolver(stub_resolver):
+    caching_resolver = dns_resolver.CachingResolver(
+        timeout=1, max_concurrency=10, max_entries=100,
+        min_ttl=0, max_ttl=3600, negative_ttl=300,
+    )
+    caching_resolver._stub_resolver = stub_resolver
+    return caching_resolver
+
+
+class TestCachingResolver:
+    def test_returns_ipv4_and_ipv6_addresses(self, resolver):
+        assert resolver.resolve("example.com") == [
+            ipaddress.ip_address("93.184.215.14"),
+            ipaddress.ip_address("2606:2800:21f:cb07:6820:80da:af6b:8b2c"),
+        ]
+
+    def test_caches_answers(self, resolver, stub_resolver):
+        resolver.resolve("example.com")
+        resolver.resolve("example.com")
+
+        assert len(stub_resolver.queries) == 2
+
+    def test_expires_answers_after_shortest_ttl(self, resolver, stub_resolver, mocker):
+        resolver.resolve("example.com")
+
+        # move past the 60 second ttl of the AAAA record
+        now = dns_resolver.time.monotonic()
+        mocker.patch("apps.greencheck.dns_resolver.time.monotonic", return_value=now + 61)
+        resolver.resolve("example.com")
+
+        assert len(stub_resolver.queries) == 4
+
+    def test_caches_missing_domains(self, resolver, stub_resolver):
+        for _ in range(2):
+            with pytest.raises(socket.gaierror):
+                resolver.resolve("does-not-exist.example.com")
+
+        assert len(stub_resolver.queries) == 2
+
+    def test_does_not_cache_timeouts(self, resolver, stub_resolver):
+        for _ in range(2):
+            with pytest.raises(socket.gaierror):
+                resolver.resolve("slow.example.com")
+
+        assert len(stub_resolver.queries) == 4
+
+    def test_ip_addresses_are_not_looked_up(self, resolver, stub_resolver):
+        assert resolver.resolve("172.217.168.238") == [
+            ipaddress.ip_address("172.217.168.238")
+        ]
+        assert stub_resolver.queries == []
+
+    def test_resolve_many(self, resolver):
+        results = resolver.resolve_many(["example.com", "does-not-exist.example.com"])
+
+        assert len(results["example.com"]) == 2
+        assert isinstance(results["does-not-exist.example.com"], socket.gaierror)
+
+
+class TestConvertDomainToIp:
+    def test_uses_configured_resolver(self, settings, mocker):
+        settings.DNS_RESOLVER = "apps.greencheck.dns_resolver.StaticResolver"
+        mocker.patch.object(
+            dns_resolver.StaticResolver,
+            "resolve",
+            return_value=[ipaddress.ip_address("172.217.168.238")],
+        )
+
+        assert network_utils.convert_domain_to_ip("example.com") == ipaddress.ip_address(
+            "172.217.168.238"
+        )
@@ -9,6 +9,7 @@ from apps.accounts import models as ac_models
 
 from .. import domain_check
 from .. import models as gc_models
+from ..dns_resolver import StaticResolver
 
 from ..network_utils import convert_domain_to_ip
 
@@ -76,6 +77,40 @@ class TestDomainChecker:
         assert not res.green
 
 
+    @mock.patch("apps.greencheck.domain_check.ProviderCarbonTxt")
+    def test_parallel_stages_prefer_carbon_txt(
+        self, provider_carbon_txt_mock, checker, provider_carbon_txt_factory, green_ip, settings
+    ):
+        """
+        Given a domain with a valid carbon.txt, that also resolves to a green IP,
+        when we run the check stages in parallel, does the carbon.txt still win?
+        """
+        settings.GREENCHECK_PARALLEL_STAGES = True
+        carbon_txt = provider_carbon_txt_factory(domain="example.com")
+        provider_carbon_txt_mock.find_for_domain.return_value = carbon_txt
+
+        res = checker.check_domain("172.217.168.238")
+
+        assert res.green
+        assert res.match_type == "carbontxt"
+
+    @mock.patch("apps.greencheck.domain_check.ProviderCarbonTxt")
+    def test_parallel_stages_fall_back_to_ip_range(
+        self, provider_carbon_txt_mock, checker, green_ip, settings
+    ):
+        """
+        Given a domain with no carbon.txt, that resolves to a green IP,
+        when we run the check stages in parallel, do we match by IP range?
+        """
+        settings.GREENCHECK_PARALLEL_STAGES = True
+        provider_carbon_txt_mock.find_for_domain.return_value = None
+
+        res = checker.check_domain("172.217.168.238")
+
+        assert res.green
+        assert res.match_type == "ip"
+        assert res.match_ip_range == green_ip.id
+
     def test_with_green_domain_by_ip(self, green_ip, checker):
         """
         Given a matching IP, do we return a green sitecheck?
@@ -391,3 +426,190 @@ class TestDomainChecker:
 
         assert res.hosting_provider_id == small_hosting_provider.id
 
+
+class TestRunInStageThread:
+    def test_keeps_a_working_connection(self, mocker):
+        """
+        Do we reuse the connection a stage thread already has open?
+        """
+        connection = mocker.patch("apps.greencheck.domain_check.connection")
+        connection.errors_occurred = False
+        connection.is_usable.return_value = True
+
+        assert domain_check.run_in_stage_thread(lambda domain: domain, "example.com") == "example.com"
+
+        connection.close.assert_not_called()
+
+    def test_closes_a_broken_connection(self, mocker):
+        """
+        Do we close a connection that stopped working, so the stage reconnects?
+        """
+        connection = mocker.patch("apps.greencheck.domain_check.connection")
+        connection.errors_occurred = True
+        connection.is_usable.return_value = False
+
+        domain_check.run_in_stage_thread(lambda: None)
+
+        connection.close.assert_called_once()
+
+    def test_pools_are_shared(self):
+        assert domain_check.stage_executor() is domain_check.stage_executor()
+        assert domain_check.batch_executor() is not domain_check.stage_executor()
+
+
+@mock.patch("apps.greencheck.domain_check.ProviderCarbonTxt")
+class TestCheckAllAddresses:
+    """
+    With GREENCHECK_CHECK_ALL_ADDRESSES set, do we check every address
+    a domain resolves to, and report how many of them were green?
+    """
+
+    @pytest.fixture(autouse=True)
+    def check_all_addresses(self, settings, mocker):
+        settings.GREENCHECK_CHECK_ALL_ADDRESSES = True
+        mocker.patch("apps.greencheck.domain_check.asn_from_ip", return_value=None)
+
+    def resolve_to(self, mocker, *addresses):
+        mocker.patch(
+            "apps.greencheck.domain_check.convert_domain_to_ips",
+            return_value=[ipaddress.ip_address(address) for address in addresses],
+        )
+
+    def test_all_addresses_green(self, provider_carbon_txt_mock, checker, green_ip, mocker):
+        provider_carbon_txt_mock.find_for_domain.return_value = None
+        self.resolve_to(mocker, "172.217.168.238", "172.217.168.239")
+
+        res = checker.check_domain("example.com")
+
+        assert res.green
+        assert res.match_ip_range == green_ip.id
+        assert res.address_coverage == "all"
+
+    def test_some_addresses_green(self, provider_carbon_txt_mock, checker, green_ip, mocker):
+        provider_carbon_txt_mock.find_for_domain.return_value = None
+        self.resolve_to(mocker, "10.0.0.1", "2a00:1450:4001::1", "172.217.168.238")
+
+        res = checker.check_domain("example.com")
+
+        assert res.green
+        assert res.ip == "172.217.168.238"
+        assert res.address_coverage == "some"
+
+    def test_no_addresses_green(self, provider_carbon_txt_mock, checker, green_ip, mocker):
+        provider_carbon_txt_mock.find_for_domain.return_value = None
+        self.resolve_to(mocker, "10.0.0.1", "10.0.0.2")
+
+        res = checker.check_domain("example.com")
+
+        assert not res.green
+        assert res.ip == "10.0.0.1"
+        assert res.address_coverage == "none"
+
+    def test_falls_back_to_asn(self, provider_carbon_txt_mock, checker, green_ip, green_asn, mocker):
+        provider_carbon_txt_mock.find_for_domain.return_value = None
+        green_asn.save()
+        self.resolve_to(mocker, "172.217.168.238", "10.0.0.1")
+        asn_lookup = mocker.patch(
+            "apps.greencheck.domain_check.asn_from_ip", return_value=green_asn.asn
+        )
+
+        res = checker.check_domain("example.com")
+
+        assert res.green
+        assert res.match_type == "ip"
+        assert res.address_coverage == "all"
+        # we only look up the ASN for the address no ip range matched
+        asn_lookup.assert_called_once_with(ipaddress.ip_address("10.0.0.1"))
+
+
+@mock.patch("apps.greencheck.domain_check.ProviderCarbonTxt")
+class TestCheckDomains:
+    @pytest.fixture(autouse=True)
+    def resolver(self, mocker):
+        resolver = StaticResolver(
+            {
+                "green.example.com": ["172.217.168.238"],
+                "also-green.example.com": ["172.217.168.239"],
+                "grey.example.com": ["10.0.0.1"],
+                "carbon-txt.example.com": ["10.0.0.2"],
+            }
+        )
+        mocker.patch("apps.greencheck.domain_check.get_resolver", return_value=resolver)
+        mocker.patch("apps.greencheck.domain_check.asn_from_ip", return_value=None)
+        return resolver
+
+    def test_returns_sitechecks_in_input_order(
+        self, provider_carbon_txt_mock, checker, green_ip, provider_carbon_txt_factory
+    ):
+        carbon_txt = provider_carbon_txt_factory(domain="carbon-txt.example.com")
+        provider_carbon_txt_mock.find_for_domain.side_effect = lambda domain, **kwargs: (
+            carbon_txt if domain == "carbon-txt.example.com" else None
+        )
+
+        domains = [
+            "grey.example.com",
+            "green.example.com",
+            "does-not-resolve.example.com",
+            "carbon-txt.example.com",
+            "green.example.com",
+        ]
+        res = checker.check_domains(domains)
+
+        assert [sitecheck.url for sitecheck in res] == domains
+        assert [sitecheck.green for sitecheck in res] == [False, True, False, True, True]
+        assert res[1].match_ip_range == green_ip.id
+        assert res[2].ip == domain_check.UNRESOLVED_ADDRESS
+        assert res[3].match_type == "carbontxt"
+        # each domain is only checked once
+        assert provider_carbon_txt_mock.find_for_domain.call_count == 4
+
+    def test_matches_all_addresses_in_one_query(
+        self, provider_carbon_txt_mock, checker, green_ip, django_assert_num_queries
+    ):
+        provider_carbon_txt_mock.find_for_domain.return_value = None
+
+        with django_assert_num_queries(1):
+            res = checker.check_domains(
+                ["green.example.com", "also-green.example.com", "grey.example.com"]
+            )
+
+        assert [sitecheck.green for sitecheck in res] == [True, True, False]
+
+    def test_looks_up_green_asns_in_one_query(
+        self, provider_carbon_txt_mock, checker, green_asn, mocker, django_assert_num_queries
+    ):
+        provider_carbon_txt_mock.find_for_domain.return_value = None
+        green_asn.save()
+        mocker.patch("apps.greencheck.domain_check.asn_from_ip", return_value=green_asn.asn)
+
+        # one query for the ip ranges, one for the ASNs
+        with django_assert_num_queries(2):
+            res = checker.check_domains(["grey.example.com", "carbon-txt.example.com"])
+
+        assert all(sitecheck.green for sitecheck in res)
+        assert {sitecheck.match_type for sitecheck in res} == {"as"}
+
+    def test_skips_malformed_asns(
+        self, provider_carbon_txt_mock, checker, green_asn, mocker
+    ):
+        green_asn.save()
+        mocker.patch(
+            "apps.greencheck.domain_check.asn_from_ip",
+            side_effect=["", f"garbage {green_asn.asn}", "NA"],
+        )
+
+        res = checker.check_for_matching_asns(["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+
+        assert res == [None, green_asn, None]
+
+    def test_looks_up_each_address_once(
+        self, provider_carbon_txt_mock, checker, mocker
+    ):
+        asn_from_ip = mocker.patch(
+            "apps.greencheck.domain_check.asn_from_ip", return_value=None
+        )
+
+        res = checker.check_for_matching_asns(["10.0.0.1", "10.0.0.2", "10.0.0.1"])
+
+        assert res == [None, None, None]
+        assert asn_from_ip.call_count == 2
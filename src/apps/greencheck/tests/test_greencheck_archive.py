@@ -0,0 +1,75 @@
+import datetime
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from .. import factories as gc_factories
+from ..greencheck_archive import GreencheckArchive
+from ..models import Greencheck
+
+OLD_DAY = datetime.datetime(2020, 1, 1, 12)
+
+
+def create_greencheck(url, date):
+    return gc_factories.GreencheckFactory.create(url=url, date=date, green="yes")
+
+
+@pytest.mark.django_db
+class TestGreencheckArchive:
+    def test_archives_old_checks_by_day(self, tmp_path):
+        create_greencheck("old.example.com", OLD_DAY)
+        create_greencheck("older.example.com", OLD_DAY - datetime.timedelta(days=1))
+        recent = create_greencheck("recent.example.com", datetime.datetime.now())
+        archive = GreencheckArchive(str(tmp_path))
+
+        archived = archive.archive_before(
+            datetime.datetime(2021, 1, 1), chunk_size=100
+        )
+
+        assert archived == 2
+        assert list(Greencheck.objects.all()) == [recent]
+        assert sorted(path.parent.name for path in tmp_path.glob("*/*.parquet")) == [
+            "day=2019-12-31",
+            "day=2020-01-01",
+        ]
+
+        rows = archive.query(OLD_DAY.date(), OLD_DAY.date())
+        assert [row["url"] for row in rows] == ["old.example.com"]
+        assert rows[0]["date"] == OLD_DAY
+        assert rows[0]["green"] == "yes"
+
+    def test_archives_in_chunks(self, tmp_path):
+        for n in range(5):
+            create_greencheck(f"{n}.example.com", OLD_DAY)
+        archive = GreencheckArchive(str(tmp_path))
+
+        archived = archive.archive_before(datetime.datetime(2021, 1, 1), chunk_size=2)
+
+        assert archived == 5
+        assert not Greencheck.objects.exists()
+        assert len(list(tmp_path.glob("day=2020-01-01/*.parquet"))) == 3
+        assert archive.query(
+            OLD_DAY.date(), OLD_DAY.date(), "SELECT count(*) AS checks FROM greenchecks"
+        ) == [{"checks": 5}]
+
+    def test_query_with_nothing_archived(self, tmp_path):
+        archive = GreencheckArchive(str(tmp_path))
+
+        assert archive.query(OLD_DAY.date(), OLD_DAY.date()) == []
+
+
+@pytest.mark.django_db
+def test_archive_greenchecks_command(settings, tmp_path):
+    settings.GREENCHECK_ARCHIVE_DIR = str(tmp_path)
+    settings.GREENCHECK_ARCHIVE_BUCKET = ""
+    create_greencheck("old.example.com", OLD_DAY)
+    create_greencheck("recent.example.com", datetime.datetime.now())
+
+    stdout = StringIO()
+    call_command("archive_greenchecks", "--days", "30", stdout=stdout)
+
+    assert "Archived 1 greenchecks" in stdout.getvalue()
+    assert list(Greencheck.objects.values_list("url", flat=True)) == [
+        "recent.example.com"
+    ]
@@ -2,6 +2,7 @@ import logging
 import pytest
 
 from django.urls import reverse
+from geoip2 import errors
 from rest_framework.test import APIRequestFactory
 
 from .. import api
@@ -105,3 +106,118 @@ class TestIPCO2IntensitySerializer:
 
         for field in fields:
             assert field in serialized.data
+
+
+@pytest.fixture
+def fresh_intensities():
+    """
+    Clear each process's copy of the CO2 intensity table, as rolling back
+    a test's transaction doesn't send the signals that would.
+    """
+    CO2Intensity.expire_cached_intensities()
+    yield
+    CO2Intensity.expire_cached_intensities()
+
+
+def make_intensity(country_code, year, carbon_intensity):
+    return CO2Intensity.objects.create(
+        country_name="Germany",
+        country_code_iso_2=country_code,
+        country_code_iso_3="DEU",
+        carbon_intensity=carbon_intensity,
+        carbon_intensity_type="avg",
+        year=year,
+    )
+
+
+@pytest.mark.usefixtures("fresh_intensities")
+class TestCO2IntensityLookup:
+    def test_latest_year_is_returned(self):
+        make_intensity("DE", 2020, 400)
+        make_intensity("DE", 2022, 350)
+        make_intensity("DE", 2021, 380)
+
+        res = CO2Intensity.check_for_country_code("DE")
+
+        assert res.year == 2022
+        assert res.carbon_intensity == 350
+
+    def test_unknown_country_falls_back_to_global_value(self):
+        make_intensity("DE", 2022, 350)
+
+        res = CO2Intensity.check_for_country_code("XX")
+
+        assert res.carbon_intensity == models.co2_intensity.GLOBAL_AVG_CO2_INTENSITY
+
+    def test_lookups_do_not_query_the_database(self, django_assert_num_queries):
+        make_intensity("DE", 2022, 350)
+        CO2Intensity.check_for_country_code("DE")
+
+        with django_assert_num_queries(0):
+            res = CO2Intensity.check_for_country_code("DE")
+
+        assert res.carbon_intensity == 350
+
+    def test_saving_an_intensity_refreshes_the_table(self):
+        intensity = make_intensity("DE", 2022, 350)
+        assert CO2Intensity.check_for_country_code("DE").carbon_intensity == 350
+
+        intensity.carbon_intensity = 300
+        intensity.save()
+
+        assert CO2Intensity.check_for_country_code("DE").carbon_intensity == 300
+
+    def test_unseen_changes_are_picked_up_after_max_age(self, settings):
+        # an import in another process, whose change to the shared version
+        # didn't reach us, and updated the table without sending signals here
+        settings.CO2_INTENSITY_CHECK_INTERVAL = 0
+        settings.CO2_INTENSITY_MAX_AGE = 3600
+        make_intensity("DE", 2022, 350)
+        CO2Intensity.check_for_country_code("DE")
+        CO2Intensity.objects.filter(country_code_iso_2="DE").update(carbon_intensity=300)
+
+        assert CO2Intensity.check_for_country_code("DE").carbon_intensity == 350
+
+        settings.CO2_INTENSITY_MAX_AGE = 0
+
+        assert CO2Intensity.check_for_country_code("DE").carbon_intensity == 300
+
+
+class TestCountryCodeForIP:
+    @pytest.fixture(autouse=True)
+    def clear_lookups(self):
+        api.views.country_code_for_ip.cache_clear()
+        yield
+        api.views.country_code_for_ip.cache_clear()
+
+    def test_repeated_lookups_use_the_cache(self, mocker):
+        geolookup = mocker.patch("apps.greencheck.api.views.geolookup")
+        geolookup.city.return_value = {"country_code": "DE"}
+
+        assert api.views.country_code_for_ip("85.17.184.227") == "DE"
+        assert api.views.country_code_for_ip("85.17.184.227") == "DE"
+
+        geolookup.city.assert_called_once_with("85.17.184.227")
+
+    def test_unknown_address(self, mocker):
+        geolookup = mocker.patch("apps.greencheck.api.views.geolookup")
+        geolookup.city.side_effect = errors.AddressNotFoundError("not found")
+
+        assert api.views.country_code_for_ip("10.0.0.1") is None
+
+    @pytest.mark.usefixtures("fresh_intensities")
+    def test_view_makes_no_queries(self, mocker, django_assert_num_queries):
+        geolookup = mocker.patch("apps.greencheck.api.views.geolookup")
+        geolookup.city.return_value = {"country_code": "DE"}
+        make_intensity("DE", 2022, 350)
+        ip_to_check = "85.17.184.227"
+        url_path = reverse("ip-to-co2intensity", kwargs={"ip_to_check": ip_to_check})
+        view_func = api.views.IPCO2Intensity.as_view()
+
+        # the first request loads the table
+        view_func(rf.get(url_path), ip_to_check=ip_to_check)
+
+        with django_assert_num_queries(0):
+            response = view_func(rf.get(url_path), ip_to_check=ip_to_check)
+
+        assert response.data["carbon_intensity"] == 350
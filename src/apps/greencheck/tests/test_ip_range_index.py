@@ -0,0 +1,181 @@
+import ipaddress
+import threading
+
+import pytest
+
+from apps.accounts import models as ac_models
+
+from .. import domain_check
+from .. import ip_range_index
+from .. import models as gc_models
+
+
+def ip_range(start, end, payload):
+    return (int(ipaddress.ip_address(start)), int(ipaddress.ip_address(end)), payload)
+
+
+@pytest.fixture
+def fresh_index():
+    """
+    Make sure we never see an index built by another test, as the
+    transactions the ranges were created in will have been rolled back.
+    """
+    ip_range_index.clear_green_ip_range_index()
+    yield
+    ip_range_index.clear_green_ip_range_index()
+
+
+class TestIpRangeIndex:
+    def test_returns_none_for_empty_index(self):
+        index = ip_range_index.IpRangeIndex([])
+
+        assert index.smallest_range_for("127.0.0.1") is None
+
+    def test_matches_inclusive_range_bounds(self):
+        index = ip_range_index.IpRangeIndex(
+            [ip_range("127.0.1.2", "127.0.1.200", "large")]
+        )
+
+        assert index.smallest_range_for("127.0.1.1") is None
+        assert index.smallest_range_for("127.0.1.2") == "large"
+        assert index.smallest_range_for("127.0.1.200") == "large"
+        assert index.smallest_range_for("127.0.1.201") is None
+
+    def test_returns_smallest_nested_range(self):
+        index = ip_range_index.IpRangeIndex(
+            [
+                ip_range("127.0.1.2", "127.0.1.200", "large"),
+                ip_range("127.0.1.2", "127.0.1.3", "small"),
+                ip_range("127.0.1.50", "127.0.1.60", "medium"),
+            ]
+        )
+
+        assert index.smallest_range_for("127.0.1.2") == "small"
+        assert index.smallest_range_for("127.0.1.4") == "large"
+        assert index.smallest_range_for("127.0.1.55") == "medium"
+        assert index.smallest_range_for("127.0.1.61") == "large"
+
+    def test_partially_overlapping_ranges(self):
+        index = ip_range_index.IpRangeIndex(
+            [
+                ip_range("10.0.0.0", "10.0.0.100", "first"),
+                ip_range("10.0.0.50", "10.0.0.120", "second"),
+            ]
+        )
+
+        assert index.smallest_range_for("10.0.0.10") == "first"
+        assert index.smallest_range_for("10.0.0.60") == "second"
+        assert index.smallest_range_for("10.0.0.110") == "second"
+        assert index.smallest_range_for("10.0.0.121") is None
+
+    def test_equal_sized_ranges_prefer_the_first_passed_in(self):
+        index = ip_range_index.IpRangeIndex(
+            [
+                ip_range("10.0.0.0", "10.0.0.10", "first"),
+                ip_range("10.0.0.0", "10.0.0.10", "second"),
+            ]
+        )
+
+        assert index.smallest_range_for("10.0.0.5") == "first"
+
+    def test_supports_ipv6(self):
+        index = ip_range_index.IpRangeIndex(
+            [
+                ip_range("2a00:1450::", "2a00:1450:ffff::", "large"),
+                ip_range("2a00:1450:4001::", "2a00:1450:4001::ff", "small"),
+            ]
+        )
+
+        assert index.smallest_range_for("2a00:1450:4001::1") == "small"
+        assert index.smallest_range_for("2a00:1450:4002::1") == "large"
+        assert index.smallest_range_for("2a00:1451::1") is None
+
+    def test_looks_up_many_addresses_in_order(self):
+        index = ip_range_index.IpRangeIndex(
+            [
+                ip_range("127.0.1.2", "127.0.1.200", "large"),
+                ip_range("127.0.1.50", "127.0.1.60", "medium"),
+            ]
+        )
+
+        assert index.smallest_ranges_for(
+            ["127.0.1.201", "127.0.1.55", "127.0.0.1", "127.0.1.2", "127.0.1.55"]
+        ) == [None, "medium", None, "large", "medium"]
+
+
+@pytest.mark.django_db
+class TestGreenIpRangeIndex:
+    def test_check_domain_uses_index(
+        self, settings, fresh_index, hosting_provider: ac_models.Hostingprovider
+    ):
+        """
+        When the index is enabled, do we still return the smallest
+        matching range, without querying for the ranges on each check?
+        """
+        settings.GREEN_IP_RANGE_INDEX_ENABLED = True
+        hosting_provider.save()
+
+        gc_models.GreencheckIp.objects.create(
+            active=True,
+            ip_start="127.0.1.2",
+            ip_end="127.0.1.200",
+            hostingprovider=hosting_provider,
+        )
+        small_ip_range = gc_models.GreencheckIp.objects.create(
+            active=True,
+            ip_start="127.0.1.2",
+            ip_end="127.0.1.3",
+            hostingprovider=hosting_provider,
+        )
+
+        res = domain_check.GreenDomainChecker().check_domain("127.0.1.2")
+
+        assert res.green
+        assert res.match_ip_range == small_ip_range.id
+        assert res.hosting_provider_id == hosting_provider.id
+
+    def test_saving_a_range_invalidates_index(
+        self, settings, fresh_index, green_ip, django_capture_on_commit_callbacks
+    ):
+        """
+        When we archive a range, is it left out of lookups once the index
+        is rebuilt, after the change is committed?
+        """
+        settings.GREEN_IP_RANGE_INDEX_ENABLED = True
+        checker = domain_check.GreenDomainChecker()
+
+        assert checker.check_for_matching_ip_ranges(green_ip.ip_start).id == green_ip.id
+
+        with django_capture_on_commit_callbacks(execute=True):
+            green_ip.archive()
+
+        assert checker.check_for_matching_ip_ranges(green_ip.ip_start) is None
+
+    def test_serves_the_old_index_while_rebuilding(self, settings, fresh_index, mocker):
+        """
+        When the index is stale, do lookups carry on using it while the new
+        one is built in the background, rather than waiting for it?
+        """
+        old_index = ip_range_index.IpRangeIndex([])
+        mocker.patch.object(
+            ip_range_index, "build_green_ip_range_index", return_value=old_index
+        )
+        assert ip_range_index.green_ip_range_index() is old_index
+
+        settings.GREENCHECK_RELOAD_IN_BACKGROUND = True
+        release = threading.Event()
+
+        def slow_build():
+            release.wait(timeout=5)
+            return ip_range_index.IpRangeIndex([])
+
+        ip_range_index.build_green_ip_range_index.side_effect = slow_build
+        ip_range_index.invalidate_green_ip_range_index()
+
+        assert ip_range_index.green_ip_range_index() is old_index
+
+        release.set()
+        for thread in threading.enumerate():
+            if thread.name == "reload green ip range index":
+                thread.join(timeout=5)
+        assert ip_range_index.green_ip_range_index() is not old_index
@@ -9,6 +9,7 @@ from dateutil.relativedelta import relativedelta
 from django.utils import timezone
 
 from ..api.legacy_views import fetch_providers_for_country
+from ..legacy_directory import build_directory, build_provider_details
 from ..models import GreencheckIp
 from ...accounts import models as ac_models
 
@@ -130,6 +131,80 @@ class TestGreenWebDirectoryListing:
         assert providers[0]["naam"] == hosting_provider_z.name
 
 
+    def test_legacy_directory_built_from_one_query(
+        self, db, hosting_provider_a, hosting_provider_z, django_assert_num_queries
+    ):
+        hosting_provider_a.save()
+        hosting_provider_z.partner = "Certified Provider"
+        hosting_provider_z.save()
+
+        with django_assert_num_queries(1):
+            directory = build_directory()
+
+        assert [provider["naam"] for provider in directory["US"]["providers"]] == [
+            hosting_provider_z.name,
+            hosting_provider_a.name,
+        ]
+        assert "providers" not in directory["GB"]
+        assert directory["GB"]["tld"] == ".gb"
+
+    def test_legacy_directory_supports_etags(self, db, hosting_provider_a, client):
+        hosting_provider_a.save()
+        url_path = reverse("legacy-directory-listing")
+
+        resp = client.get(url_path)
+
+        assert resp.status_code == 200
+        assert resp.content.startswith(b"callback(")
+        payload = json.loads(resp.content[len(b"callback(") : -len(b");")])
+        assert payload["US"]["providers"][0]["naam"] == hosting_provider_a.name
+
+        revalidated = client.get(url_path, HTTP_IF_NONE_MATCH=resp["ETag"])
+
+        assert revalidated.status_code == 304
+
+    def test_legacy_directory_etag_depends_on_callback(
+        self, db, hosting_provider_a, client
+    ):
+        """
+        Does a client holding the listing wrapped in one callback get
+        the whole listing when it asks for another callback?
+        """
+        hosting_provider_a.save()
+        url_path = reverse("legacy-directory-listing")
+
+        resp = client.get(url_path, {"callback": "first"})
+        other = client.get(
+            url_path, {"callback": "second"}, HTTP_IF_NONE_MATCH=resp["ETag"]
+        )
+
+        assert other.status_code == 200
+        assert other.content.startswith(b"second(")
+        assert other["ETag"] != resp["ETag"]
+
+    def test_legacy_directory_rebuilt_when_listing_changes(
+        self, db, hosting_provider_a, mocker, django_capture_on_commit_callbacks
+    ):
+        rebuild = mocker.patch(
+            "apps.greencheck.legacy_directory.rebuild_directory_listing"
+        )
+
+        with django_capture_on_commit_callbacks(execute=True):
+            hosting_provider_a.save()
+        assert rebuild.call_count == 1
+
+        # changes that don't show in the listing leave it alone
+        hosting_provider_a.customer = True
+        with django_capture_on_commit_callbacks(execute=True):
+            hosting_provider_a.save()
+        assert rebuild.call_count == 1
+
+        hosting_provider_a.is_listed = False
+        with django_capture_on_commit_callbacks(execute=True):
+            hosting_provider_a.save()
+        assert rebuild.call_count == 2
+
+
 class TestGreenWebDirectoryDetail:
     """
     Check that a directory detail API call exposes
@@ -299,3 +374,72 @@ class TestGreenWebDirectoryDetail:
         assert error_detail.code == "parse_error"
         assert "You need to send a valid numeric ID" in error_message
         assert "Received ID was: 'undefined'" in error_message
+
+    def test_directory_provider_prefetches_datacenters(
+        self,
+        db,
+        hosting_provider_a,
+        sample_hoster_user,
+        datacenter,
+        green_dc_certificate,
+        django_assert_num_queries,
+    ):
+        hosting_provider_a.save()
+        sample_hoster_user.save()
+        datacenter.user_id = sample_hoster_user.id
+        datacenter.save()
+        hosting_provider_a.datacenter.add(datacenter)
+        green_dc_certificate.datacenter = datacenter
+        green_dc_certificate.save()
+
+        # the provider, then its datacenters, their certificates and locations
+        with django_assert_num_queries(4):
+            details = build_provider_details(hosting_provider_a.id)
+
+        assert len(details[0]["datacenters"][0]["certificates"]) == 1
+
+    def test_directory_provider_supports_revalidation(
+        self, db, hosting_provider_a, client
+    ):
+        hosting_provider_a.save()
+        url_path = reverse("legacy-directory-detail", args=[hosting_provider_a.id])
+
+        resp = client.get(url_path)
+
+        assert resp.status_code == 200
+        assert resp["Last-Modified"]
+
+        revalidated = client.get(url_path, HTTP_IF_NONE_MATCH=resp["ETag"])
+
+        assert revalidated.status_code == 304
+
+    def test_directory_provider_not_found(self, db, client):
+        url_path = reverse("legacy-directory-detail", args=[1234])
+
+        resp = client.get(url_path)
+
+        assert resp.status_code == 404
+
+    def test_directory_provider_cache_cleared_when_datacenter_saved(
+        self,
+        db,
+        shared_cache,
+        hosting_provider_a,
+        sample_hoster_user,
+        datacenter,
+        client,
+    ):
+        hosting_provider_a.save()
+        sample_hoster_user.save()
+        datacenter.user_id = sample_hoster_user.id
+        datacenter.save()
+        hosting_provider_a.datacenter.add(datacenter)
+        url_path = reverse("legacy-directory-detail", args=[hosting_provider_a.id])
+        client.get(url_path)
+
+        datacenter.name = "A renamed datacenter"
+        datacenter.save()
+        resp = client.get(url_path)
+
+        payload = json.loads(resp.content)
+        assert payload[0]["datacenters"][0]["naam"] == "A renamed datacenter"
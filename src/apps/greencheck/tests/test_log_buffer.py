@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+
+import pika
+import pytest
+
+from .. import log_buffer, log_spool
+from ..models import Greencheck
+from ..tasks import process_logs
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return log_spool.LogSpool(str(tmp_path))
+
+
+@pytest.fixture
+def circuit_breaker():
+    return log_spool.BrokerCircuitBreaker(retry_after=60)
+
+
+def broker_is_down(batch):
+    raise pika.exceptions.AMQPConnectionError()
+
+
+class TestSitecheckLogBuffer:
+    def test_sends_batch_once_full(self, spool, circuit_breaker):
+        sent = threading.Event()
+        batches = []
+
+        def send_batch(batch):
+            batches.append(batch)
+            sent.set()
+
+        buffer = log_buffer.SitecheckLogBuffer(
+            send_batch, max_size=3, flush_interval=60,
+            spool=spool, circuit_breaker=circuit_breaker,
+        )
+        for domain in ["a.com", "b.com", "c.com"]:
+            buffer.add({"url": domain})
+
+        assert sent.wait(timeout=5)
+        assert batches == [[{"url": "a.com"}, {"url": "b.com"}, {"url": "c.com"}]]
+        buffer.stop()
+
+    def test_sends_what_is_left_when_stopped(self, spool, circuit_breaker):
+        batches = []
+        buffer = log_buffer.SitecheckLogBuffer(
+            batches.append, max_size=100, flush_interval=60,
+            spool=spool, circuit_breaker=circuit_breaker,
+        )
+        buffer.add({"url": "a.com"})
+
+        buffer.stop()
+
+        assert batches == [[{"url": "a.com"}]]
+
+    def test_spools_batches_while_broker_is_down(self, spool, circuit_breaker, mocker):
+        send_batch = mocker.Mock(side_effect=broker_is_down)
+        buffer = log_buffer.SitecheckLogBuffer(
+            send_batch, max_size=100, flush_interval=60,
+            spool=spool, circuit_breaker=circuit_breaker,
+        )
+
+        buffer.add({"url": "a.com"})
+        buffer.flush()
+        buffer.add({"url": "b.com"})
+        buffer.flush()
+
+        # once the broker is marked down, we stop trying it
+        assert send_batch.call_count == 1
+        assert circuit_breaker.is_open
+
+        batches = []
+        spool.replay(batches.append)
+        assert batches == [[{"url": "a.com"}], [{"url": "b.com"}]]
+
+    def test_replays_spool_once_broker_is_back(self, spool, circuit_breaker):
+        spool.append([{"url": "a.com"}])
+        batches = []
+        buffer = log_buffer.SitecheckLogBuffer(
+            batches.append, max_size=100, flush_interval=60,
+            spool=spool, circuit_breaker=circuit_breaker,
+        )
+
+        buffer.add({"url": "b.com"})
+        buffer.flush()
+
+        assert batches == [[{"url": "b.com"}], [{"url": "a.com"}]]
+        assert spool.replay(batches.append) == 0
+
+
+class TestLogSpool:
+    def test_unsent_batches_stay_spooled(self, spool):
+        spool.append([{"url": "a.com"}])
+        spool.append([{"url": "b.com"}])
+
+        with pytest.raises(pika.exceptions.AMQPConnectionError):
+            spool.replay(broker_is_down)
+
+        batches = []
+        assert spool.replay(batches.append) == 2
+        assert batches == [[{"url": "a.com"}], [{"url": "b.com"}]]
+
+    def test_skips_damaged_lines(self, spool):
+        spool.append([{"url": "a.com"}])
+        with open(spool.path, "a") as spool_file:
+            spool_file.write('[{"url": "b.c')
+
+        batches = []
+        spool.replay(batches.append)
+
+        assert batches == [[{"url": "a.com"}]]
+
+    def claim_for_another_process(self, spool, pid=12345):
+        claimed_path = f"{spool.path}{log_spool.CLAIMED_SUFFIX}{pid}"
+        os.rename(spool.path, claimed_path)
+        return claimed_path
+
+    def test_replays_files_claimed_by_a_dead_process(self, spool, mocker):
+        spool.append([{"url": "a.com"}])
+        self.claim_for_another_process(spool)
+        mocker.patch.object(log_spool, "_process_is_running", return_value=False)
+
+        batches = []
+        assert spool.replay(batches.append) == 1
+        assert batches == [[{"url": "a.com"}]]
+        assert os.listdir(spool.directory) == []
+
+    def test_leaves_files_being_replayed_by_another_process(self, spool, mocker):
+        spool.append([{"url": "a.com"}])
+        self.claim_for_another_process(spool)
+        mocker.patch.object(log_spool, "_process_is_running", return_value=True)
+
+        batches = []
+        assert spool.replay(batches.append) == 0
+
+    def test_replays_abandoned_claims(self, spool, mocker):
+        spool.append([{"url": "a.com"}])
+        claimed_path = self.claim_for_another_process(spool)
+        claimed_at = time.time() - log_spool.CLAIM_TIMEOUT - 1
+        os.utime(claimed_path, (claimed_at, claimed_at))
+        mocker.patch.object(log_spool, "_process_is_running", return_value=True)
+
+        batches = []
+        assert spool.replay(batches.append) == 1
+
+    def test_leaves_old_files_it_just_claimed(self, spool):
+        spool.append([{"url": "a.com"}])
+        written_at = time.time() - log_spool.CLAIM_TIMEOUT - 1
+        os.utime(spool.path, (written_at, written_at))
+        replayed_again = []
+
+        def send_batch(batch):
+            # a second replay, while the first is still sending the file
+            replayed_again.append(spool.replay(lambda batch: None))
+
+        assert spool.replay(send_batch) == 1
+        assert replayed_again == [0]
+
+
+@pytest.mark.django_db
+def test_process_logs_logs_every_sitecheck(site_check_factory):
+    sitechecks = [site_check_factory.build() for _ in range(3)]
+
+    process_logs([sitecheck.asdict() for sitecheck in sitechecks])
+
+    assert Greencheck.objects.count() == 3
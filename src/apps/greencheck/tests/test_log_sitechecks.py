@@ -0,0 +1,97 @@
+import datetime
+
+import pytest
+from django.db import OperationalError, connection
+
+from ..models import DailyStat, Greencheck
+from ..tasks import process_log
+
+
+def green_presenting_rows():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT url, hosted_by_id FROM green_presenting ORDER BY url")
+        return cursor.fetchall()
+
+
+@pytest.mark.django_db
+class TestLogSitechecksSynchronous:
+    def test_logs_sitechecks_in_batched_queries(
+        self, site_check_factory, hosting_provider_factory, django_assert_num_queries
+    ):
+        provider = hosting_provider_factory.create()
+        green_sitecheck = site_check_factory.build(
+            green=True, match_type="ip", hosting_provider_id=provider.id
+        )
+        grey_sitecheck = site_check_factory.build(hosting_provider_id=None)
+        unloggable_sitecheck = site_check_factory.build(url=None)
+
+        # a savepoint around the whole batch, holding one insert for the
+        # greenchecks, then one query each to look up providers, add green urls,
+        # and remove grey ones from green_presenting, then a savepoint around
+        # adding missing daily stats, locking, and updating them, and the
+        # same for the daily totals, in a savepoint of their own
+        with django_assert_num_queries(16):
+            Greencheck.log_sitechecks_synchronous(
+                [green_sitecheck, grey_sitecheck, unloggable_sitecheck]
+            )
+
+        assert Greencheck.objects.filter(green="yes").count() == 1
+        assert Greencheck.objects.filter(green="no").count() == 1
+        assert green_presenting_rows() == ((green_sitecheck.url, provider.id),)
+
+    def test_latest_check_for_each_url_wins(
+        self, site_check_factory, hosting_provider_factory
+    ):
+        provider = hosting_provider_factory.create()
+        first_day = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        sitechecks = [
+            site_check_factory.build(
+                url=url,
+                green=True,
+                match_type="ip",
+                hosting_provider_id=provider.id,
+                checked_at=first_day,
+            )
+            for url in ["green.example.com", "grey.example.com"]
+        ]
+        # a later grey check of the second url
+        sitechecks.append(
+            site_check_factory.build(
+                url="grey.example.com",
+                hosting_provider_id=None,
+                checked_at=first_day + datetime.timedelta(days=1),
+            )
+        )
+
+        Greencheck.log_sitechecks_synchronous(sitechecks)
+
+        assert green_presenting_rows() == (("green.example.com", provider.id),)
+
+    def test_failed_batch_is_not_partly_committed(
+        self, site_check_factory, hosting_provider_factory, mocker
+    ):
+        provider = hosting_provider_factory.create()
+        sitecheck = site_check_factory.build(
+            green=True, match_type="ip", hosting_provider_id=provider.id
+        )
+        mocker.patch.object(
+            DailyStat, "record_checks", side_effect=OperationalError("deadlock")
+        )
+
+        # the worker retries the whole batch, so nothing should be left behind
+        with pytest.raises(OperationalError):
+            Greencheck.log_sitechecks_synchronous([sitecheck])
+
+        assert not Greencheck.objects.exists()
+        assert green_presenting_rows() == ()
+
+
+@pytest.mark.django_db
+def test_process_log_logs_a_single_sitecheck(site_check_factory):
+    # web processes send sitechecks in batches now, but messages queued
+    # before they did are still logged
+    sitecheck = site_check_factory.build(hosting_provider_id=None)
+
+    process_log(sitecheck.asdict())
+
+    assert Greencheck.objects.filter(url=sitecheck.url).count() == 1
@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+from .. import object_storage
+
+
+@pytest.fixture
+def boto3_session(mocker):
+    # forget this thread's resource, so each test starts without one
+    object_storage._object_storage.__dict__.clear()
+    yield mocker.patch("apps.greencheck.object_storage.boto3.Session")
+    object_storage._object_storage.__dict__.clear()
+
+
+class TestObjectStorageResource:
+    def test_resource_is_created_once_per_thread(self, boto3_session):
+        first = object_storage.object_storage_resource()
+        second = object_storage.object_storage_resource()
+
+        assert first is second
+        assert boto3_session.call_count == 1
+
+    def test_each_thread_gets_its_own_resource(self, boto3_session):
+        object_storage.object_storage_resource()
+
+        thread = threading.Thread(target=object_storage.object_storage_resource)
+        thread.start()
+        thread.join()
+
+        assert boto3_session.call_count == 2
+
+    def test_resource_is_recreated_when_settings_change(self, boto3_session, settings):
+        object_storage.object_storage_resource()
+
+        settings.OBJECT_STORAGE_ENDPOINT = "https://another.example.com"
+        object_storage.object_storage_resource()
+
+        assert boto3_session.call_count == 2
+
+
+class TestGreenDomainSnapshots:
+    def test_snapshot_listing_is_cached(self, shared_cache, settings, mocker):
+        settings.DOMAIN_SNAPSHOT_BUCKET = "snapshots"
+        bucket = mocker.patch("apps.greencheck.object_storage.green_domains_bucket")
+        snapshot = mocker.Mock(key="green_urls_2024-01-01.db.gz", bucket_name="snapshots")
+        bucket.return_value.objects.all.return_value = [snapshot]
+        object_storage.clear_green_domain_snapshots()
+
+        snapshots = object_storage.green_domain_snapshots()
+        object_storage.green_domain_snapshots()
+
+        assert snapshots == [
+            (
+                "green_urls_2024-01-01.db.gz",
+                object_storage.public_url("snapshots", "green_urls_2024-01-01.db.gz"),
+            )
+        ]
+        assert bucket.return_value.objects.all.call_count == 1
+
+        # uploading a new snapshot clears the listing
+        object_storage.clear_green_domain_snapshots()
+        object_storage.green_domain_snapshots()
+
+        assert bucket.return_value.objects.all.call_count == 2
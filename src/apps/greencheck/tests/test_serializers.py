@@ -278,3 +278,35 @@ class TestGreenDomainSerialiser:
         docs = serialized_green_dom.data["supporting_documents"]
         assert docs[0]["link"] == supporting_doc.url
         assert docs[0]["title"] == supporting_doc.title
+
+    def test_serialising_many_green_domains_in_constant_queries(
+        self, db, hosting_provider, green_ip, django_assert_num_queries
+    ):
+        """
+        When we serialise many green domains, do we load the supporting
+        evidence for all their providers together, rather than per domain?
+        """
+        hosting_provider.save()
+        ac_models.HostingProviderSupportingDocument.objects.create(
+            hostingprovider=hosting_provider,
+            title="Carbon free energy for Google Cloud regions",
+            url="https://cloud.google.com/sustainability/region-carbon",
+            description="",
+            valid_from=timezone.now(),
+            valid_to=timezone.now() + relativedelta(years=1),
+            public=True,
+        )
+        for domain in ["google.com", "youtube.com", "gmail.com"]:
+            sitecheck = greencheck_sitecheck(domain, hosting_provider, green_ip)
+            create_greendomain(hosting_provider, sitecheck)
+
+        green_domains = list(gc_models.GreenDomain.objects.all())
+        grey_domain = gc_models.GreenDomain(url="fossilfuels4ever.com", green=False)
+
+        # one query for the providers, one for their documents
+        with django_assert_num_queries(2):
+            data = gc_serializers.GreenDomainSerializer(
+                green_domains + [grey_domain], many=True
+            ).data
+
+        assert [len(row.get("supporting_documents", [])) for row in data] == [1, 1, 1, 0]
@@ -0,0 +1,98 @@
+import pytest
+
+from ...accounts import models as ac_models
+from .. import checks
+from ..models import GreenDomain
+
+
+@pytest.mark.django_db
+class TestSharedCache:
+    def test_green_result_is_cached(
+        self, shared_cache, green_domain_factory, django_assert_num_queries
+    ):
+        green_domain = green_domain_factory.create()
+        GreenDomain.cached_result(green_domain.url)
+
+        with django_assert_num_queries(0):
+            cached_domain = GreenDomain.cached_result(green_domain.url)
+
+        assert cached_domain.id == green_domain.id
+        assert cached_domain.hosted_by == green_domain.hosted_by
+        assert cached_domain.green
+
+    def test_saving_green_domain_clears_cached_result(
+        self, shared_cache, green_domain_factory
+    ):
+        green_domain = green_domain_factory.create()
+        GreenDomain.cached_result(green_domain.url)
+
+        green_domain.hosted_by = "A new provider name"
+        green_domain.save()
+
+        assert GreenDomain.cached_result(green_domain.url).hosted_by == (
+            "A new provider name"
+        )
+
+    def test_clearing_caches_clears_cached_result(
+        self, shared_cache, green_domain_factory
+    ):
+        green_domain = green_domain_factory.create()
+        GreenDomain.cached_result(green_domain.url)
+
+        GreenDomain.clear_from_all_caches(green_domain.url)
+
+        assert GreenDomain.cached_result(green_domain.url) is None
+
+    def test_provider_details_are_cached(
+        self, shared_cache, hosting_provider_factory, django_assert_num_queries
+    ):
+        provider = hosting_provider_factory.create()
+        ac_models.Hostingprovider.cached_details(provider.id)
+
+        with django_assert_num_queries(0):
+            details = ac_models.Hostingprovider.cached_details(provider.id)
+
+        assert details.name == provider.name
+
+        provider.name = "A new provider name"
+        provider.save()
+
+        assert ac_models.Hostingprovider.cached_details(provider.id).name == (
+            "A new provider name"
+        )
+
+    def test_missing_carbon_txt_is_cached(
+        self, shared_cache, mocker, django_assert_num_queries
+    ):
+        lookup = mocker.patch.object(
+            ac_models.ProviderCarbonTxt, "_find_for_domain_uncached", return_value=None
+        )
+        ac_models.ProviderCarbonTxt.find_for_domain("example.com")
+
+        with django_assert_num_queries(0):
+            assert ac_models.ProviderCarbonTxt.find_for_domain("example.com") is None
+
+        ac_models.ProviderCarbonTxt.find_for_domain("example.com", refresh_cache=True)
+        assert lookup.call_count == 2
+
+
+class TestSharedCacheCheck:
+    def test_warns_about_local_memory_cache(self, shared_cache):
+        assert [warning.id for warning in checks.check_shared_cache(None)] == [
+            "greencheck.W001"
+        ]
+
+    def test_shared_cache_passes(self, settings):
+        settings.CACHES = {
+            **settings.CACHES,
+            "shared": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+        }
+
+        assert checks.check_shared_cache(None) == []
+
+    def test_warns_about_replica_without_shared_cache(self, shared_cache, settings):
+        settings.READ_REPLICA_ENABLED = True
+
+        assert [warning.id for warning in checks.check_read_replica(None)] == [
+            "greencheck.W002"
+        ]
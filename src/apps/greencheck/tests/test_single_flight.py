@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from ..single_flight import SingleFlight, shared_lock
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_share_one_result(self):
+        """
+        When several threads ask for the same key at once, is the
+        work only done once, and the result shared between them?
+        """
+        single_flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def slow_lookup():
+            calls.append(1)
+            started.set()
+            release.wait(timeout=5)
+            return "result"
+
+        def caller():
+            results.append(single_flight.do("example.com", slow_lookup))
+
+        leader = threading.Thread(target=caller)
+        leader.start()
+        started.wait(timeout=5)
+
+        followers = [threading.Thread(target=caller) for _ in range(4)]
+        [follower.start() for follower in followers]
+        # give the followers a moment to start waiting on the leader
+        time.sleep(0.1)
+        release.set()
+        [thread.join(timeout=5) for thread in [leader, *followers]]
+
+        assert len(calls) == 1
+        assert results == ["result"] * 5
+
+    def test_later_calls_run_again(self):
+        single_flight = SingleFlight()
+
+        assert single_flight.do("example.com", lambda: 1) == 1
+        assert single_flight.do("example.com", lambda: 2) == 2
+
+    def test_errors_are_raised_to_the_caller(self):
+        single_flight = SingleFlight()
+
+        def failing_lookup():
+            raise ValueError("lookup failed")
+
+        with pytest.raises(ValueError):
+            single_flight.do("example.com", failing_lookup)
+
+        # the failed call doesn't block later ones
+        assert single_flight.do("example.com", lambda: 1) == 1
+
+
+class TestSharedLock:
+    @pytest.fixture
+    def lock_cache(self, locmem_cache):
+        return locmem_cache("locks")
+
+    def test_without_a_cache_always_acquires(self):
+        with shared_lock("example.com", None, timeout=1) as acquired:
+            assert acquired
+
+    def test_second_holder_waits_then_does_not_acquire(self, lock_cache):
+        with shared_lock("example.com", lock_cache, timeout=1) as acquired:
+            assert acquired
+            with shared_lock(
+                "example.com", lock_cache, timeout=0.1, poll_interval=0.01
+            ) as acquired_again:
+                assert not acquired_again
+
+    def test_lock_is_released(self, lock_cache):
+        with shared_lock("example.com", lock_cache, timeout=1):
+            pass
+
+        with shared_lock("example.com", lock_cache, timeout=1) as acquired:
+            assert acquired
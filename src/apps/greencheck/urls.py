@@ -1 +1,24 @@
-urlpatterns = []
+from django.conf import settings
+from django.urls import path
+from django.views.decorators.cache import cache_page
+
+from .api.stats_views import DailyStatsView, ProviderDailyStatsView
+from .db_router import replica_reads
+from .shared_cache import SHARED_CACHE
+
+urlpatterns = [
+    path(
+        "daily/",
+        cache_page(settings.STATS_CACHE_TIMEOUT, cache=SHARED_CACHE)(
+            replica_reads(DailyStatsView.as_view())
+        ),
+        name="stats-daily",
+    ),
+    path(
+        "daily/provider/<int:provider_id>/",
+        cache_page(settings.STATS_CACHE_TIMEOUT, cache=SHARED_CACHE)(
+            replica_reads(ProviderDailyStatsView.as_view())
+        ),
+        name="stats-daily-provider",
+    ),
+]
@@ -1,45 +1,24 @@
-from datetime import date, timedelta
+from urllib.parse import urlencode
 
 import django_filters
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 from django.views.generic.base import TemplateView
+from waffle import flag_is_active
 
 from apps.accounts.models.hosting import Hostingprovider
 
 from ..accounts import models as ac_models
 from . import object_storage
-
-bucket = object_storage.green_domains_bucket()
+from .shared_cache import directory_generation
 
 
 class GreenUrlsView(TemplateView):
     template_name = "green_url.html"
 
-    def fetch_urls(self):
-        """
-        Fetch the name, link pairs required to iterate through
-        the downloadable snapshots in the admin.
-        Returns a list of two-tuples, containing a filename and link.
-        """
-        return [
-            (obj.key, object_storage.public_url(obj.bucket_name, obj.key))
-            for obj in bucket.objects.all()
-        ]
-
-    @property
-    def urls(self):
-        """
-        Setting the date two weeks in the future. Two weeks from now on
-        it will prefetch the urls again
-        """
-        accessed_date = getattr(self, "_date", None)
-        if not accessed_date or self._date < date.today():
-            self._date = date.today() + timedelta(weeks=2)
-            self._urls = self.fetch_urls()
-        return self._urls
-
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["urls"] = self.urls
+        context["urls"] = object_storage.green_domain_snapshots()
         return context
 
 
@@ -68,11 +47,37 @@ class ProviderFilter(django_filters.FilterSet):
 
 class DirectoryView(TemplateView):
     """
-    A view for filtering our list of providers by various criteria
+    A view for filtering our list of providers by various criteria.
+
+    The rendered list of providers for each combination of filters is
+    cached in the shared cache for DIRECTORY_CACHE_TIMEOUT seconds, so we
+    only query and sort the providers when the cached list is missing,
+    or expired by a change to a listed provider.
     """
 
     template_name = "greencheck/directory_index.html"
 
+    def results_cache_key(self, filter_results) -> str:
+        """
+        Return the key for the cached list of providers, for the filters
+        in this request.
+        """
+        form = filter_results.form
+        # django-filter still applies the valid filters of an invalid form,
+        # and only those are in `cleaned_data`, so they make up the key
+        form.is_valid()
+        filters = urlencode(
+            sorted(
+                (name, getattr(value, "pk", value))
+                for name, value in form.cleaned_data.items()
+                if value
+            )
+        )
+
+        # the list shows upstream providers behind a feature flag
+        upstream_providers = flag_is_active(self.request, "upstream_providers")
+        return f"{directory_generation()}:{filters}:{upstream_providers}"
+
     def get_context_data(self, *args, **kwargs):
         """
         Populate the page context with the filtered list
@@ -111,15 +116,22 @@ class DirectoryView(TemplateView):
             else:
                 return "Unknown"
 
+        def ordered_results():
+            # filter by country, and then within each country, filter by alphabetical order
+            ordered_results_qs = filter_results.qs.order_by("country", "name")
+            # now filter the top level country results by written country name
+            # so we have Denmark listed before Germany for example, and so on.
+            return sorted(ordered_results_qs, key=provider_country_name)
+
         # we include the filter in our context to allow the template to render
         # the filter form, even if we display the results using `ordered_results`
         # variable
         ctx["filter"] = filter_results
 
-        # filter by country, and then within each country, filter by alphabetical order
-        ordered_results_qs = filter_results.qs.order_by("country", "name")
-        # now filter the top level country results by written country name
-        # so we have Denmark listed before Germany for example, and so on.
-        ctx["ordered_results"] = sorted(ordered_results_qs, key=provider_country_name)
+        # the results are only fetched if the template doesn't find the
+        # rendered list in the cache
+        ctx["ordered_results"] = SimpleLazyObject(ordered_results)
+        ctx["results_cache_key"] = self.results_cache_key(filter_results)
+        ctx["results_cache_timeout"] = settings.DIRECTORY_CACHE_TIMEOUT
 
         return ctx
@@ -1,10 +1,11 @@
-import csv
 import json
 import logging
-from io import TextIOWrapper
 
 import tld
-from rest_framework import pagination, parsers, request, response, viewsets
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.urls import reverse
+from rest_framework import pagination, parsers, request, response, status, viewsets
 from rest_framework.authentication import BasicAuthentication, SessionAuthentication
 from rest_framework.generics import CreateAPIView, RetrieveAPIView
 from rest_framework.permissions import AllowAny
@@ -18,6 +19,8 @@ from .api.asn_viewset import ASNViewSet  # noqa
 
 from . import models as gc_models
 from ..accounts.models import CarbonTxtDomainResultCache
+from . import batch_check
+from .tasks import process_batch_check
 from . import serializers as gc_serializers
 
 
@@ -104,14 +107,28 @@ class BatchViewHelpers:
     containing shared logic and helpers.
     """
 
+    def normalised_urls(self, urls_list) -> list:
+        """
+        Return the urls with surrounding whitespace removed and lowercased, as
+        domain names are case insensitive, dropping empty values and repeats,
+        while keeping the order they were given in.
+        """
+        return list(
+            dict.fromkeys(
+                url.strip().lower()
+                for url in urls_list
+                if isinstance(url, str) and url.strip()
+            )
+        )
+
     def grey_urls_only(self, urls_list, queryset) -> list:
         """
         Accept a list of domain names, and a queryset of checked green
         domain objects, and return a list of only the grey domains.
         """
-        green_list = [domain_object.url for domain_object in queryset]
+        green_urls = {domain_object.url for domain_object in queryset}
 
-        return [url for url in urls_list if url not in green_list]
+        return [url for url in urls_list if url not in green_urls]
 
     def build_green_greylist(self, grey_list: list, green_list) -> list:
         """
@@ -119,19 +136,18 @@ class BatchViewHelpers:
         """
         from .models import GreenDomain
 
-        grey_domains = []
-
-        for domain in grey_list:
-            gp = GreenDomain.grey_result(domain=domain)
-            grey_domains.append(gp)
-
-        evaluated_green_queryset = green_list[::1]
+        # we can have more than one row for a domain, so only use the first
+        green_domains = {}
+        for green_domain in green_list:
+            green_domains.setdefault(green_domain.url, green_domain)
 
-        return evaluated_green_queryset + grey_domains
+        return list(green_domains.values()) + GreenDomain.grey_results(grey_list)
 
     def response_for_urls_list(self, urls_list):
+        urls_list = self.normalised_urls(urls_list)
+
         if urls_list:
-            queryset = gc_models.GreenDomain.objects.filter(url__in=urls_list)
+            queryset = list(gc_models.GreenDomain.objects.filter(url__in=urls_list))
         else:
             queryset = []
 
@@ -195,26 +211,19 @@ class GreenDomainBatchView(CreateAPIView, BatchViewHelpers):
         Accept a request object, parse any attached CSV file, and
         return a list of the valid domains in the file,
         """
-        url_file = self.request.data.get("urls")
-        # attachments are by default binary, so we need to
-        # convert them to a format the CSV reader expects
-        encoded_file = TextIOWrapper(url_file, encoding="utf-8")
-        csv_file = csv.reader(encoded_file)
-
-        urls_list = []
-
-        for row in csv_file:
-            if row is not None:
-                url, *_ = row
-                domain = tld.get_fld(url, fix_protocol=True)
-                urls_list.append(domain)
-
-        return urls_list
-
+        return [
+            tld.get_fld(url, fix_protocol=True)
+            for url in batch_check.iter_csv_urls(self.request.data.get("urls"))
+        ]
 
     def create(self, request, *args, **kwargs):
         """"""
 
+        # `live_check=true` runs a full check for any domains we have no
+        # cached result for, streaming the results back as we go
+        if request.data.get("live_check") == "true":
+            return self.streamed_live_check_response(request)
+
         urls_list = self.collect_urls(request)
 
         logger.debug(f"urls_list: {urls_list}")
@@ -225,6 +234,21 @@ class GreenDomainBatchView(CreateAPIView, BatchViewHelpers):
 
         return response.Response(serialized.data, headers=headers)
 
+    def streamed_live_check_response(self, request) -> StreamingHttpResponse:
+        """
+        Return a CSV response, written a chunk of domains at a time as
+        we check them, so we never hold the whole upload or the whole
+        response in memory.
+        """
+        renderer = drf_csv_rndr.CSVStreamingRenderer()
+        rows = batch_check.batch_check_rows(
+            batch_check.iter_csv_urls(request.data.get("urls"))
+        )
+        return StreamingHttpResponse(
+            renderer.render(rows, renderer_context={"header": batch_check.RESULT_HEADER}),
+            content_type=renderer.media_type,
+        )
+
     def finalize_response(self, request, response, *args, **kwargs):
         """
         Override the default, so if we see a filename requested, send the
@@ -236,3 +260,64 @@ class GreenDomainBatchView(CreateAPIView, BatchViewHelpers):
             response["Content-Disposition"] = f"attachment; filename={filename}"
 
         return super().finalize_response(request, response, *args, **kwargs)
+
+
+class BatchCheckJobView(CreateAPIView):
+    """
+    Start a batch check in the background, for uploads too large to check
+    while you wait.
+
+    Upload a CSV file containing a list of domains, to get back a job. Poll the
+    job's url to follow its progress, and once it has completed, download a
+    gzipped CSV file with the status of each domain from its `result_url`.
+    """
+
+    serializer_class = gc_serializers.BatchCheckJobRequestSerializer
+    authentication_classes = [SessionAuthentication, BasicAuthentication]
+    permission_classes = [AllowAny]
+    parser_classes = [parsers.FormParser, parsers.MultiPartParser]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        job = gc_models.BatchCheckJob(live_check=serializer.validated_data["live_check"])
+        job.save_upload(serializer.validated_data["urls"])
+        job.save()
+
+        process_batch_check.send(str(job.id))
+
+        job_serializer = gc_serializers.BatchCheckJobSerializer(
+            job, context=self.get_serializer_context()
+        )
+        return response.Response(
+            job_serializer.data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={
+                "Location": request.build_absolute_uri(
+                    reverse("green-domain-batch-job-detail", kwargs={"pk": job.pk})
+                )
+            },
+        )
+
+
+class BatchCheckJobDetailView(RetrieveAPIView):
+    """
+    Follow the progress of a batch check job.
+    """
+
+    queryset = gc_models.BatchCheckJob.objects.all()
+    serializer_class = gc_serializers.BatchCheckJobSerializer
+    authentication_classes = [SessionAuthentication, BasicAuthentication]
+    permission_classes = [AllowAny]
+
+
+def batch_check_job_download(request, pk):
+    """
+    Redirect to the results of a completed batch check job, in object storage.
+    """
+    job = gc_models.BatchCheckJob.objects.filter(pk=pk).first()
+    if job is None or not job.result_url:
+        raise Http404("No results for this job yet")
+
+    return redirect(job.result_url)
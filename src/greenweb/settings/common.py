@@ -25,6 +25,7 @@ env = environ.Env(
     DATABASE_URL=(str, os.getenv("DATABASE_URL")),
     DATABASE_URL_READ_ONLY=(str, os.getenv("DATABASE_URL_READ_ONLY")),
     DOMAIN_SNAPSHOT_BUCKET=(str, os.getenv("DOMAIN_SNAPSHOT_BUCKET")),
+    DOMAIN_SNAPSHOT_LISTING_TTL=(int, os.getenv("DOMAIN_SNAPSHOT_LISTING_TTL")),
     # add for object storage
     OBJECT_STORAGE_ENDPOINT=(str, os.getenv("OBJECT_STORAGE_ENDPOINT")),
     OBJECT_STORAGE_REGION=(str, os.getenv("OBJECT_STORAGE_REGION")),
@@ -49,6 +50,45 @@ env = environ.Env(
     BREVO_LIST_ID = (str, os.getenv("BREVO_LIST_ID")),
     BREVO_SOURCE = (str, os.getenv("BREVO_SOURCE")),
     DIRECTORY_CACHE_TIMEOUT = (int, os.getenv("DIRECTORY_CACHE_TIMEOUT")), # Default to one day
+    STATS_CACHE_TIMEOUT = (int, os.getenv("STATS_CACHE_TIMEOUT")),
+    GREY_DOMAIN_CACHE_TTL = (int, os.getenv("GREY_DOMAIN_CACHE_TTL")),
+    GREY_DOMAIN_CACHE_MAX_ENTRIES = (int, os.getenv("GREY_DOMAIN_CACHE_MAX_ENTRIES")),
+    SHARED_CACHE_TTL = (int, os.getenv("SHARED_CACHE_TTL")),
+    READ_REPLICA_ENABLED = (bool, os.getenv("READ_REPLICA_ENABLED")),
+    READ_REPLICA_RETRY_AFTER = (int, os.getenv("READ_REPLICA_RETRY_AFTER")),
+    READ_REPLICA_CHECK_INTERVAL = (int, os.getenv("READ_REPLICA_CHECK_INTERVAL")),
+    READ_REPLICA_LAG = (int, os.getenv("READ_REPLICA_LAG")),
+    GREENCHECK_LOG_BUFFER_SIZE = (int, os.getenv("GREENCHECK_LOG_BUFFER_SIZE")),
+    GREENCHECK_LOG_BUFFER_INTERVAL = (int, os.getenv("GREENCHECK_LOG_BUFFER_INTERVAL")),
+    GREENCHECK_LOG_SPOOL_DIR = (str, os.getenv("GREENCHECK_LOG_SPOOL_DIR")),
+    GREENCHECK_LOG_BROKER_RETRY_AFTER = (int, os.getenv("GREENCHECK_LOG_BROKER_RETRY_AFTER")),
+    GREENCHECK_ARCHIVE_AFTER_DAYS = (int, os.getenv("GREENCHECK_ARCHIVE_AFTER_DAYS")),
+    GREENCHECK_ARCHIVE_CHUNK_SIZE = (int, os.getenv("GREENCHECK_ARCHIVE_CHUNK_SIZE")),
+    GREENCHECK_ARCHIVE_DIR = (str, os.getenv("GREENCHECK_ARCHIVE_DIR")),
+    GREENCHECK_ARCHIVE_BUCKET = (str, os.getenv("GREENCHECK_ARCHIVE_BUCKET")),
+    GREENCHECK_LOCK_CACHE = (str, os.getenv("GREENCHECK_LOCK_CACHE")),
+    GREENCHECK_LOCK_TIMEOUT = (float, os.getenv("GREENCHECK_LOCK_TIMEOUT")),
+    GREENCHECK_PARALLEL_STAGES = (bool, os.getenv("GREENCHECK_PARALLEL_STAGES")),
+    GREENCHECK_STAGE_WORKERS = (int, os.getenv("GREENCHECK_STAGE_WORKERS")),
+    GREENCHECK_CHECK_ALL_ADDRESSES = (bool, os.getenv("GREENCHECK_CHECK_ALL_ADDRESSES")),
+    GREENCHECK_BATCH_CARBON_TXT_WORKERS = (int, os.getenv("GREENCHECK_BATCH_CARBON_TXT_WORKERS")),
+    GREENCHECK_BATCH_LIVE_CHECK_CHUNK_SIZE = (int, os.getenv("GREENCHECK_BATCH_LIVE_CHECK_CHUNK_SIZE")),
+    DNS_RESOLVER = (str, os.getenv("DNS_RESOLVER")),
+    DNS_RESOLVER_TIMEOUT = (float, os.getenv("DNS_RESOLVER_TIMEOUT")),
+    DNS_RESOLVER_MAX_CONCURRENCY = (int, os.getenv("DNS_RESOLVER_MAX_CONCURRENCY")),
+    DNS_CACHE_MAX_ENTRIES = (int, os.getenv("DNS_CACHE_MAX_ENTRIES")),
+    DNS_CACHE_MIN_TTL = (int, os.getenv("DNS_CACHE_MIN_TTL")),
+    DNS_CACHE_MAX_TTL = (int, os.getenv("DNS_CACHE_MAX_TTL")),
+    DNS_NEGATIVE_CACHE_TTL = (int, os.getenv("DNS_NEGATIVE_CACHE_TTL")),
+    GREEN_IP_RANGE_INDEX_ENABLED = (bool, os.getenv("GREEN_IP_RANGE_INDEX_ENABLED")),
+    GREEN_IP_RANGE_INDEX_TTL = (int, os.getenv("GREEN_IP_RANGE_INDEX_TTL")),
+    ASN_PREFIX_TABLE_ENABLED = (bool, os.getenv("ASN_PREFIX_TABLE_ENABLED")),
+    ASN_PREFIX_TABLE_CHECK_INTERVAL = (int, os.getenv("ASN_PREFIX_TABLE_CHECK_INTERVAL")),
+    GREENCHECK_RELOAD_IN_BACKGROUND = (bool, os.getenv("GREENCHECK_RELOAD_IN_BACKGROUND")),
+    GEOIP_IN_MEMORY = (bool, os.getenv("GEOIP_IN_MEMORY")),
+    GEOIP_CACHE_MAX_ENTRIES = (int, os.getenv("GEOIP_CACHE_MAX_ENTRIES")),
+    CO2_INTENSITY_CHECK_INTERVAL = (int, os.getenv("CO2_INTENSITY_CHECK_INTERVAL")),
+    CO2_INTENSITY_MAX_AGE = (int, os.getenv("CO2_INTENSITY_MAX_AGE")),
     MAX_API_KEYS_PER_USER = (int, os.getenv("MAX_API_KEYS_PER_USER")),
     API_KEY_PREFIX = (str, os.getenv("API_KEY_PREFIX"))
 )
@@ -187,15 +227,46 @@ AUTHENTICATION_BACKENDS = [
 # (recommended for custom User models)
 GUARDIAN_MONKEY_PATCH = False
 
+# How long we remember that a domain was grey, and how many grey domains
+# we remember before evicting the least recently checked ones
+GREY_DOMAIN_CACHE_TTL = env("GREY_DOMAIN_CACHE_TTL", default=60*60) # 1 hour
+GREY_DOMAIN_CACHE_MAX_ENTRIES = env("GREY_DOMAIN_CACHE_MAX_ENTRIES", default=100_000)
+
+# How long entries in the shared cache last, unless the code writing
+# them sets its own timeout
+SHARED_CACHE_TTL = env("SHARED_CACHE_TTL", default=60*15) # 15 minutes
+
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     },
+    "grey_domains": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "grey_domains",
+        "TIMEOUT": GREY_DOMAIN_CACHE_TTL,
+        "OPTIONS": {
+            "MAX_ENTRIES": GREY_DOMAIN_CACHE_MAX_ENTRIES,
+            # evict the least recently used tenth of entries when full
+            "CULL_FREQUENCY": 10,
+        },
+    },
     "file_resubmit": {
         "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
         "LOCATION": "/tmp/file_resubmit/",
         "TIMEOUT": 600,  # 10 minutes
     },
+    # Shared between all our processes, for green domains, carbon.txt lookups,
+    # provider details and cached pages - see apps.greencheck.shared_cache.
+    # The local memory default is only shared by the threads of one process,
+    # so in production set SHARED_CACHE_URL to a cache every server can reach:
+    # memcached, like pymemcache://127.0.0.1:11211, or Redis, like
+    # redis://127.0.0.1:6379/0. Not the database cache, as every lookup we
+    # cache to save a query would become a query again.
+    "shared": {
+        **env.cache_url("SHARED_CACHE_URL", default="locmemcache://shared"),
+        "TIMEOUT": SHARED_CACHE_TTL,
+        "KEY_PREFIX": "greencheck",
+    },
 }
 
 
@@ -255,6 +326,21 @@ DATABASES["read_only"]["OPTIONS"] = {
     "charset": "utf8mb4",
 }
 
+# Send reads from our busiest public views to the read_only replica.
+# See apps.greencheck.db_router
+DATABASE_ROUTERS = ["apps.greencheck.db_router.ReadReplicaRouter"]
+# Reading our own writes relies on the shared cache, so only turn this on
+# when SHARED_CACHE_URL points at a cache every process sees
+READ_REPLICA_ENABLED = env("READ_REPLICA_ENABLED", default=False)
+# How long to use the primary for, after failing to connect to the replica
+READ_REPLICA_RETRY_AFTER = env("READ_REPLICA_RETRY_AFTER", default=30)
+# How long to trust the replica is up for, after connecting to it, before
+# checking again
+READ_REPLICA_CHECK_INTERVAL = env("READ_REPLICA_CHECK_INTERVAL", default=5)
+# How long the replica may lag behind the primary, so how long we read
+# a domain from the primary after refreshing its results
+READ_REPLICA_LAG = env("READ_REPLICA_LAG", default=10)
+
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
 # only support API access with the sql explorer if we
 # explicitly set the token
@@ -269,6 +355,36 @@ GEOIP_PROVIDER_DOWNLOAD_URL = (
 )
 GEOIP_USER = env("MAXMIND_USER_ID", default=None)
 GEOIP_PASSWORD = env("MAXMIND_LICENCE_KEY", default=None)
+# Load the whole GeoIP database into memory when the API starts, rather than
+# reading it from disk on each lookup
+GEOIP_IN_MEMORY = env("GEOIP_IN_MEMORY", default=False)
+# How many IP address to country lookups each process remembers
+GEOIP_CACHE_MAX_ENTRIES = env("GEOIP_CACHE_MAX_ENTRIES", default=10_000)
+# Build in-memory tables like the prefix to AS table in a background thread,
+# serving the previous one until it is ready.
+# See apps.greencheck.background_reload
+GREENCHECK_RELOAD_IN_BACKGROUND = env("GREENCHECK_RELOAD_IN_BACKGROUND", default=True)
+# How often, in seconds, each process checks whether the CO2 intensity
+# figures it keeps in memory have been updated
+CO2_INTENSITY_CHECK_INTERVAL = env("CO2_INTENSITY_CHECK_INTERVAL", default=60)
+# The longest, in seconds, each process keeps its copy of the CO2 intensity
+# figures, even if it hasn't seen them change
+CO2_INTENSITY_MAX_AGE = env("CO2_INTENSITY_MAX_AGE", default=15 * 60)
+
+# Prefix to AS table, used to look up the ASN for an IP address
+# without making a live whois request. Refreshed with the
+# `update_asn_prefix_table` management command. Each process checks for
+# a new table this often, in seconds, and loads it in the background.
+ASN_PREFIX_TABLE_ENABLED = env("ASN_PREFIX_TABLE_ENABLED", default=True)
+ASN_PREFIX_TABLE_PATH = pathlib.Path(ROOT) / "data" / "pfx2as.txt.gz"
+ASN_PREFIX_TABLE_CHECK_INTERVAL = env("ASN_PREFIX_TABLE_CHECK_INTERVAL", default=60)
+ASN_PREFIX_TABLE_SOURCES = env.list(
+    "ASN_PREFIX_TABLE_SOURCES",
+    default=[
+        "https://publicdata.caida.org/datasets/routing/routeviews-prefix2as/",
+        "https://publicdata.caida.org/datasets/routing/routeviews6-prefix2as/",
+    ],
+)
 
 # Allow requests from any origin, but only make the API urls available
 # CORS_URLS_REGEX = r"^/api/.*$"
@@ -333,6 +449,9 @@ MEDIA_URL = "/media/"
 
 # OBJECT STORAGE BUCKET
 DOMAIN_SNAPSHOT_BUCKET = env("DOMAIN_SNAPSHOT_BUCKET")
+# How long we cache the list of green domain snapshots in the bucket.
+# Uploading a new snapshot clears it sooner.
+DOMAIN_SNAPSHOT_LISTING_TTL = env("DOMAIN_SNAPSHOT_LISTING_TTL", default=60 * 60)
 OBJECT_STORAGE_BUCKET_NAME = env("OBJECT_STORAGE_BUCKET_NAME")
 OBJECT_STORAGE_ENDPOINT = env("OBJECT_STORAGE_ENDPOINT")
 OBJECT_STORAGE_REGION = env("OBJECT_STORAGE_REGION")
@@ -388,10 +507,68 @@ DIRECTORY_CACHE_TIMEOUT= env(
     "DIRECTORY_CACHE_TIMEOUT", default=60*60*24 # 1 day
 )
 
+# How long to cache responses from the daily greencheck stats API. Today's
+# rollups change as checks are logged, so keep this short.
+STATS_CACHE_TIMEOUT = env(
+    "STATS_CACHE_TIMEOUT", default=60*5 # 5 minutes
+)
+
 MAX_API_KEYS_PER_USER = env(
     "MAX_API_KEYS_PER_USER", default=3
 )
 
+# The cache alias used to make concurrent checks of the same domain in
+# different processes wait for the first one, rather than all running a full
+# lookup. This needs a cache shared between processes - leave it unset to only
+# coalesce checks within each process.
+GREENCHECK_LOCK_CACHE = env("GREENCHECK_LOCK_CACHE", default=None)
+
+# The longest we wait for another process to finish checking a domain
+GREENCHECK_LOCK_TIMEOUT = env("GREENCHECK_LOCK_TIMEOUT", default=10.0)
+
+# Look for a domain's carbon.txt in a separate thread, while we check its
+# IP address against our IP ranges and ASNs, rather than one after the other.
+GREENCHECK_PARALLEL_STAGES = env("GREENCHECK_PARALLEL_STAGES", default=False)
+GREENCHECK_STAGE_WORKERS = env("GREENCHECK_STAGE_WORKERS", default=4)
+
+# Check every IP address a domain resolves to, rather than just the first,
+# reporting whether all, some or none of them are green
+GREENCHECK_CHECK_ALL_ADDRESSES = env("GREENCHECK_CHECK_ALL_ADDRESSES", default=False)
+
+# How many carbon.txt lookups we make at once when checking many domains
+# together with `GreenDomainChecker.check_domains`
+GREENCHECK_BATCH_CARBON_TXT_WORKERS = env("GREENCHECK_BATCH_CARBON_TXT_WORKERS", default=16)
+
+# How many domains from an uploaded CSV we check together, when running
+# live checks with the batch greencheck API
+GREENCHECK_BATCH_LIVE_CHECK_CHUNK_SIZE = env("GREENCHECK_BATCH_LIVE_CHECK_CHUNK_SIZE", default=500)
+
+# The resolver we use to look up the IP addresses for a domain. See
+# apps.greencheck.dns_resolver for the options.
+DNS_RESOLVER = env(
+    "DNS_RESOLVER", default="apps.greencheck.dns_resolver.CachingResolver"
+)
+# How long we wait for each DNS query, and how many we make at once
+DNS_RESOLVER_TIMEOUT = env("DNS_RESOLVER_TIMEOUT", default=2.0)
+DNS_RESOLVER_MAX_CONCURRENCY = env("DNS_RESOLVER_MAX_CONCURRENCY", default=50)
+# How many answers we keep, and the bounds on how long we keep them,
+# regardless of the TTL of the records
+DNS_CACHE_MAX_ENTRIES = env("DNS_CACHE_MAX_ENTRIES", default=50_000)
+DNS_CACHE_MIN_TTL = env("DNS_CACHE_MIN_TTL", default=30)
+DNS_CACHE_MAX_TTL = env("DNS_CACHE_MAX_TTL", default=60*60)
+# How long we remember that a domain doesn't resolve
+DNS_NEGATIVE_CACHE_TTL = env("DNS_NEGATIVE_CACHE_TTL", default=60*5)
+
+# Match IP addresses against an in-memory index of the green IP ranges,
+# rebuilt in each process at least this often, instead of querying the database
+GREEN_IP_RANGE_INDEX_ENABLED = env(
+    "GREEN_IP_RANGE_INDEX_ENABLED", default=True
+)
+
+GREEN_IP_RANGE_INDEX_TTL = env(
+    "GREEN_IP_RANGE_INDEX_TTL", default=60*5 # 5 minutes
+)
+
 API_KEY_PREFIX = env(
     "API_KEY_PREFIX", default="gwf"
 )
@@ -436,7 +613,30 @@ DRAMATIQ_BROKER = {
 
 # For some jobs, we want workers dedicated to that queue only
 # this is where we list them.
-DRAMATIQ_EXTRA_QUEUES = {"stats": "stats"}
+DRAMATIQ_EXTRA_QUEUES = {"stats": "stats", "batch_checks": "batch_checks"}
+
+# Each web process buffers the sitechecks it logs, and sends them to the
+# worker in messages of up to this many, every this many milliseconds.
+# See apps.greencheck.log_buffer
+GREENCHECK_LOG_BUFFER_SIZE = env("GREENCHECK_LOG_BUFFER_SIZE", default=500)
+GREENCHECK_LOG_BUFFER_INTERVAL = env("GREENCHECK_LOG_BUFFER_INTERVAL", default=1000)
+# Where we keep the sitechecks we couldn't send while RabbitMQ was down,
+# and how many seconds we wait before trying it again. This needs to outlive
+# a deploy, so it is outside the release directory on our servers - ./data
+# is linked to a shared directory too.
+GREENCHECK_LOG_SPOOL_DIR = env(
+    "GREENCHECK_LOG_SPOOL_DIR", default=ROOT("data", "log_spool")
+)
+GREENCHECK_LOG_BROKER_RETRY_AFTER = env("GREENCHECK_LOG_BROKER_RETRY_AFTER", default=30)
+
+# The archive_greenchecks command moves greenchecks older than this many days
+# out of the database, this many at a time, into Parquet files in this
+# directory, or in this object storage bucket, when it is set.
+# See apps.greencheck.greencheck_archive
+GREENCHECK_ARCHIVE_AFTER_DAYS = env("GREENCHECK_ARCHIVE_AFTER_DAYS", default=180)
+GREENCHECK_ARCHIVE_CHUNK_SIZE = env("GREENCHECK_ARCHIVE_CHUNK_SIZE", default=10000)
+GREENCHECK_ARCHIVE_DIR = env("GREENCHECK_ARCHIVE_DIR", default=ROOT("greencheck_archive"))
+GREENCHECK_ARCHIVE_BUCKET = env("GREENCHECK_ARCHIVE_BUCKET", default="")
 
 LOGGING = {
     "version": 1,
@@ -55,9 +55,15 @@ CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.dummy.DummyCache",
     },
+    "grey_domains": {
+        "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+    },
     "file_resubmit": {
         "BACKEND": "django.core.cache.backends.dummy.DummyCache",
     },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+    },
 }
 
 # Fix deprecated django-guardian setting
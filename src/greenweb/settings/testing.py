@@ -35,11 +35,27 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
     },
+    "grey_domains": {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
     "file_resubmit": {
         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
     },
+    "shared": {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
 }
 
+# Tests only have the default database to read from
+READ_REPLICA_ENABLED = False
+
+# Query the database for IP range matches in tests, as the in-memory index
+# would outlive the transactions each test runs inside
+GREEN_IP_RANGE_INDEX_ENABLED = False
+
+# Build in-memory tables before returning, so tests can check what is in them
+GREENCHECK_RELOAD_IN_BACKGROUND = False
+
 # we replace this with the autogenerated address for a specific trello board in production
 TRELLO_REGISTRATION_EMAIL_TO_BOARD_ADDRESS = "mail-to-board@localhost"
 
@@ -27,12 +27,16 @@ from apps.greencheck.viewsets import (
     ASNViewSet,
     GreenDomainViewset,
     GreenDomainBatchView,
+    BatchCheckJobView,
+    BatchCheckJobDetailView,
+    batch_check_job_download,
     LegacyMultiView,
 )
 
 from apps.greencheck.swagger import TGWFSwaggerView
 
 from apps.greencheck.api import legacy_views
+from apps.greencheck.db_router import replica_reads
 from apps.greencheck.api import image_views
 from apps.greencheck.api import views as api_views
 from apps.accounts.views import LabelAutocompleteView
@@ -83,22 +87,37 @@ urlpatterns += [
     path("api/v3/", include(router.urls)),
     path(
         "api/v3/greencheck/",
-        GreenDomainViewset.as_view({"get": "list"}),
+        replica_reads(GreenDomainViewset.as_view({"get": "list"})),
         name="green-domain-list",
     ),
     path(
         "api/v3/greencheck/<url>",
-        GreenDomainViewset.as_view({"get": "retrieve"}),
+        replica_reads(GreenDomainViewset.as_view({"get": "retrieve"})),
         name="green-domain-detail",
     ),
     path(
         "api/v3/batch/greencheck",
-        GreenDomainBatchView.as_view(),
+        replica_reads(GreenDomainBatchView.as_view()),
         name="green-domain-batch",
     ),
+    path(
+        "api/v3/batch/greencheck/jobs",
+        BatchCheckJobView.as_view(),
+        name="green-domain-batch-jobs",
+    ),
+    path(
+        "api/v3/batch/greencheck/jobs/<uuid:pk>",
+        BatchCheckJobDetailView.as_view(),
+        name="green-domain-batch-job-detail",
+    ),
+    path(
+        "api/v3/batch/greencheck/jobs/<uuid:pk>/download",
+        batch_check_job_download,
+        name="green-domain-batch-job-download",
+    ),
     path(
         "v2/greencheckmulti/<url_list>",
-        LegacyMultiView.as_view(),
+        replica_reads(LegacyMultiView.as_view()),
         name="legacy-greencheck-multi",
     ),
     path(
@@ -118,12 +137,12 @@ urlpatterns += [
     ),
     path(
         "api/v3/greencheckimage/<url>",
-        image_views.greencheck_image,
+        replica_reads(image_views.greencheck_image),
         name="greencheck-image",
     ),
     path(
         "greencheckimage/<url>",
-        image_views.legacy_greencheck_image,
+        replica_reads(image_views.legacy_greencheck_image),
         name="greencheck-image-legacy",
     ),
     path("api-token-auth/", views.obtain_auth_token, name="api-obtain-token"),
@@ -136,17 +155,17 @@ urlpatterns += [
     # it behind the reverse proxy
     path(
         "greencheck/<url>",
-        GreenDomainViewset.as_view({"get": "retrieve"}),
+        replica_reads(GreenDomainViewset.as_view({"get": "retrieve"})),
         name="green-domain-detail",
     ),
     path(
         "data/directory/",
-        legacy_views.directory,
+        replica_reads(legacy_views.directory),
         name="legacy-directory-listing",
     ),
     path(
         "data/hostingprovider/<id>",
-        legacy_views.directory_provider,
+        replica_reads(legacy_views.directory_provider),
         name="legacy-directory-detail",
     ),
     path("stats/", include(greencheck_urls)),